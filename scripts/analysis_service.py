@@ -0,0 +1,333 @@
+# This is the file with the analysis service: a local HTTP server with a pool of warm worker processes
+
+# Importing the necessary libraries
+import argparse
+import collections
+import concurrent.futures
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import uuid
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Make the 'scripts' package importable when the service is started from the scripts directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scripts.analyze_export import to_builtin
+
+
+# Directory of the captures that can be analyzed by path, set the CAPTURES_DIR environment variable (or --captures-dir) to change it
+captures_dir = os.environ.get('CAPTURES_DIR', '../data')
+
+# Maximum size of a request body (uploaded capture or JSON) in bytes, larger requests get a 413; set the
+# MAX_UPLOAD_BYTES environment variable (or --max-upload-mb) to change it
+max_upload_bytes = int(os.environ.get('MAX_UPLOAD_BYTES', 1024 ** 3))
+
+# Size of the chunks an uploaded capture is copied to disk with
+UPLOAD_CHUNK_BYTES = 1024 ** 2
+
+
+#########################################################################Worker Functions#########################################################################
+# Function to preload the analyzer modules in a worker process
+def warm_worker():
+    """
+    Initializes a worker process by importing pandas, matplotlib and the analyzer modules once.
+
+    Plots are disabled in the workers (the service only returns JSON) and matplotlib uses the
+    non-interactive Agg backend.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    from scripts import analyze
+    from scripts import analyze_export, capture_schema  # noqa: F401 (preloaded for the jobs)
+    analyze.plots_enabled = False
+
+
+# Function to run one analysis job in a worker process
+def run_analysis_job(path, top_n=10):
+    """
+    Analyzes one capture and returns its versioned results (see analyze_export.build_results).
+
+    Parameters:
+    path (str): The path to the capture CSV.
+    top_n (int): The number of entries to return in the top-N lists.
+
+    Returns:
+    dict: The JSON serializable results of the capture.
+    """
+    from scripts.analyze_export import build_results
+    from scripts.capture_schema import load_capture
+
+    return build_results(load_capture(path), capture=path, top_n=top_n)
+
+#########################################################################Job Queue#########################################################################
+class AnalysisService:
+    """
+    Keeps a pool of warm worker processes and a bounded queue of analysis jobs.
+
+    Parameters:
+    workers (int): The number of worker processes (jobs analyzed concurrently).
+    max_queued (int): The maximum number of jobs that can be running or waiting at the same time.
+    keep_finished (int): The number of finished jobs kept for GET /jobs/<id>.
+    """
+
+    def __init__(self, workers=2, max_queued=8, keep_finished=100):
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=warm_worker)
+        self.slots = threading.BoundedSemaphore(max_queued)
+        self.jobs = collections.OrderedDict()
+        self.keep_finished = keep_finished
+        self.lock = threading.Lock()
+        # Start every worker now so the imports are paid before the first request
+        for future in [self.executor.submit(int) for _ in range(workers)]:
+            future.result()
+
+    def submit(self, path, top_n=10, cleanup=False):
+        """
+        Queues an analysis job.
+
+        Parameters:
+        path (str): The path to the capture CSV.
+        top_n (int): The number of entries in the top-N lists.
+        cleanup (bool): Delete the capture once analyzed (used for uploads).
+
+        Returns:
+        str: The job id, or None if the queue is full.
+        """
+        if not self.slots.acquire(blocking=False):
+            return None
+        job_id = uuid.uuid4().hex
+        future = self.executor.submit(run_analysis_job, path, top_n)
+        with self.lock:
+            self.jobs[job_id] = future
+            # Forget the oldest finished jobs
+            while len(self.jobs) > self.keep_finished:
+                oldest_id, oldest = next(iter(self.jobs.items()))
+                if not oldest.done():
+                    break
+                del self.jobs[oldest_id]
+
+        def job_done(done_future):
+            self.slots.release()
+            if cleanup:
+                with contextlib.suppress(OSError):
+                    os.remove(path)
+        future.add_done_callback(job_done)
+        return job_id
+
+    def status(self, job_id, timeout=None):
+        """
+        Returns the status of a job, waiting up to timeout seconds for it to finish.
+
+        Parameters:
+        job_id (str): The job id returned by submit.
+        timeout (float): The number of seconds to wait, None waits until the job is done.
+
+        Returns:
+        dict: The job status ('queued', 'running', 'done' or 'failed') with the result or error, or None
+              if the job id is unknown.
+        """
+        with self.lock:
+            future = self.jobs.get(job_id)
+        if future is None:
+            return None
+        concurrent.futures.wait([future], timeout=timeout)
+        if not future.done():
+            return {'job_id': job_id, 'status': 'running' if future.running() else 'queued'}
+        if future.exception() is not None:
+            return {'job_id': job_id, 'status': 'failed', 'error': repr(future.exception())}
+        return {'job_id': job_id, 'status': 'done', 'result': future.result()}
+
+    def shutdown(self):
+        """
+        Stops the worker processes, cancelling the jobs that have not started.
+        """
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+#########################################################################HTTP API#########################################################################
+# Function to parse the query string of a request
+def parse_query(query):
+    """
+    Parses a URL query string ('top_n=5&wait=false'), URL-decoding the names and values.
+
+    Returns:
+    dict: The parameters, the last value wins when a parameter is repeated.
+
+    Example:
+    >>> parse_query('path=%2Fdata%2Fmy%20capture.csv&top_n=5')
+    {'path': '/data/my capture.csv', 'top_n': '5'}
+    """
+    return {name: values[-1] for name, values in urllib.parse.parse_qs(query, keep_blank_values=True).items()}
+
+
+# Function to resolve the path of a capture inside the captures directory
+def resolve_capture_path(path, directory):
+    """
+    Resolves the path of a capture requested by path, relative to the captures directory.
+
+    Parameters:
+    path (str): The requested path, absolute or relative to the captures directory.
+    directory (str): The captures directory.
+
+    Returns:
+    str: The real path of the capture.
+
+    Raises:
+    ValueError: If the path (after resolving the symbolic links and '..') is outside the captures directory.
+    """
+    directory = os.path.realpath(directory)
+    resolved = os.path.realpath(os.path.join(directory, path))
+    if os.path.commonpath([directory, resolved]) != directory:
+        raise ValueError(f'the capture must be in the captures directory: {path}')
+    return resolved
+
+
+class AnalysisRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API of the analysis service.
+
+    Endpoints:
+    GET  /health          -> {"status": "ok"}
+    POST /analyze         -> body {"path": "...", "top_n": 10, "wait": true} or a raw CSV upload
+                             (Content-Type: text/csv, top_n/wait as query parameters)
+    GET  /jobs/<job_id>   -> the job status and, once done, its result
+
+    Invalid requests get a 400, bodies over max_upload_bytes a 413 and requests over the queue limit a 503.
+    """
+
+    service = None
+    upload_dir = None
+    captures_dir = captures_dir
+    max_upload_bytes = max_upload_bytes
+
+    def send_json(self, status, body):
+        payload = json.dumps(body, default=to_builtin).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'status': 'ok'})
+        elif self.path.startswith('/jobs/'):
+            status = self.service.status(self.path[len('/jobs/'):], timeout=0)
+            if status is None:
+                self.send_json(404, {'error': 'unknown job'})
+            else:
+                self.send_json(200, status)
+        else:
+            self.send_json(404, {'error': 'not found'})
+
+    def do_POST(self):
+        route, _, query = self.path.partition('?')
+        if route != '/analyze':
+            self.send_json(404, {'error': 'not found'})
+            return
+
+        params = parse_query(query)
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self.send_json(400, {'error': 'invalid request: bad Content-Length'})
+            return
+        if length > self.max_upload_bytes:
+            # The body is not read, the connection is closed after the answer
+            self.close_connection = True
+            self.send_json(413, {'error': f'the request body is larger than {self.max_upload_bytes} bytes'})
+            return
+
+        cleanup = False
+        try:
+            if self.headers.get('Content-Type', '').startswith('text/csv'):
+                # Uploaded capture: streamed to disk and stored until the job is done
+                with tempfile.NamedTemporaryFile(suffix='.csv', dir=self.upload_dir, delete=False) as f:
+                    remaining = length
+                    while remaining:
+                        chunk = self.rfile.read(min(remaining, UPLOAD_CHUNK_BYTES))
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        remaining -= len(chunk)
+                path = f.name
+                cleanup = True
+            else:
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if not isinstance(body, dict):
+                    raise ValueError('the body must be a JSON object')
+                params.update(body)
+                if not isinstance(params.get('path'), str):
+                    raise ValueError('path must be a string')
+                path = resolve_capture_path(params['path'], self.captures_dir)
+            top_n = int(params.get('top_n', 10))
+            wait = str(params.get('wait', 'true')).lower() not in ('false', '0', 'no')
+        except (KeyError, TypeError, ValueError) as e:
+            if cleanup:
+                os.remove(path)
+            self.send_json(400, {'error': f'invalid request: {e!r}'})
+            return
+
+        if not os.path.isfile(path):
+            self.send_json(400, {'error': f'capture not found: {path}'})
+            return
+
+        job_id = self.service.submit(path, top_n, cleanup=cleanup)
+        if job_id is None:
+            if cleanup:
+                os.remove(path)
+            self.send_json(503, {'error': 'too many queued jobs, retry later'})
+        elif wait:
+            self.send_json(200, self.service.status(job_id))
+        else:
+            self.send_json(202, {'job_id': job_id, 'status': 'queued'})
+
+
+# Function to start the analysis service
+def serve(host='127.0.0.1', port=8765, workers=2, max_queued=8, upload_dir=None, captures=None, max_upload=None):
+    """
+    Starts the analysis service and serves requests until interrupted.
+
+    Parameters:
+    host (str): The address to listen on. Defaults to localhost only.
+    port (int): The port to listen on.
+    workers (int): The number of warm worker processes.
+    max_queued (int): The maximum number of running plus waiting jobs, further requests get a 503.
+    upload_dir (str): The directory used to store uploaded captures. Defaults to the system temp directory.
+    captures (str): The only directory captures can be analyzed from by path. Defaults to captures_dir.
+    max_upload (int): The maximum size of a request body in bytes. Defaults to max_upload_bytes.
+    """
+    service = AnalysisService(workers=workers, max_queued=max_queued)
+    AnalysisRequestHandler.service = service
+    AnalysisRequestHandler.upload_dir = upload_dir
+    AnalysisRequestHandler.captures_dir = captures or captures_dir
+    AnalysisRequestHandler.max_upload_bytes = max_upload or max_upload_bytes
+    server = ThreadingHTTPServer((host, port), AnalysisRequestHandler)
+    print(f'The analysis service is listening on http://{host}:{port} with {workers} workers')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run the Wireshark analysis as a local JSON service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--max-queued', type=int, default=8)
+    parser.add_argument('--upload-dir', default=None)
+    parser.add_argument('--captures-dir', default=None, help='Only the captures in this directory can be analyzed by path (default: ../data)')
+    parser.add_argument('--max-upload-mb', type=int, default=None, help='The maximum size of an uploaded capture in MB (default: 1024)')
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.max_queued, args.upload_dir, args.captures_dir,
+          args.max_upload_mb * 1024 ** 2 if args.max_upload_mb else None)
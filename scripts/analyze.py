@@ -9,6 +9,15 @@ import pandas as pd
 import warnings
 import os
 from prettytable import PrettyTable
+from scripts.analyze_rules import evaluate_warning_rules, metric_severity
+from scripts.analyze_protocols import DISSECTORS, dissect_protocols, protocol_metrics
+from scripts.analyze_scans import ScanDetector
+from scripts.analyze_tcp import TCP_FIELDS, extract_tcp_fields, tcp_performance
+from scripts.analyze_export import to_builtin
+from scripts.analyze_tls import fingerprint_applications
+from scripts.baseline_store import BASELINE_RUNS, DEFAULT_BASELINE_PATH, record_run
+from scripts.capture_schema import schema_columns
+from scripts.info_flags import FLAGS_COLUMN, add_info_flags, flag_counts, has_flag, info_flags
 
 # Initialize a PrettyTable to store the summary of the analysis
 table_summary = PrettyTable()
@@ -29,6 +38,27 @@ table_warnings.max_width["Recommendation"] = 25
 table_warnings.align = 'l'
 count = 1
 
+# Snapshot of the aggregates computed by the analysis stages, the warning rules are evaluated against it
+aggregates = {}
+
+# Result model of the run (summary, top-N lists, protocol histogram, TCP metrics, TLS, ARP mapping, scans, warnings and
+# baseline comparison), filled by the analysis stages; the baseline store saves it and analyze_export.build_results exports it
+snapshot = {}
+
+# Number of entries of the top-N lists kept in the snapshot
+snapshot_top_n = 10
+
+# Path to the baseline store (SQLite), every run is compared against the baseline of the previous runs and saved
+# there; set the BASELINE_DB environment variable to use another store, or to an empty value to disable it
+baseline_path = os.environ.get('BASELINE_DB', DEFAULT_BASELINE_PATH)
+
+# Set to False to skip drawing and saving the plots (e.g. when the analysis runs in the service workers)
+plots_enabled = True
+
+# Set to False to only fill the result model (aggregates and snapshot) without building the summary, warnings
+# and ARP mapping tables (e.g. for the structured export, which does not print them)
+tables_enabled = True
+
 # Create a directory for the plots within the results directory
 os.makedirs('../results/plots', exist_ok=True)
 # Create a subdirectory within the plots folder with the current date and time
@@ -37,6 +67,65 @@ os.makedirs(f'../results/plots/{datetime.datetime.now().strftime("%m%d%y%H%M")}'
 # Define the directory path for saving the plots
 plots_dir = f'../results/plots/{datetime.datetime.now().strftime("%m%d%y%H%M")}'
 
+###############################################Warnings#############################################
+# Function to add a row to the summary table
+def add_summary_row(description):
+    """
+    Adds a row to the summary table, unless the tables are disabled.
+
+    Parameters:
+    description (str): The text of the row.
+    """
+    if tables_enabled:
+        table_summary.add_row([description])
+
+
+# Function to add a row to the warnings table
+def add_warning(category, description, recommendation):
+    """
+    Adds a row to the warnings table and increments the warning counter, unless the tables are disabled.
+
+    Parameters:
+    category (str): The category of the warning (e.g. 'TCP RST').
+    description (str): The description of the warning.
+    recommendation (str): The recommended action.
+    """
+    global count
+    if not tables_enabled:
+        return
+    table_warnings.add_row([f"{count}", category, description, recommendation])
+    count += 1
+
+
+# Function to record warnings in the snapshot and add them to the warnings table
+def add_warnings(warnings):
+    """
+    Records warnings in the snapshot and adds a row to the warnings table for each of them.
+
+    Parameters:
+    warnings (list): Dictionaries with at least the keys category, description and recommendation
+                     (see analyze_rules.evaluate_warning_rules).
+    """
+    for warning in warnings:
+        snapshot.setdefault('warnings', []).append(warning)
+        add_warning(warning['category'], warning['description'], warning['recommendation'])
+
+
+# Function to reset the summary, warnings and aggregates before analyzing another capture
+def reset_analysis():
+    """
+    Clears the summary and warnings tables, the warning counter, the aggregates and the baseline snapshot.
+
+    The tables are module level, so a process that analyzes several captures (e.g. a service worker)
+    has to call this between captures.
+    """
+    global count
+    table_summary.clear_rows()
+    table_warnings.clear_rows()
+    count = 1
+    aggregates.clear()
+    snapshot.clear()
+
 ###############################################Plotting Functions#############################################
 # Function to plot a bar chart of the top 10 most frequent values in a specified column of a DataFrame
 def Top10(dataframe, column, title, filename):
@@ -49,25 +138,56 @@ def Top10(dataframe, column, title, filename):
 
     The function performs the following steps:
     1. Counts the occurrences of each unique value in the specified column.
-    2. Selects the top 10 most frequent values.
-    3. Plots a bar chart of these top 10 values.
-    4. Sets the title, x-label, and y-label of the plot.
-    5. If the maximum count exceeds 1000, sets the y-axis to a logarithmic scale.
-    6. Annotates each bar with its corresponding count.
-    7. Displays the plot.
+    2. Plots the top 10 values with plot_top10.
+
+    Note:
+    - The function does not return any value; it only displays the plot.
+    """
+    if not plots_enabled:
+        return
+
+    plot_top10(value_counts(dataframe, column), column, title, filename)
+
+
+# Function to plot a bar chart of the top 10 values of a precomputed Series of counts (packets, bytes, ...)
+def plot_top10(counts, xlabel, title, filename, ylabel='Number of Packets'):
+    """
+    Plots a bar chart of the 10 highest values of a Series of counts.
+
+    Parameters:
+    counts (pd.Series): The counts, indexed by the value they belong to (e.g. packets per Source).
+    xlabel (str): The label of the x-axis.
+    title (str): The title of the plot, prefixed with 'Top 10'.
+    filename (str): The name of the PNG file saved in the plots directory.
+    ylabel (str): The label of the y-axis.
+
+    The function performs the following steps:
+    1. Selects the top 10 values.
+    2. Plots a bar chart of these top 10 values.
+    3. Sets the title, x-label, and y-label of the plot.
+    4. If the maximum count exceeds 1000, sets the y-axis to a logarithmic scale.
+    5. Annotates each bar with its corresponding count.
+    6. Saves and displays the plot.
 
     Note:
     - The function assumes that the `matplotlib.pyplot` module is imported as `plt`.
     - The function does not return any value; it only displays the plot.
+    - Nothing is plotted when every count is 0 (e.g. a capture without retransmissions).
     """
+    if not plots_enabled:
+        return
     
-    dataframe[column].value_counts().head(10).plot(kind='bar')
+    # Categorical columns report unused categories with a count of 0, drop them
+    counts = counts[counts > 0].sort_values(ascending=False)
+    if counts.empty:
+        return
+    counts.head(10).plot(kind='bar')
     plt.title(f'Top 10 {title}')
-    plt.xlabel(f'{column}')
-    plt.ylabel('Number of Packets')
-    if dataframe[column].value_counts().max() > 1000:
+    plt.xlabel(f'{xlabel}')
+    plt.ylabel(ylabel)
+    if counts.max() > 1000:
         plt.yscale('log')
-    for i, v in enumerate(dataframe[column].value_counts().head(10)):
+    for i, v in enumerate(counts.head(10)):
         plt.text(i, v + 10, str(v), ha='center')
     plt.savefig(os.path.join(plots_dir, filename))
     plt.show()
@@ -100,9 +220,14 @@ def plot_analysis(title, data, column):
     - The function assumes that the `matplotlib.pyplot` module is imported as `plt`.
     - The function does not return any value; it only displays the plot.
     """
+    if not plots_enabled:
+        return
     
     # Count the occurrences of each unique value in the specified column
-    protocol_value_counts = data[column].value_counts()
+    protocol_value_counts = value_counts(data, column)
+    # Categorical columns report unused categories with a count of 0 and do not accept the new 'Others' label, use a plain index
+    protocol_value_counts = protocol_value_counts[protocol_value_counts > 0]
+    protocol_value_counts.index = protocol_value_counts.index.astype(str)
     
     # Group values with counts less than 10 into an 'Others' category
     others_count = protocol_value_counts[protocol_value_counts < 10].sum()
@@ -173,7 +298,8 @@ def identify_address_type(address, protocol):
     str: The type of the address, which can be one of the following:
         - 'Private': If the address is a private IPv4 address (e.g., starts with '192.168.', '172.16.', or '10.').
         - 'IPv6': If the address is an IPv6 address.
-        - 'MAC': If the protocol is 'ARP', indicating the address is a MAC address.
+        - 'MAC': If the protocol is 'ARP', or the address is not an IP address (a link layer name such as
+                 'Cisco_ab:cd:ef' or 'Broadcast', e.g. of STP or LLDP frames).
         - 'Public': If the address is a public IPv4 address.
     Example:
     >>> identify_address_type('192.168.1.1', 'TCP')
@@ -184,63 +310,320 @@ def identify_address_type(address, protocol):
     'MAC'
     >>> identify_address_type('8.8.8.8', 'TCP')
     'Public'
+    >>> identify_address_type('Cisco_ab:cd:ef', 'STP')
+    'MAC'
     """
     if protocol == 'ARP':
         return 'MAC'
     elif address.startswith('192.168.') or address.startswith('172.16.') or address.startswith('10.'):
         return 'Private'
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        # Link layer names of the non-IP frames
+        return 'MAC'
     # Check if address is multicast ipv4 address
-    elif ipaddress.ip_address(address).is_multicast:
+    if ip.is_multicast:
         return 'Multicast-IPv4'
-    elif ipaddress.ip_address(address).version == 6:
+    elif ip.version == 6:
         return 'IPv6'
     else:
         return 'Public'
     
  
 
+###############################################Backend Dispatch#############################################
+# The analysis stages run on a pandas DataFrame (capture_schema.load_capture) or on a capture kept in
+# DuckDB (duckdb_backend.load_capture_duckdb). The functions below are the row level operations the
+# stages need, the DuckDB capture implements each of them as one SQL query.
+
+# Function to count the rows per value of a column
+def value_counts(data, column):
+    """
+    Counts the rows per value of a column.
+
+    Parameters:
+    data (pd.DataFrame or SQLCapture): The data.
+    column (str): The column name.
+
+    Returns:
+    pd.Series: The counts, indexed by the column values.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data[column].value_counts()
+    return data.value_counts(column)
+
+
+# Function to select the rows where a column equals a value
+def select_rows(data, column, value):
+    """
+    Returns the rows of the data where the column equals the value, as the same type as the data.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data[data[column] == value]
+    return data.select_rows(column, value)
+
+
+# Function to check if a column contains a value
+def has_value(data, column, value):
+    """
+    Returns True if the column of the data contains the value.
+    """
+    if isinstance(data, pd.DataFrame):
+        return value in data[column].values
+    return data.has_value(column, value)
+
+
+# Function to add the Info_Flags bitmask column (see info_flags.py) to the data
+def flag_info(data):
+    """
+    Returns the data with the Info_Flags column, as the same type as the data.
+    """
+    if isinstance(data, pd.DataFrame):
+        return add_info_flags(data)
+    return data.add_info_flags()
+
+
+# Function to count the rows of every Info flag
+def count_flags(data):
+    """
+    Returns the number of rows of every registered Info flag, by flag name.
+    """
+    if isinstance(data, pd.DataFrame):
+        return flag_counts(info_flags(data))
+    return data.flag_counts()
+
+
+# Function to get the rows of the data as a DataFrame
+def materialize(data, columns=None):
+    """
+    Returns the data (or some of its columns) as a pandas DataFrame, for the stages that iterate over
+    (small subsets of) the rows.
+    """
+    if isinstance(data, pd.DataFrame):
+        return data if columns is None else data[columns]
+    return data.materialize(columns)
+
+###############################################Traffic Volume#############################################
+
+# Function to count the packets and bytes per value of one or more columns
+def traffic_volume(dataframe, columns):
+    """
+    Counts the packets, bytes and mean frame size per value of one or more columns.
+
+    The packet count and the byte total come from the same grouped aggregation over the Length
+    column, so the byte accounting does not need a second pass over the data.
+
+    Parameters:
+    dataframe (pd.DataFrame or SQLCapture): The DataFrame containing the data, with a 'Length' column.
+    columns (str or list): The column(s) to group by (e.g. 'Protocol' or ['Source_Type', 'Source']).
+
+    Returns:
+    pd.DataFrame: A DataFrame indexed by the column value(s) with the columns 'Packets', 'Bytes' and 'Mean_Bytes'.
+    """
+    if not isinstance(dataframe, pd.DataFrame):
+        return dataframe.traffic_volume(columns)
+    volume = dataframe.groupby(columns, observed=True, sort=False)['Length'].agg(['size', 'sum'])
+    volume.columns = ['Packets', 'Bytes']
+    volume['Mean_Bytes'] = (volume['Bytes'] / volume['Packets']).round(2)
+    return volume
+
+
+# Function to collapse a multi-level traffic volume to one of its levels
+def collapse_volume(volume, level):
+    """
+    Sums a traffic volume computed over several columns down to one of them.
+
+    Parameters:
+    volume (pd.DataFrame): The output of traffic_volume for several columns.
+    level (str): The index level to keep.
+
+    Returns:
+    pd.DataFrame: The traffic volume per value of the level.
+    """
+    collapsed = volume.groupby(level=level, observed=True, sort=False)[['Packets', 'Bytes']].sum()
+    collapsed['Mean_Bytes'] = (collapsed['Bytes'] / collapsed['Packets']).round(2)
+    return collapsed
+
+
+# Function to convert a traffic volume to a list of records
+def volume_records(volume, key, top_n=None, by='Packets'):
+    """
+    Converts a traffic volume (see analyze.traffic_volume) to a list of records sorted by packets or bytes.
+
+    Parameters:
+    volume (pd.DataFrame): The traffic volume.
+    key (str): The name of the field holding the value (e.g. 'source').
+    top_n (int): The number of records to keep, None keeps all of them.
+    by (str): 'Packets' or 'Bytes'.
+
+    Returns:
+    list: Dictionaries with the keys <key>, 'packets', 'bytes' and 'mean_bytes'.
+    """
+    volume = volume.sort_values(by, ascending=False)
+    if top_n is not None:
+        volume = volume.head(top_n)
+    return [
+        {key: to_builtin(value), 'packets': int(row.Packets), 'bytes': int(row.Bytes), 'mean_bytes': float(row.Mean_Bytes)}
+        for value, row in zip(volume.index, volume.itertuples(index=False))
+    ]
+
+
+# Function to keep the top-N lists of a traffic volume in the snapshot
+def snapshot_top(volume, key):
+    """
+    Keeps the snapshot_top_n first values of a traffic volume, by packets and by bytes, in snapshot['top'][key].
+
+    Parameters:
+    volume (pd.DataFrame): The output of traffic_volume.
+    key (str): The dimension (e.g. 'source').
+    """
+    snapshot.setdefault('top', {})[key] = {'by_packets': volume_records(volume, key, snapshot_top_n),
+                                           'by_bytes': volume_records(volume, key, snapshot_top_n, 'Bytes')}
+
+
+# Function to compute the top talker metrics (by packets and by bytes) of a traffic volume
+def top_volume_metrics(volume, key):
+    """
+    Computes the value with the most packets and the value with the most bytes of a traffic volume.
+
+    Parameters:
+    volume (pd.DataFrame): The output of traffic_volume.
+    key (str): The prefix of the metric names (e.g. 'source').
+
+    Returns:
+    dict: The metrics top_<key>_ip, top_<key>_packets, top_<key>_percent (share of the packets),
+          top_<key>_by_bytes, top_<key>_bytes and top_<key>_bytes_percent (share of the bytes).
+          Empty if the volume is empty.
+    """
+    if volume.empty:
+        return {}
+    total_packets = volume['Packets'].sum()
+    total_bytes = volume['Bytes'].sum()
+    top_value = volume['Bytes'].idxmax()
+    top_bytes = volume['Bytes'].max()
+    return {
+        f'top_{key}_ip': volume['Packets'].idxmax(),
+        f'top_{key}_packets': int(volume['Packets'].max()),
+        f'top_{key}_percent': round((volume['Packets'].max() / total_packets) * 100, 2),
+        f'top_{key}_by_bytes': top_value,
+        f'top_{key}_bytes': int(top_bytes),
+        f'top_{key}_bytes_percent': round((top_bytes / total_bytes) * 100, 2) if total_bytes else 0.0,
+    }
+
+
+# Function to add the top talker by bytes to the summary
+def summarize_volume(volume, label, key, verb):
+    """
+    Adds the value with the most bytes, its share of the bytes and its mean frame size to the summary
+    and records them in the aggregates as top_<key>_by_bytes, top_<key>_bytes and top_<key>_bytes_percent.
+
+    Parameters:
+    volume (pd.DataFrame): The output of traffic_volume.
+    label (str): The label used in the summary (e.g. 'Source IP').
+    key (str): The key used in the aggregates (e.g. 'source').
+    verb (str): The verb used in the summary (e.g. 'sent').
+    """
+    if volume.empty:
+        return
+    metrics = top_volume_metrics(volume, key)
+    total_bytes = volume['Bytes'].sum()
+    top_value = metrics[f'top_{key}_by_bytes']
+    top_bytes = metrics[f'top_{key}_bytes']
+    top_bytes_percent = metrics[f'top_{key}_bytes_percent']
+    aggregates.update({
+        f'top_{key}_by_bytes': top_value,
+        f'top_{key}_bytes': top_bytes,
+        f'top_{key}_bytes_percent': top_bytes_percent,
+    })
+
+    add_summary_row(f"Top {label} by bytes: {top_value}")
+    add_summary_row(f"Total number of bytes {verb}: {top_bytes} ({top_bytes_percent}% of {total_bytes} bytes).")
+    add_summary_row(f"Mean frame size: {volume.loc[top_value, 'Mean_Bytes']} bytes over {volume.loc[top_value, 'Packets']} packets.")
+
 #########################################################################Data Analysis#########################################################################
 warnings.filterwarnings("ignore")
 
+# Function to add the address type columns to the data
+def identify_address_types(data):
+    """
+    Adds the 'Source_Type' and 'Destination_Type' columns (see identify_address_type) to the data.
+
+    Parameters:
+    data (pd.DataFrame or SQLCapture): The input DataFrame containing network data, without missing values.
+
+    Returns:
+    pd.DataFrame or SQLCapture: The data with the address type columns.
+    """
+    if not isinstance(data, pd.DataFrame):
+        return data.identify_address_types()
+    # The type only depends on the address and on whether the protocol is ARP, so every distinct pair is classified once
+    arp = (data['Protocol'] == 'ARP').to_numpy()
+    for column in ('Source', 'Destination'):
+        codes, pairs = pd.factorize(pd.MultiIndex.from_arrays([data[column].astype(str), arp]))
+        types = pd.Series([identify_address_type(address, 'ARP' if is_arp else '') for address, is_arp in pairs])
+        data.loc[:, f'{column}_Type'] = types.to_numpy()[codes]
+    return data
+
 def data_preprocessing(data):
     """
     Perform data preprocessing on the input DataFrame.
 
     This function performs the following steps:
-    1. Checks for missing values in the dataset and removes rows with missing values.
-    2. Identifies the type of network address for each source and destination address.
+    1. Reports the number of malformed lines skipped while loading the capture (see capture_schema.load_capture).
+    2. Checks for missing values in the dataset and removes rows with missing values.
+    3. Flags the registered keywords of the Info column (see info_flags.py) with one scan.
+    4. Identifies the type of network address for each source and destination address.
 
     Parameters:
     data (pd.DataFrame): The input DataFrame containing network data.
 
     Returns:
-    pd.DataFrame: The preprocessed DataFrame with missing values removed and address types identified.
+    pd.DataFrame: The preprocessed DataFrame with missing values removed, the Info flags and the address types identified.
     """
     print("\nData Preprocessing")
     print("=" * 40)  # Separator for clarity
-    table_summary.add_row(["*********Data Preprocessing*********"])
+    add_summary_row("*********Data Preprocessing*********")
+    snapshot['summary'] = {'rows': data.shape[0], 'skipped_lines': data.attrs.get('skipped_lines')}
+
+    # Report the malformed lines skipped by the loader, if the capture was loaded with load_capture
+    if 'skipped_lines' in data.attrs:
+        print(f"The number of malformed lines skipped while loading the capture is {data.attrs['skipped_lines']}")
+        add_summary_row(f"Malformed lines skipped while loading the capture: {data.attrs['skipped_lines']}")
 
     # Check for missing values in the dataset
-    if data.isnull().sum().sum() == 0:
+    # Only the capture schema columns are checked, the extra TLS field columns are empty outside the handshakes
+    missing_value_rows = data[schema_columns(data)].isnull().any(axis=1).sum() if isinstance(data, pd.DataFrame) else data.missing_value_rows()
+    if missing_value_rows == 0:
         print("There are no missing values in the dataset")
-        table_summary.add_row(["No missing values in the dataset"])
+        add_summary_row("No missing values in the dataset")
     else:
         print("There are missing values in the dataset")
-        print(f"The total number of rows with missing values is {data.isnull().any(axis=1).sum()}")
-        table_summary.add_row(["Missing values in the dataset"])
-        table_summary.add_row([f"Total number of rows with missing values: {data.isnull().any(axis=1).sum()}"])
+        print(f"The total number of rows with missing values is {missing_value_rows}")
+        add_summary_row("Missing values in the dataset")
+        add_summary_row(f"Total number of rows with missing values: {missing_value_rows}")
+    snapshot['summary']['rows_with_missing_values'] = int(missing_value_rows)
     
     # Remove rows with missing values
-    data = data.dropna()
+    data = data.dropna(subset=schema_columns(data)) if isinstance(data, pd.DataFrame) else data.dropna()
     print(f"The dataset has {data.shape[0]} rows and {data.shape[1]} columns after deleting rows with missing values")
-    table_summary.add_row([f"Total number of rows after deleting rows with missing values: {data.shape[0]}"])
+    add_summary_row(f"Total number of rows after deleting rows with missing values: {data.shape[0]}")
+
+    # Flag the keywords of the Info column once, the later stages filter on the Info_Flags bitmask
+    data = flag_info(data)
+    flags = count_flags(data)
+    aggregates['malformed_packets'] = flags['MALFORMED']
+    aggregates['malformed_percent'] = round(flags['MALFORMED'] / data.shape[0] * 100, 2) if data.shape[0] else 0.0
+    snapshot['summary']['info_flags'] = flags
+    add_summary_row("Rows flagged in the Info column: " + (", ".join(f"{name} {rows}" for name, rows in flags.items() if rows) or "none"))
+    if flags['MALFORMED']:
+        add_summary_row(f"Malformed packets: {flags['MALFORMED']} ({aggregates['malformed_percent']}%)")
 
     # Identify the address type for each source and destination address
-    data.loc[:, 'Source_Type'] = data.apply(lambda x: identify_address_type(x['Source'], x['Protocol']), axis=1)
-    data.loc[:, 'Destination_Type'] = data.apply(lambda x: identify_address_type(x['Destination'], x['Protocol']), axis=1)
+    data = identify_address_types(data)
     
     # Add a blank row to the summary table for better readability
-    table_summary.add_row([""])
+    add_summary_row("")
     
     return data
 
@@ -249,11 +632,13 @@ def source_analysis(data):
     Perform source analysis on the input DataFrame.
 
     This function performs the following steps:
-    1. Analyzes the top 10 source addresses with the highest number of packets.
-    2. Analyzes the top 10 private source addresses with the highest number of packets.
-    3. Analyzes the top 10 public source addresses with the highest number of packets.
-    4. Analyzes the top 10 IPv6 source addresses with the highest number of packets.
-    5. Captures the top source IP address and the percentage of packets it sent.
+    1. Counts the packets and bytes (Length column) per source address and address type in one grouped pass.
+    2. Analyzes the top 10 source addresses with the highest number of packets and bytes.
+    3. Analyzes the top 10 private source addresses with the highest number of packets and bytes.
+    4. Analyzes the top 10 public source addresses with the highest number of packets and bytes.
+    5. Analyzes the top 10 IPv6 source addresses with the highest number of packets and bytes.
+    6. Captures the top source IP address and the percentage of packets it sent.
+    7. Captures the top source IP address by bytes and the percentage of bytes it sent.
 
     Parameters:
     data (pd.DataFrame): The input DataFrame containing network data.
@@ -261,73 +646,83 @@ def source_analysis(data):
     Returns:
     None
     """
-    global count
     print("\nSource Analysis")
     print("=" * 40)  # Separator for clarity
 
-    data_temp = data.copy()
+    # Packets, bytes and mean frame size per source address and type, every chart below is a slice of it
+    volume_by_type = traffic_volume(data, ['Source_Type', 'Source'])
+    volume = collapse_volume(volume_by_type, 'Source')
+    address_types = volume_by_type.index.get_level_values('Source_Type')
     
-    # Top 10 source addresses with the highest number of packets
+    # Top 10 source addresses with the highest number of packets and bytes
     print("\nSource Analysis for All Addresses")
-    if 'Source' in data_temp.columns:
-        plot_filename = "top10_source_ips.png"
-        Top10(data_temp, 'Source', 'Source IPs', plot_filename)
+    if 'Source' in data.columns:
+        plot_top10(volume['Packets'], 'Source', 'Source IPs', "top10_source_ips.png")
+        plot_top10(volume['Bytes'], 'Source', 'Source IPs by Bytes', "top10_source_ips_bytes.png", ylabel='Number of Bytes')
     else:
         print("The dataset does not have a 'Source' column")
-        table_summary.add_row(["*********Source Analysis*********"])
-        table_summary.add_row(["The dataset does not have a 'Source' column"])
-        table_summary.add_row([""])
+        add_summary_row("*********Source Analysis*********")
+        add_summary_row("The dataset does not have a 'Source' column")
+        add_summary_row("")
     
     # Drop all rows except for the Source Type is Private
     # First check if there exists Private Source addresses
     print("\nSource Analysis for Private Addresses")
-    if len(data_temp[data_temp['Source_Type'] == 'Private']) > 0:
-        plot_filename = "top10_private_source_ips.png"
-        Top10(data_temp[data_temp['Source_Type'] == 'Private'], 'Source', 'Private Source IPs', plot_filename)
+    if 'Private' in address_types:
+        typed_volume = volume_by_type.xs('Private', level='Source_Type')
+        plot_top10(typed_volume['Packets'], 'Source', 'Private Source IPs', "top10_private_source_ips.png")
+        plot_top10(typed_volume['Bytes'], 'Source', 'Private Source IPs by Bytes', "top10_private_source_ips_bytes.png", ylabel='Number of Bytes')
     else:
         print("The dataset does not have Private Source IPs")
-        table_summary.add_row(["********Source Analysis for Private IPs********"])
-        table_summary.add_row(["The dataset does not have Private Source IPs"])
-        table_summary.add_row([""])
+        add_summary_row("********Source Analysis for Private IPs********")
+        add_summary_row("The dataset does not have Private Source IPs")
+        add_summary_row("")
 
-    # Top 10 Public source addresses with the highest number of packets
+    # Top 10 Public source addresses with the highest number of packets and bytes
     print("\nSource Analysis for Public Addresses")
-    if len(data_temp[data_temp['Source_Type'] == 'Public']) > 0:
-        plot_filename = "top10_public_source_ips.png"
-        Top10(data_temp[data_temp['Source_Type'] == 'Public'], 'Source', 'Public Source IPs', plot_filename)
+    if 'Public' in address_types:
+        typed_volume = volume_by_type.xs('Public', level='Source_Type')
+        plot_top10(typed_volume['Packets'], 'Source', 'Public Source IPs', "top10_public_source_ips.png")
+        plot_top10(typed_volume['Bytes'], 'Source', 'Public Source IPs by Bytes', "top10_public_source_ips_bytes.png", ylabel='Number of Bytes')
     else:
         print("The dataset does not have Public Source IPs")
-        table_summary.add_row(["********Source Analysis for Public IPs********"])
-        table_summary.add_row(["The dataset does not have Public Source IPs"])
-        table_summary.add_row([""])
+        add_summary_row("********Source Analysis for Public IPs********")
+        add_summary_row("The dataset does not have Public Source IPs")
+        add_summary_row("")
     
-    # Top 10 IPv6 source addresses with the highest number of packets
+    # Top 10 IPv6 source addresses with the highest number of packets and bytes
     print("Source Analysis for IPv6 Addresses")
-    if len(data[data['Source_Type'] == 'IPv6']) > 0:
-        plot_filename = "top10_ipv6_source_ips.png"
-        Top10(data[data['Source_Type'] == 'IPv6'], 'Source', 'IPv6 Source IPs', plot_filename)
+    if 'IPv6' in address_types:
+        typed_volume = volume_by_type.xs('IPv6', level='Source_Type')
+        plot_top10(typed_volume['Packets'], 'Source', 'IPv6 Source IPs', "top10_ipv6_source_ips.png")
+        plot_top10(typed_volume['Bytes'], 'Source', 'IPv6 Source IPs by Bytes', "top10_ipv6_source_ips_bytes.png", ylabel='Number of Bytes')
     else:
         print("The dataset does not have IPv6 Source IPs")
-        table_summary.add_row(["********Source Analysis for IPv6 IPs********"])
-        table_summary.add_row(["The dataset does not have IPv6 Source IPs"])
-        table_summary.add_row([""])
+        add_summary_row("********Source Analysis for IPv6 IPs********")
+        add_summary_row("The dataset does not have IPv6 Source IPs")
+        add_summary_row("")
 
     # Capture the top source IP address and the percentage of packets it sent
-    top_source_ip = data['Source'].value_counts().idxmax()
-    top_source_ip_packets = data['Source'].value_counts().max()
-
-    table_summary.add_row(["***********Top Source IP Analysis***********"])
-    if top_source_ip_packets > (data['Source'].count() / 2):
-        table_summary.add_row([f"Top Source IP: {top_source_ip}"])
-        table_summary.add_row([f"Total number of packets sent: {top_source_ip_packets}."])
-        table_summary.add_row([f"Percentage of packets sent by the top Source IP: {round((top_source_ip_packets / data['Source'].count()) * 100, 2)}%."])
-        table_warnings.add_row([f"{count}", 'Source IP', f'{top_source_ip} sent more than 50% of the total packets.', 'Investigate - potential malware or DDoS attack'])
-        count += 1
-    else:
-        table_summary.add_row([f"Top Source IP: {top_source_ip}"])
-        table_summary.add_row([f"Total number of packets sent: {top_source_ip_packets}."])
-        table_summary.add_row([f"Percentage of packets sent by the top Source IP: {round((top_source_ip_packets / data['Source'].count()) * 100, 2)}%."])
-        table_summary.add_row(["The top Source IP did not send more than 50% of the total packets."])
+    metrics = top_volume_metrics(volume, 'source')
+    aggregates.update({'total_packets': int(volume['Packets'].sum()), 'total_bytes': int(volume['Bytes'].sum())})
+    top_source_ip = metrics['top_source_ip']
+    top_source_ip_packets = metrics['top_source_packets']
+    top_source_percent = metrics['top_source_percent']
+    aggregates.update({key: metrics[key] for key in ('top_source_ip', 'top_source_packets', 'top_source_percent')})
+    snapshot_top(volume, 'source')
+    snapshot.setdefault('summary', {}).update({
+        'total_packets': aggregates['total_packets'],
+        'total_bytes': aggregates['total_bytes'],
+        'source_address_types': {str(key): int(value) for key, value in volume_by_type.groupby(level='Source_Type', observed=True)['Packets'].sum().items()},
+    })
+
+    add_summary_row("***********Top Source IP Analysis***********")
+    add_summary_row(f"Top Source IP: {top_source_ip}")
+    add_summary_row(f"Total number of packets sent: {top_source_ip_packets}.")
+    add_summary_row(f"Percentage of packets sent by the top Source IP: {top_source_percent}%.")
+
+    # Capture the top source IP address by bytes and the percentage of bytes it sent
+    summarize_volume(volume, 'Source IP', 'source', 'sent')
 
   
 
@@ -336,11 +731,13 @@ def destination_analysis(data):
     Perform destination analysis on the input DataFrame.
 
     This function performs the following steps:
-    1. Analyzes the top 10 destination addresses with the highest number of packets.
-    2. Analyzes the top 10 private destination addresses with the highest number of packets.
-    3. Analyzes the top 10 public destination addresses with the highest number of packets.
-    4. Analyzes the top 10 IPv6 destination addresses with the highest number of packets.
-    5. Captures the top destination IP address and the percentage of packets it received.
+    1. Counts the packets and bytes (Length column) per destination address and address type in one grouped pass.
+    2. Analyzes the top 10 destination addresses with the highest number of packets and bytes.
+    3. Analyzes the top 10 private destination addresses with the highest number of packets and bytes.
+    4. Analyzes the top 10 public destination addresses with the highest number of packets and bytes.
+    5. Analyzes the top 10 IPv6 destination addresses with the highest number of packets and bytes.
+    6. Captures the top destination IP address and the percentage of packets it received.
+    7. Captures the top destination IP address by bytes and the percentage of bytes it received.
 
     Parameters:
     data (pd.DataFrame): The input DataFrame containing network data.
@@ -348,83 +745,144 @@ def destination_analysis(data):
     Returns:
     None
     """
-    global count
     print("\nDestination Analysis")
     print("=" * 40)  # Separator for clarity
 
-    data_temp = data.copy()
+    # Packets, bytes and mean frame size per destination address and type, every chart below is a slice of it
+    volume_by_type = traffic_volume(data, ['Destination_Type', 'Destination'])
+    volume = collapse_volume(volume_by_type, 'Destination')
+    address_types = volume_by_type.index.get_level_values('Destination_Type')
     
-    # Top 10 destination addresses with the highest number of packets
+    # Top 10 destination addresses with the highest number of packets and bytes
     print("\nDestination Analysis for All Addresses")
-    if 'Destination' in data_temp.columns:
-        plot_filename = "top10_destination_ips.png"
-        Top10(data_temp, 'Destination', 'Destination IPs', plot_filename)
+    if 'Destination' in data.columns:
+        plot_top10(volume['Packets'], 'Destination', 'Destination IPs', "top10_destination_ips.png")
+        plot_top10(volume['Bytes'], 'Destination', 'Destination IPs by Bytes', "top10_destination_ips_bytes.png", ylabel='Number of Bytes')
     else:
         print("The dataset does not have a 'Destination' column")
-        table_summary.add_row(["*********Destination Analysis*********"])
-        table_summary.add_row(["The dataset does not have a 'Destination' column"])
-        table_summary.add_row([""])
+        add_summary_row("*********Destination Analysis*********")
+        add_summary_row("The dataset does not have a 'Destination' column")
+        add_summary_row("")
     
     # Drop all rows except for the Destination Type is Private
     # First check if there exists Private Destination addresses
     print("\nDestination Analysis for Private Addresses")
-    if len(data_temp[data_temp['Destination_Type'] == 'Private']) > 0:
-        plot_filename = "top10_private_destination_ips.png"
-        Top10(data_temp[data_temp['Destination_Type'] == 'Private'], 'Destination', 'Private Destination IPs', plot_filename)
+    if 'Private' in address_types:
+        typed_volume = volume_by_type.xs('Private', level='Destination_Type')
+        plot_top10(typed_volume['Packets'], 'Destination', 'Private Destination IPs', "top10_private_destination_ips.png")
+        plot_top10(typed_volume['Bytes'], 'Destination', 'Private Destination IPs by Bytes', "top10_private_destination_ips_bytes.png", ylabel='Number of Bytes')
     else:
         print("The dataset does not have Private Destination IPs")
-        table_summary.add_row(["Destination Analysis for Private Addresses"])
-        table_summary.add_row(["The dataset does not have Private Destination IPs"])
-        table_summary.add_row([""])
+        add_summary_row("Destination Analysis for Private Addresses")
+        add_summary_row("The dataset does not have Private Destination IPs")
+        add_summary_row("")
 
-    # Top 10 Public destination addresses with the highest number of packets
+    # Top 10 Public destination addresses with the highest number of packets and bytes
     print("\nDestination Analysis for Public Addresses")
-    if len(data_temp[data_temp['Destination_Type'] == 'Public']) > 0:
-        plot_filename = "top10_public_destination_ips.png"
-        Top10(data_temp[data_temp['Destination_Type'] == 'Public'], 'Destination', 'Public Destination IPs', plot_filename)
+    if 'Public' in address_types:
+        typed_volume = volume_by_type.xs('Public', level='Destination_Type')
+        plot_top10(typed_volume['Packets'], 'Destination', 'Public Destination IPs', "top10_public_destination_ips.png")
+        plot_top10(typed_volume['Bytes'], 'Destination', 'Public Destination IPs by Bytes', "top10_public_destination_ips_bytes.png", ylabel='Number of Bytes')
     else:
         print("The dataset does not have Public Destination IPs")
-        table_summary.add_row(["Destination Analysis for Public Addresses"])
-        table_summary.add_row(["The dataset does not have Public Destination IPs"])
-        table_summary.add_row([""])
+        add_summary_row("Destination Analysis for Public Addresses")
+        add_summary_row("The dataset does not have Public Destination IPs")
+        add_summary_row("")
 
-    # Top 10 IPv6 destination addresses with the highest number of packets
+    # Top 10 IPv6 destination addresses with the highest number of packets and bytes
     print("Destination Analysis for IPv6 Addresses")
-    if len(data[data['Destination_Type'] == 'IPv6']) > 0:
-        plot_filename = "top10_ipv6_destination_ips.png"
-        Top10(data[data['Destination_Type'] == 'IPv6'], 'Destination', 'IPv6 Destination IPs', plot_filename)
+    if 'IPv6' in address_types:
+        typed_volume = volume_by_type.xs('IPv6', level='Destination_Type')
+        plot_top10(typed_volume['Packets'], 'Destination', 'IPv6 Destination IPs', "top10_ipv6_destination_ips.png")
+        plot_top10(typed_volume['Bytes'], 'Destination', 'IPv6 Destination IPs by Bytes', "top10_ipv6_destination_ips_bytes.png", ylabel='Number of Bytes')
     else:
         print("The dataset does not have IPv6 Destination IPs")
-        table_summary.add_row(["Destination Analysis for IPv6 Addresses"])
-        table_summary.add_row(["The dataset does not have IPv6 Destination IPs"])
-        table_summary.add_row([""])
+        add_summary_row("Destination Analysis for IPv6 Addresses")
+        add_summary_row("The dataset does not have IPv6 Destination IPs")
+        add_summary_row("")
 
     # Capture the top destination IP address and the percentage of packets it received
-    top_destination_ip = data['Destination'].value_counts().idxmax()
-    top_destination_ip_packets = data['Destination'].value_counts().max()
-
-    table_summary.add_row(["***********Top Destination IP Analysis***********"])
-    if top_destination_ip_packets > (data['Destination'].count() / 2):
-        table_summary.add_row([f"Top Destination IP: {top_destination_ip}"])
-        table_summary.add_row([f"Total number of packets received: {top_destination_ip_packets}."])
-        table_summary.add_row([f"Percentage of packets received by the top Destination IP: {round((top_destination_ip_packets / data['Destination'].count()) * 100, 2)}%."])
-        table_warnings.add_row([f"{count}", 'Destination IP', f'{top_destination_ip} received more than 50% of the total packets.', 'Investigate - potential malware or DDoS attack'])
-        count += 1
-    else:
-        table_summary.add_row([f"Top Destination IP: {top_destination_ip}"])
-        table_summary.add_row([f"Total number of packets received: {top_destination_ip_packets}."])
-        table_summary.add_row([f"Percentage of packets received by the top Destination IP: {round((top_destination_ip_packets / data['Destination'].count()) * 100, 2)}%."])
-        table_summary.add_row(["The top Destination IP did not receive more than 50% of the total packets."])
+    metrics = top_volume_metrics(volume, 'destination')
+    top_destination_ip = metrics['top_destination_ip']
+    top_destination_ip_packets = metrics['top_destination_packets']
+    top_destination_percent = metrics['top_destination_percent']
+    aggregates.update({key: metrics[key] for key in ('top_destination_ip', 'top_destination_packets', 'top_destination_percent')})
+    snapshot_top(volume, 'destination')
+    snapshot.setdefault('summary', {})['destination_address_types'] = {
+        str(key): int(value) for key, value in volume_by_type.groupby(level='Destination_Type', observed=True)['Packets'].sum().items()}
+
+    add_summary_row("***********Top Destination IP Analysis***********")
+    add_summary_row(f"Top Destination IP: {top_destination_ip}")
+    add_summary_row(f"Total number of packets received: {top_destination_ip_packets}.")
+    add_summary_row(f"Percentage of packets received by the top Destination IP: {top_destination_percent}%.")
+
+    # Capture the top destination IP address by bytes and the percentage of bytes it received
+    summarize_volume(volume, 'Destination IP', 'destination', 'received')
+ 
+# Function to build the conversation key of every packet
+def conversation_keys(data):
+    """
+    Builds the conversation key ('A <-> B') of every packet.
+
+    The two addresses are put in sorted order so that both directions map to the same conversation.
+
+    Parameters:
+    data (pd.DataFrame): The input DataFrame containing network data.
+
+    Returns:
+    pd.Series: The conversation key of every row.
+    """
+    source = data['Source'].astype(str)
+    destination = data['Destination'].astype(str)
+    in_order = source <= destination
+    return source.where(in_order, destination) + ' <-> ' + destination.where(in_order, source)
+
+
+def conversation_analysis(data):
+    """
+    Perform conversation analysis on the input DataFrame.
+
+    A conversation is the traffic between two addresses in both directions, as in the Wireshark
+    'Conversations' statistics.
+
+    This function performs the following steps:
+    1. Builds the conversation key of every packet ('A <-> B', with the two addresses in sorted order).
+    2. Counts the packets and bytes per conversation in one grouped pass.
+    3. Plots the top 10 conversations by packets and by bytes.
+    4. Captures the conversation with the most bytes.
+
+    Parameters:
+    data (pd.DataFrame): The input DataFrame containing network data.
+
+    Returns:
+    None
+    """
+    print("\nConversation Analysis")
+    print("=" * 40)  # Separator for clarity
+
+    # The DuckDB backend computes the conversation keys while preprocessing
+    if 'Conversation' not in data.columns:
+        data = data.assign(Conversation=conversation_keys(data))
+    volume = traffic_volume(data, 'Conversation')
+    plot_top10(volume['Packets'], 'Conversation', 'Conversations', 'top10_conversations.png')
+    plot_top10(volume['Bytes'], 'Conversation', 'Conversations by Bytes', 'top10_conversations_bytes.png', ylabel='Number of Bytes')
+
+    add_summary_row("***********Top Conversation Analysis***********")
+    add_summary_row(f"Total number of conversations: {len(volume)}")
+    snapshot.setdefault('summary', {})['conversations'] = len(volume)
+    snapshot_top(volume, 'conversation')
+    summarize_volume(volume, 'Conversation', 'conversation', 'exchanged')
  
 ######################################Protocol Analysis#############################################
 
 
-def extract_TCP_details(data):
+# Function to parse the TCP details out of the Info column of the TCP rows
+def parse_TCP_details(tcp_data):
     """
-    Extract TCP details from a given dataframe.
+    Parses the ports, TCP message and TCP control message out of the Info column of TCP rows.
 
     Args:
-        data (pd.DataFrame): The input dataframe containing TCP details in a specific format.
+        tcp_data (pd.DataFrame): The TCP rows (Protocol is 'TCP') of the preprocessed data.
 
     Returns:
         pd.DataFrame: A dataframe with extracted TCP details including:
@@ -432,173 +890,192 @@ def extract_TCP_details(data):
             - Source_Port (str): Source port.
             - Destination_Port (str): Destination port.
             - TCP_Control_Msg (str): The full TCP control message within brackets.
+            - Length (int): The frame length in bytes.
+            - Time (float): The timestamp of the packet, if the data has a Time column.
+            - Seq, Ack, Win and Len (Int64): The numeric fields of the Info column, missing when not present.
+            - Info_Flags (uint16): The keyword flags of the Info column (see info_flags.py).
+            - Source_IP:TCP_Port and Destination_IP:TCP_Port (str): The address and port combinations.
     """
-    global count
-    print("\nTCP Analysis")
-    print("=" * 40)  # Separator for clarity
-    table_summary.add_row(["*********TCP Analysis********"])
-    # Create a tcp_data dataframe from the input data
-    # Filter the dataframe for rows where Protocol is 'TCP'
-    tcp_data = data[data['Protocol'] == 'TCP']
-
-    if tcp_data.empty:
-        print("No TCP data found in the input dataframe.")
-        return pd.DataFrame()
-    else:
-        # Initialize lists to store extracted details
-        tcp_msgs = []
-        source_ports = []
-        destination_ports = []
-        tcp_control_msgs = []
-
-        for info in tcp_data['Info']:
-            # Initialize default values
-            TCP_Msg = 'None'
-            source_port = None
-            destination_port = None
-            tcp_control_msg = None
-
-            # Split the input string based on ']'
-            temp_string = info.split(']')
-            
-            try:
-                # Determine if there's a TCP message at the start
-                for element in temp_string:
-                    if '>' in element:
-                        item = temp_string.index(element)
-
-                        if item == 0:
-                            source_temp = temp_string[0].split('>')
-                        elif item == 1:
-                            TCP_Msg = temp_string[0].strip('[')
-                            source_temp = temp_string[1].split('>')
-                        elif item == 2:
-                            TCP_Msg = temp_string[0].strip('[')
-                            source_temp = temp_string[2].split('>')
-                        else:
-                            TCP_Msg = None
-                            source_temp = None
-
+    # Initialize lists to store extracted details
+    tcp_msgs = []
+    source_ports = []
+    destination_ports = []
+    tcp_control_msgs = []
+
+    for info in tcp_data['Info']:
+        # Initialize default values
+        TCP_Msg = 'None'
+        source_port = None
+        destination_port = None
+        tcp_control_msg = None
+        # Reset per row, an Info without ports (e.g. only '[Malformed Packet]') must not reuse the ports of the previous row
+        source_temp = None
+
+        # Split the input string based on ']'
+        temp_string = info.split(']')
+        
+        try:
+            # Determine if there's a TCP message at the start
+            for element in temp_string:
+                if '>' in element:
+                    item = temp_string.index(element)
+
+                    if item == 0:
+                        source_temp = temp_string[0].split('>')
+                    elif item == 1:
+                        TCP_Msg = temp_string[0].strip('[')
+                        source_temp = temp_string[1].split('>')
+                    elif item == 2:
+                        TCP_Msg = temp_string[0].strip('[')
+                        source_temp = temp_string[2].split('>')
+                    else:
+                        TCP_Msg = None
+                        source_temp = None
+
+            if source_temp is not None:
                 # Extract source port
                 source_port = source_temp[0].strip()
-                
+
                 # Extract destination port and control message
                 destination_temp = source_temp[1].split(' ')
                 destination_temp = list(filter(None, destination_temp))  # Remove blank elements
                 destination_port = destination_temp[0]
-                
+
                 # Capture the full control message within brackets
                 control_msg_index = source_temp[1].find('[')
                 if control_msg_index != -1:
                     tcp_control_msg = source_temp[1][control_msg_index:].strip('[]')  # Capture all within brackets
 
-            except (IndexError, ValueError) as e:
-                print(f"Error processing TCP details: {e} for input:{info}")
-
-            # Append extracted details to lists
-            tcp_msgs.append(TCP_Msg)
-            source_ports.append(source_port)
-            destination_ports.append(destination_port)
-            tcp_control_msgs.append(tcp_control_msg)
-        
+        except (IndexError, ValueError) as e:
+            print(f"Error processing TCP details: {e} for input:{info}")
+
+        # Append extracted details to lists
+        tcp_msgs.append(TCP_Msg)
+        source_ports.append(source_port)
+        destination_ports.append(destination_port)
+        tcp_control_msgs.append(tcp_control_msg)
+
+    # Create a new dataframe with the extracted details
+    # Addresses are converted to plain strings as the capture schema loads them as categoricals
+    extracted_data = pd.DataFrame({
+        'Source': tcp_data['Source'].astype(str).values,
+        # Nullable strings, so the address and port combinations below stay missing when a row has no ports
+        'Source_Port': pd.array(source_ports, dtype='string'),
+        'Source_Type': tcp_data['Source_Type'].values,
+        'Destination': tcp_data['Destination'].astype(str).values,
+        'Destination_Port': pd.array(destination_ports, dtype='string'),
+        'Destination_Type': tcp_data['Destination_Type'].values,
+        'TCP_Msg': tcp_msgs,
+        'TCP_Control_Msg': tcp_control_msgs,
+        'Length': tcp_data['Length'].values
+    })
+    if 'Time' in tcp_data.columns:
+        extracted_data['Time'] = tcp_data['Time'].values
+    # Extract the Seq, Ack, Win and Len fields with one vectorized pass over the Info column
+    extracted_data[TCP_FIELDS] = extract_tcp_fields(tcp_data['Info']).reset_index(drop=True)
+    extracted_data[FLAGS_COLUMN] = info_flags(tcp_data).to_numpy()
+    # Create two new columns in the dataframe called 'SourceIP and Port' and 'DestinationIP and Port'.
+    # Combine the Source and Destination IP addresses with their respective ports separated by a colon
+    extracted_data['Source_IP:TCP_Port'] = extracted_data['Source'] + ':' + extracted_data['Source_Port']
+    extracted_data['Destination_IP:TCP_Port'] = extracted_data['Destination'] + ':' + extracted_data['Destination_Port']
+    return extracted_data
+
+
+# Function to compute the TCP control message metrics
+def tcp_control_metrics(extracted_data):
+    """
+    Counts the TCP control messages once and derives the RST, SYN and SYN/ACK metrics from the counts.
 
+    Args:
+        extracted_data (pd.DataFrame): The output of parse_TCP_details.
 
-        # Create a new dataframe with the extracted details
-        extracted_data = pd.DataFrame({
-            'Source': tcp_data['Source'].values,
-            'Source_Port': source_ports,
-            'Source_Type': tcp_data['Source_Type'].values,
-            'Destination': tcp_data['Destination'].values,
-            'Destination_Port': destination_ports,
-            'Destination_Type': tcp_data['Destination_Type'].values,
-            'TCP_Msg': tcp_msgs,
-            'TCP_Control_Msg': tcp_control_msgs
+    Returns:
+        dict: tcp_control_msgs, tcp_rst_count, tcp_syn_count and tcp_syn_ack_count, plus
+              tcp_rst_percent when RSTs are present and tcp_syn_percent, tcp_syn_ack_percent,
+              tcp_syn_minus_syn_ack_percent and tcp_syn_ack_minus_syn_percent when SYNs are present.
+    """
+    control_counts = value_counts(extracted_data, 'TCP_Control_Msg')
+    total_control_msgs = int(control_counts.sum())
+    rst_count = int(control_counts.get('RST', 0))
+    syn_count = int(control_counts.get('SYN', 0))
+    syn_ack_count = int(control_counts.get('SYN, ACK', 0))
+    percent_rst = round((rst_count / total_control_msgs) * 100, 2) if total_control_msgs else 0.0
+    percent_syn = round((syn_count / total_control_msgs) * 100, 2) if total_control_msgs else 0.0
+    percent_syn_ack = round((syn_ack_count / total_control_msgs) * 100, 2) if total_control_msgs else 0.0
+
+    metrics = {
+        'tcp_control_msgs': total_control_msgs,
+        'tcp_rst_count': rst_count,
+        'tcp_syn_count': syn_count,
+        'tcp_syn_ack_count': syn_ack_count,
+    }
+    if rst_count:
+        metrics['tcp_rst_percent'] = percent_rst
+    if syn_count:
+        metrics.update({
+            'tcp_syn_percent': percent_syn,
+            'tcp_syn_ack_percent': percent_syn_ack,
+            'tcp_syn_minus_syn_ack_percent': round(percent_syn - percent_syn_ack, 2),
+            'tcp_syn_ack_minus_syn_percent': round(percent_syn_ack - percent_syn, 2),
         })
-        # Create two new columns in the dataframe called 'SourceIP and Port' and 'DestinationIP and Port'.
-        # Combine the Source and Destination IP addresses with their respective ports separated by a colon
-        extracted_data['Source_IP:TCP_Port'] = extracted_data['Source'] + ':' + extracted_data['Source_Port']
-        extracted_data['Destination_IP:TCP_Port'] = extracted_data['Destination'] + ':' + extracted_data['Destination_Port']
-        # if TCP RST control messages are present, print the count of TCP RST control messages in the input data from total TCP control messages
-        table_summary.add_row(["*********TCP Control Message Analysis*********"])
-        if 'RST' in extracted_data['TCP_Control_Msg'].values:
-            table_summary.add_row(["TCP RST Analysis"])
-            table_summary.add_row([f"Total TCP RST control messages: {extracted_data['TCP_Control_Msg'].value_counts()['RST']} out of {extracted_data['TCP_Control_Msg'].count()} total TCP control messages"])
-            # calculate the percentage of TCP RST control messages from the total TCP control messages rounded to 2 decimal places
-            percent_rst = round((extracted_data['TCP_Control_Msg'].value_counts()['RST'] / extracted_data['TCP_Control_Msg'].count()) * 100, 2)
-            table_summary.add_row([f"Percentage of TCP RST control messages: {percent_rst}%"])
-            if percent_rst > 50:
-                table_summary.add_row([f"Warning: Percentage of TCP RST control messages: {percent_rst}% (High) !!!  Might need investigation !!!"])
-                table_warnings.add_row([f"'{count}','TCP RST','TCP RST control messages: {percent_rst}% (High)', 'Investigate further'"])
-                count += 1
-            elif percent_rst > 25:
-                table_warnings.add_row([f"'{count}','TCP RST','TCP RST control messages: {percent_rst}% (Moderate)','Monitor'"])
-                table_summary.add_row([f"Percentage of TCP RST control messages: {percent_rst}% (Moderate)\n"])
-                count += 1
-            else:
-                table_summary.add_row([f"Percentage of TCP RST control messages: {percent_rst}% (Low)\n"])
+    return metrics
+
+
+def extract_TCP_details(data):
+    """
+    Extract TCP details from a given dataframe.
+
+    Args:
+        data (pd.DataFrame): The input dataframe containing TCP details in a specific format.
+
+    Returns:
+        pd.DataFrame: A dataframe with extracted TCP details including:
+            - TCP_Msg (str): TCP message or 'None' if not present.
+            - Source_Port (str): Source port.
+            - Destination_Port (str): Destination port.
+            - TCP_Control_Msg (str): The full TCP control message within brackets.
+            - Length (int): The frame length in bytes.
+    """
+    print("\nTCP Analysis")
+    print("=" * 40)  # Separator for clarity
+    add_summary_row("*********TCP Analysis********")
+    # Create a tcp_data dataframe from the input data
+    # Filter the dataframe for rows where Protocol is 'TCP'
+    if isinstance(data, pd.DataFrame):
+        tcp_data = data[data['Protocol'] == 'TCP']
+    else:
+        # The DuckDB backend parses the Info column of the TCP rows in SQL
+        tcp_data = data.tcp_details()
+
+    if tcp_data.empty:
+        print("No TCP data found in the input dataframe.")
+        return pd.DataFrame()
+    else:
+        extracted_data = parse_TCP_details(tcp_data) if isinstance(tcp_data, pd.DataFrame) else tcp_data
+        metrics = tcp_control_metrics(extracted_data)
+        aggregates.update({key: value for key, value in metrics.items() if not key.endswith('_count')})
+        message_counts = {key: value_counts(extracted_data, column) for key, column in (('control_messages', 'TCP_Control_Msg'), ('messages', 'TCP_Msg'))
+                          if column in extracted_data.columns}
+        snapshot['tcp'] = {'metrics': metrics}
+        snapshot['tcp'].update({key: {str(message): int(messages) for message, messages in counts[counts > 0].items()} for key, counts in message_counts.items()})
+        total_control_msgs = metrics['tcp_control_msgs']
+
+        add_summary_row("*********TCP Control Message Analysis*********")
+        # if TCP RST control messages are present, add the count and percentage of TCP RST control messages to the summary
+        if metrics['tcp_rst_count']:
+            add_summary_row("TCP RST Analysis")
+            add_summary_row(f"Total TCP RST control messages: {metrics['tcp_rst_count']} out of {total_control_msgs} total TCP control messages")
+            add_summary_row(f"Percentage of TCP RST control messages: {metrics['tcp_rst_percent']}% ({metric_severity('tcp_rst_percent', metrics['tcp_rst_percent'])})")
 
         # Check the count of TCP SYN and SYN/ACK control messages in the input data
-        if 'SYN' in extracted_data['TCP_Control_Msg'].values:
-            table_summary.add_row(["TCP SYN Analysis"])
-            percent_syn = round((extracted_data['TCP_Control_Msg'].value_counts()['SYN'] / extracted_data['TCP_Control_Msg'].count()) * 100, 2)
-            table_summary.add_row([f"Total TCP SYN control messages: {extracted_data['TCP_Control_Msg'].value_counts()['SYN']} out of {extracted_data['TCP_Control_Msg'].count()} total TCP control messages"])
-            if percent_syn > 50:
-                table_summary.add_row([f"Percentage of TCP SYN control messages: {percent_syn}% (High) !!! Warning: Might need investigation !!!"])
-                table_warnings.add_row([f"'{count}','TCP SYN','TCP SYN control messages: {percent_syn}% (High)','Investigate further'"])
-                count += 1
-            elif percent_syn > 25:
-                table_summary.add_row([f"Percentage of TCP SYN control messages: {percent_syn}% (Moderate)"])
-                table_warnings.add_row([f"'{count}','TCP SYN','TCP SYN control messages: {percent_syn}% (Moderate)','Monitor'"])
-                count += 1
-            else:
-                table_summary.add_row([f"Percentage of TCP SYN control messages: {percent_syn}% (Low)"])
-        
-            if 'SYN, ACK' in extracted_data['TCP_Control_Msg'].values:
-                percent_syn_ack = round((extracted_data['TCP_Control_Msg'].value_counts()['SYN, ACK'] / extracted_data['TCP_Control_Msg'].count()) * 100, 2)
-                table_summary.add_row([f"Total TCP SYN/ACK control messages: {extracted_data['TCP_Control_Msg'].value_counts()['SYN, ACK']} out of {extracted_data['TCP_Control_Msg'].count()} total TCP control messages"])
-
-            if percent_syn_ack > 50:
-                table_summary.add_row([f"Percentage of TCP SYN/ACK control messages: {percent_syn_ack}% (High) !!! Warning: Might need investigation !!!"])
-                table_warnings.add_row([f"{count}", 'TCP SYN/ACK', f"TCP SYN/ACK control messages: {percent_syn_ack}% (High)", "Investigate further"])
-                count += 1
-            elif percent_syn_ack > 25:
-                table_summary.add_row([f"Percentage of TCP SYN/ACK control messages: {percent_syn_ack}% (Moderate)"])
-                table_warnings.add_row([f"{count}", "TCP SYN/ACK", f"TCP SYN/ACK control messages: {percent_syn_ack}% (Moderate)", "Monitor"])
-                count += 1
-            else:
-                table_summary.add_row([f"Percentage of TCP SYN/ACK control messages: {percent_syn_ack}% (Low)"])
-         
-            # if percent_syn and percent_syn_ack exist, compare the two values
-            if percent_syn == percent_syn_ack:
-                table_summary.add_row(["Percentage of TCP SYN and SYN/ACK control messages are equal, indicating a healthy environment."])
-            elif percent_syn > percent_syn_ack:
-                # if the difference between the percentage of SYN and SYN/ACK control messages is greater than 10, print a warning
-                if percent_syn - percent_syn_ack > 10:
-                    table_summary.add_row(["Warning: Percentage of TCP SYN control messages is higher than SYN/ACK control messages (Large difference)"])
-                    table_warnings.add_row([f"{count}", "TCP SYN", "TCP SYN count > SYN/ACK count (Large difference)",'Investigate further']) 
-                    count += 1
-                else:
-                    table_summary.add_row(["Percentage of TCP SYN control messages is higher than SYN/ACK control messages. This should be monitored for future captures."])
-                    table_warnings.add_row([f"{count}", "TCP SYN", "TCP SYN count > SYN/ACK count", "Monitor"])
-                    count += 1
-
-            
-                # if the difference between the percentage of SYN/ACK and SYN control messages is greater than 10, print a warning
-            elif percent_syn_ack - percent_syn > 10:
-                table_summary.add_row(["Warning: Percentage of TCP SYN/ACK control messages is higher than SYN control messages (Large difference)"])
-                table_warnings.add_row([f"{count}", "TCP SYN/ACK", "TCP SYN/ACK count > SYN count (Large difference)", "Investigate further - potential SYN flood attack"])
-                count += 1
-            else:
-                if percent_syn_ack != 0:
-                    ratio = percent_syn / percent_syn_ack
-                if ratio > 2:
-                    table_summary.add_row(["Percentage of TCP SYN control messages is higher than SYN/ACK control messages. This should be monitored for future captures."])
-                    table_warnings.add_row([f"{count}", "TCP SYN", "TCP SYN count > SYN/ACK count", "Monitor"])
-                    count += 1
-                else:
-                    table_summary.add_row(["Percentage of TCP SYN/ACK control messages is higher than SYN control messages. This should be monitored for future captures."])
-                    table_warnings.add_row([f"{count}", "TCP SYN/ACK", "TCP SYN/ACK count > SYN count", "Monitor"])
-                    count += 1
+        if metrics['tcp_syn_count']:
+            add_summary_row("TCP SYN Analysis")
+            add_summary_row(f"Total TCP SYN control messages: {metrics['tcp_syn_count']} out of {total_control_msgs} total TCP control messages")
+            add_summary_row(f"Percentage of TCP SYN control messages: {metrics['tcp_syn_percent']}% ({metric_severity('tcp_syn_percent', metrics['tcp_syn_percent'])})")
+            add_summary_row(f"Total TCP SYN/ACK control messages: {metrics['tcp_syn_ack_count']} out of {total_control_msgs} total TCP control messages")
+            add_summary_row(f"Percentage of TCP SYN/ACK control messages: {metrics['tcp_syn_ack_percent']}% ({metric_severity('tcp_syn_ack_percent', metrics['tcp_syn_ack_percent'])})")
+            if metrics['tcp_syn_percent'] == metrics['tcp_syn_ack_percent']:
+                add_summary_row("Percentage of TCP SYN and SYN/ACK control messages are equal, indicating a healthy environment.")
 
         return extracted_data
     
@@ -606,6 +1083,39 @@ def extract_TCP_details(data):
 
 
 ###############################################ARP Analysis#################################################
+# Function to map the IP addresses to MAC addresses from the ARP messages
+def map_ARP_addresses(data):
+    """
+    Maps IP addresses to MAC addresses using the ARP messages of a given dataframe.
+
+    Args:
+        data (pd.DataFrame): The input dataframe containing network data.
+
+    Returns:
+        dict: The IP address to MAC address mapping (the first MAC address seen for each IP address),
+              empty if there are no ARP messages.
+    """
+    # Filter the dataframe for rows where Protocol is 'ARP' and Info contains 'ARP', or Info contains 'is at'
+    flags = info_flags(data)
+    arp_data = data[((data['Protocol'] == 'ARP') & has_flag(flags, 'ARP')) | has_flag(flags, 'IS_AT')]
+    arp_data = arp_data.drop_duplicates(subset=['Info'])
+    ip_mac_dict = {}
+
+    # for each row in the arp_data dataframe extract the IP from the Info and MAC from the Source
+    for index, row in arp_data.iterrows():
+        # Extract the IP address from the Info column
+        ip = re.findall(r'[0-9]+(?:\.[0-9]+){3}', row['Info'])
+        # Extract the MAC address from the Source column
+        if 'is at' in row['Info']:
+            mac = row['Info'].split('is at ')[1].split(' ')[0]
+        else:
+            mac = row['Source']
+        
+        # Add the IP and MAC to the dictionary if they do not exist
+        if ip and mac and ip[0] not in ip_mac_dict:
+            ip_mac_dict[ip[0]] = mac
+    return ip_mac_dict
+
 # Function to extract ARP details from a given dataframe    
 def extract_ARP_details(data):
     
@@ -624,40 +1134,245 @@ def extract_ARP_details(data):
     """
     print("\nARP Analysis")
     print("=" * 40)  # Separator for clarity
-    # Create an arp_data dataframe from the input data
-    # Filter the dataframe for rows where Protocol is 'ARP' and Info contains 'ARP'
-    arp_data = data[(data['Protocol'] == 'ARP') & (data['Info'].str.contains('ARP')) | (data['Info'].str.contains('is at'))]
-    if arp_data.empty:
+    # The DuckDB backend only hands over the ARP rows
+    ip_mac_dict = map_ARP_addresses(data if isinstance(data, pd.DataFrame) else data.arp_rows())
+    snapshot['arp'] = ip_mac_dict
+    if not ip_mac_dict:
         print("No ARP data found in the input dataframe.")
         return pd.DataFrame()
     else:
-        arp_data.drop_duplicates(subset=['Info'], inplace=True)
-        ip_mac_dict = {}
-
-        # for each row in the arp_data dataframe extract the IP from the Info and MAC from the Source
-        for index, row in arp_data.iterrows():
-            # Extract the IP address from the Info column
-            ip = re.findall(r'[0-9]+(?:\.[0-9]+){3}', row['Info'])
-            # Extract the MAC address from the Source column
-            if 'is at' in row['Info']:
-                mac = row['Info'].split('is at ')[1].split(' ')[0]
-            else:
-                mac = row['Source']
-            
-            # Add the IP and MAC to the dictionary if they do not exist
-            if ip and mac and ip[0] not in ip_mac_dict:
-                ip_mac_dict[ip[0]] = mac
-
-        # Print the dictionary using pprint
-        print("IP and MAC Address Mapping")
-        table_mac_mapping = PrettyTable()
-        table_mac_mapping.field_names = ["IP Address", "MAC Address"]
-        for ip, mac in ip_mac_dict.items():
-            table_mac_mapping.add_row([ip, mac])
-        print(table_mac_mapping)
+        if tables_enabled:
+            # Print the dictionary using pprint
+            print("IP and MAC Address Mapping")
+            table_mac_mapping = PrettyTable()
+            table_mac_mapping.field_names = ["IP Address", "MAC Address"]
+            for ip, mac in ip_mac_dict.items():
+                table_mac_mapping.add_row([ip, mac])
+            print(table_mac_mapping)
         
         return ip_mac_dict
     
+# Function to analyze the TCP performance (retransmissions, duplicate ACKs, zero windows and handshake RTT)
+def tcp_performance_analysis(extracted_data):
+    """
+    Adds the TCP retransmissions, duplicate ACKs, zero window events and handshake RTT to the summary,
+    and records the metrics in the aggregates for the warning rules.
+
+    Parameters:
+    extracted_data (pd.DataFrame or SQLCapture): The output of extract_TCP_details.
+
+    Returns:
+    pd.DataFrame: The performance of every flow (see analyze_tcp.tcp_performance).
+    """
+    # The DuckDB backend counts the events per flow in SQL, only the flows are returned
+    flows, metrics = tcp_performance(extracted_data) if isinstance(extracted_data, pd.DataFrame) else extracted_data.tcp_performance()
+    aggregates.update(metrics)
+    snapshot.setdefault('tcp', {})['performance'] = metrics
+
+    add_summary_row("*********TCP Performance Analysis*********")
+    add_summary_row(f"Retransmitted data segments: {metrics['tcp_retransmissions']} out of {metrics['tcp_data_segments']} ({metrics['tcp_retransmission_percent']}%)")
+    if 'tcp_flow_retransmission_p50_percent' in metrics:
+        add_summary_row(f"Retransmission rate per flow: p50 {metrics['tcp_flow_retransmission_p50_percent']}%, p90 {metrics['tcp_flow_retransmission_p90_percent']}%, p99 {metrics['tcp_flow_retransmission_p99_percent']}%")
+    add_summary_row(f"Duplicate ACKs: {metrics['tcp_dup_acks']} ({metrics['tcp_dup_ack_percent']}% of the TCP packets)")
+    add_summary_row(f"Zero window events: {metrics['tcp_zero_window_events']} in {metrics['tcp_zero_window_flows']} flows")
+    if 'tcp_handshake_rtt_p50_ms' in metrics:
+        add_summary_row(f"Handshake RTT (SYN to SYN/ACK) over {metrics['tcp_handshakes']} handshakes: p50 {metrics['tcp_handshake_rtt_p50_ms']} ms, p90 {metrics['tcp_handshake_rtt_p90_ms']} ms, p99 {metrics['tcp_handshake_rtt_p99_ms']} ms")
+    add_summary_row("")
+
+    plot_top10(flows['Retransmissions'], 'Flow', 'TCP Flows by Retransmissions', 'top10_tcp_flows_retransmissions.png', ylabel='Number of Retransmissions')
+    return flows
+
+
+# Function to analyze the UDP, DNS, TLS, HTTP and QUIC rows with the protocol dissectors
+def application_protocol_analysis(data):
+    """
+    Dissects the Info column of the UDP, DNS, TLS, HTTP and QUIC rows (see analyze_protocols.py), adds
+    the results to the summary, plots the top 10 UDP destination ports, DNS query names, TLS server names
+    and HTTP hosts, and records the metrics in the aggregates for the warning rules.
+
+    Parameters:
+    data (pd.DataFrame or SQLCapture): The preprocessed data.
+
+    Returns:
+    pd.DataFrame: The dissected rows (see analyze_protocols.dissect_protocols).
+    """
+    # The DuckDB backend only hands over the rows of the dissected protocols
+    dissected = dissect_protocols(data if isinstance(data, pd.DataFrame) else data.protocol_rows(list(DISSECTORS)))
+    if dissected.empty:
+        return dissected
+    metrics = protocol_metrics(dissected)
+    aggregates.update(metrics)
+
+    add_summary_row("*********Application Protocol Analysis*********")
+    add_summary_row(f"Dissected packets: {metrics['dissected_rows']} (UDP: {metrics['udp_packets']}, DNS: {metrics['dns_queries'] + metrics['dns_responses']}, TLS: {metrics['tls_packets']}, HTTP: {metrics['http_requests'] + metrics['http_responses']}, QUIC: {metrics['quic_packets']})")
+    if metrics['udp_packets']:
+        udp_port = dissected['Destination_Port'].value_counts()
+        add_summary_row(f"Top UDP destination port: {udp_port.index[0]} ({udp_port.iloc[0]} packets)")
+    if metrics['dns_queries'] or metrics['dns_responses']:
+        add_summary_row(f"DNS queries: {metrics['dns_queries']}, responses: {metrics['dns_responses']}")
+        if 'dns_error_percent' in metrics:
+            add_summary_row(f"DNS error responses: {metrics['dns_error_percent']}% (NXDomain: {metrics['dns_nxdomain_percent']}%)")
+    if metrics['tls_packets']:
+        versions = dissected['TLS_Version'].value_counts()
+        add_summary_row("TLS versions: " + ", ".join(f"{version} {round(packets / metrics['tls_packets'] * 100, 2)}%" for version, packets in versions[versions > 0].items()))
+        add_summary_row(f"TLS Client Hellos: {metrics['tls_client_hellos']}")
+    if metrics['http_requests'] or metrics['http_responses']:
+        add_summary_row(f"HTTP requests: {metrics['http_requests']}, responses: {metrics['http_responses']}")
+        if 'http_error_percent' in metrics:
+            add_summary_row(f"HTTP error responses (4xx/5xx): {metrics['http_error_percent']}%")
+    if metrics['quic_packets']:
+        add_summary_row(f"QUIC packets: {metrics['quic_packets']} (Initial: {int((dissected['QUIC_Packet_Type'] == 'Initial').sum())})")
+    add_summary_row("")
+
+    if dissected['Destination_Port'].notna().any():
+        Top10(dissected, 'Destination_Port', 'UDP Destination Ports', 'top10_udp_destination_ports.png')
+    for column, key, title, filename in (('DNS_Qname', 'dns_name', 'DNS Query Names', 'top10_dns_query_names.png'),
+                                         ('TLS_SNI', 'tls_server_name', 'TLS Server Names (SNI)', 'top10_tls_server_names.png'),
+                                         ('HTTP_Host', 'http_host', 'HTTP Hosts', 'top10_http_hosts.png')):
+        if dissected[column].notna().any():
+            name_volume = traffic_volume(dissected, column)
+            snapshot_top(name_volume, key)
+            plot_top10(name_volume['Packets'], column, title, filename)
+    return dissected
+
+
+# Function to fingerprint the TLS handshakes and label the applications of the public destinations
+def tls_fingerprint_analysis(data, dissected):
+    """
+    Fingerprints the TLS handshakes (JA3/JA4 and SNI, see analyze_tls.py), labels their applications
+    from the local fingerprint index, adds the results to the summary, plots the top 10 applications
+    and records the metrics in the aggregates.
+
+    Parameters:
+    data (pd.DataFrame or SQLCapture): The preprocessed data.
+    dissected (pd.DataFrame): The output of application_protocol_analysis.
+
+    Returns:
+    pd.Series: The application of every labeled server address, the public destinations left for
+               analyze_dns.dns_analysis are the other ones.
+    """
+    handshakes, servers, source, metrics = fingerprint_applications(data, dissected)
+    if handshakes.empty:
+        return servers
+    aggregates.update(metrics)
+    snapshot['tls'] = {'source': source,
+                       'applications': {str(key): int(value) for key, value in handshakes['Application'].value_counts().items()},
+                       'servers': {str(key): str(value) for key, value in servers.items()}}
+
+    destination_counts = value_counts(select_rows(data, 'Destination_Type', 'Public'), 'Destination')
+    public_destinations = destination_counts[destination_counts > 0].index.astype(str)
+    labeled_destinations = int(public_destinations.isin(servers.index).sum())
+
+    add_summary_row("*********TLS Fingerprint Analysis*********")
+    source_names = {'pcap': 'the pcap file (tshark)', 'csv': 'the TLS field columns of the CSV export', 'info': 'the Info column (server names only)'}
+    add_summary_row(f"TLS handshakes: {metrics['tls_handshakes']}, read from {source_names[source]}")
+    add_summary_row(f"Distinct JA3 fingerprints: {metrics['tls_distinct_ja3']}, JA4 fingerprints: {metrics['tls_distinct_ja4']}, server names: {metrics['tls_distinct_sni']}")
+    add_summary_row(f"Handshakes labeled with an application: {metrics['tls_labeled_handshakes']} ({metrics['tls_labeled_percent']}%), fingerprints learned: {metrics['tls_learned_fingerprints']}")
+    if metrics['tls_labeled_handshakes']:
+        applications = handshakes['Application'].value_counts()
+        add_summary_row("Top applications: " + ", ".join(f"{application} ({count})" for application, count in applications.head(3).items()))
+    add_summary_row(f"Public destinations labeled: {labeled_destinations} out of {len(public_destinations)}, left for the DNS analysis: {len(public_destinations) - labeled_destinations}")
+    add_summary_row("")
+
+    if metrics['tls_labeled_handshakes']:
+        Top10(handshakes, 'Application', 'TLS Applications', 'top10_tls_applications.png')
+    return servers
+
+
+# Function to build the warnings of the detected port scans and host sweeps
+def scan_warnings(scans):
+    """
+    Builds one warning per port scan or host sweep found by a ScanDetector.
+
+    Parameters:
+    scans (list): The output of ScanDetector.scans.
+
+    Returns:
+    list: Dictionaries with the keys category, description, recommendation, severity, metric, value
+          and threshold, like the warnings of analyze_rules.evaluate_warning_rules.
+    """
+    warnings = []
+    for scan in scans:
+        # Counts past the exact limit are HyperLogLog estimates
+        approximately = '' if scan['exact'] else '~'
+        target = 'ports' if scan['kind'] == 'vertical' else 'hosts'
+        warnings.append({
+            'category': 'Port Scan' if scan['kind'] == 'vertical' else 'Host Sweep',
+            'description': f"{scan['source']} opened connections to {approximately}{scan['distinct']} distinct destination {target} ({scan['kind']} scan).",
+            'recommendation': 'Investigate - potential port scan' if scan['kind'] == 'vertical' else 'Investigate - potential host sweep or worm',
+            'severity': 'High',
+            'metric': f'distinct_destination_{target}',
+            'value': scan['distinct'],
+            'threshold': None,
+        })
+    return warnings
+
+
+# Function to report the port scans and host sweeps found by a ScanDetector
+def scan_analysis(scan_detector):
+    """
+    Adds the port scans and host sweeps found by a ScanDetector to the summary, and keeps them in the
+    snapshot for the warnings (see scan_warnings, added with the warning rules by run_analysis).
+
+    Parameters:
+    scan_detector (ScanDetector): The detector updated with the TCP details (see analyze_scans.py).
+
+    Returns:
+    None
+    """
+    scans = scan_detector.scans()
+    aggregates['scan_sources'] = len({scan['source'] for scan in scans})
+    snapshot['scans'] = scans
+    snapshot.setdefault('summary', {})['untracked_packets'] = scan_detector.untracked_packets
+
+    add_summary_row("*********Scan Detection*********")
+    add_summary_row(f"Sources tracked: {len(scan_detector.ports)}, sources above the scan thresholds: {aggregates['scan_sources']}")
+    if scan_detector.untracked_packets:
+        add_summary_row(f"SYN packets from sources over the tracking limit (not analyzed): {scan_detector.untracked_packets}")
+    add_summary_row("")
+
+# Function to plot and summarize the source and destination IP and TCP port combinations from their traffic volume
+def endpoint_volume_analysis(extracted_data):
+    """
+    Plots the top 10 source and destination IP and TCP port combinations by packets (all, private and public) and
+    by bytes, and summarizes their traffic volume. Every chart is a slice of one traffic_volume pass per direction.
+
+    Parameters:
+    extracted_data (pd.DataFrame or SQLCapture): The TCP rows with the IP and TCP port columns.
+
+    Returns:
+    tuple: The traffic volume of the source and of the destination IP and TCP port combinations.
+    """
+    # Packets, bytes and mean frame size per source and destination IP and TCP port combination (and address
+    # type) in one grouped pass each, every endpoint chart below is a slice of them
+    endpoint_volumes = {}
+    for direction in ('Source', 'Destination'):
+        column, type_column = f'{direction}_IP:TCP_Port', f'{direction}_Type'
+        typed = type_column in extracted_data.columns
+        volume_by_type = traffic_volume(extracted_data, [type_column, column] if typed else column)
+        endpoint_volumes[direction] = collapse_volume(volume_by_type, column) if typed else volume_by_type
+        plot_top10(endpoint_volumes[direction]['Packets'], column, f'{direction} IP and TCP Port combinations', f'top10_{direction.lower()}_ip_tcp_port.png')
+        address_types = volume_by_type.index.get_level_values(type_column) if typed else []
+        for address_type in ('Private', 'Public'):
+            if address_type in address_types:
+                plot_top10(volume_by_type.xs(address_type, level=type_column)['Packets'], column,
+                           f'{address_type} {direction} IP and TCP Port combinations',
+                           f'top10_{address_type.lower()}_{direction.lower()}_ip_tcp_port.png')
+
+    # Plot the top 10 source and destination IP and TCP port combinations by bytes
+    source_endpoint_volume = endpoint_volumes['Source']
+    destination_endpoint_volume = endpoint_volumes['Destination']
+    plot_top10(source_endpoint_volume['Bytes'], 'Source_IP:TCP_Port', 'Source IP and TCP Port combinations by Bytes', 'top10_source_ip_tcp_port_bytes.png', ylabel='Number of Bytes')
+    plot_top10(destination_endpoint_volume['Bytes'], 'Destination_IP:TCP_Port', 'Destination IP and TCP Port combinations by Bytes', 'top10_destination_ip_tcp_port_bytes.png', ylabel='Number of Bytes')
+    add_summary_row("*********TCP Endpoint Volume Analysis*********")
+    summarize_volume(source_endpoint_volume, 'Source IP and TCP Port', 'source_endpoint', 'sent')
+    summarize_volume(destination_endpoint_volume, 'Destination IP and TCP Port', 'destination_endpoint', 'received')
+    snapshot_top(source_endpoint_volume, 'source_endpoint')
+    snapshot_top(destination_endpoint_volume, 'destination_endpoint')
+
+    return source_endpoint_volume, destination_endpoint_volume
+
+
 # Function to combine all the protocol analysis functions
 
 def protocol_analysis(data):
@@ -666,16 +1381,21 @@ def protocol_analysis(data):
 
     This function performs the following steps:
     1. Plots the distribution of protocols in the data.
-    2. Extracts TCP details from the data.
-    3. Analyzes and plots the top 10 source and destination IP and TCP port combinations.
-    4. Analyzes and plots the distribution of TCP messages and control messages.
-    5. Extracts ARP details from the data.
+    2. Plots the top 10 protocols by bytes and adds the protocol with the most bytes to the summary.
+    3. Dissects the UDP, DNS, TLS, HTTP and QUIC rows.
+    4. Fingerprints the TLS handshakes and labels the applications of the public destinations.
+    5. Extracts TCP details from the data.
+    6. Analyzes and plots the top 10 source and destination IP and TCP port combinations by packets and bytes.
+    7. Detects port scans and host sweeps from the TCP SYNs.
+    8. Measures the TCP retransmissions, duplicate ACKs, zero windows and handshake RTT per flow.
+    9. Analyzes and plots the distribution of TCP messages and control messages.
+    10. Extracts ARP details from the data.
 
     Parameters:
     data (pd.DataFrame): The input DataFrame containing network data.
 
     Returns:
-    None
+    pd.Series: The application of every server address labeled by the TLS fingerprinting (see tls_fingerprint_analysis).
     """
     print("\nProtocol Analysis")
     print("=" * 40)  # Separator for clarity
@@ -683,35 +1403,35 @@ def protocol_analysis(data):
     # Plot the distribution of protocols in the data
     plot_analysis('Protocol Distribution', data, 'Protocol')
 
+    # Plot the top 10 protocols by bytes and capture the protocol carrying the most bytes
+    protocol_volume = traffic_volume(data, 'Protocol')
+    snapshot['protocols'] = volume_records(protocol_volume, 'protocol')
+    plot_top10(protocol_volume['Bytes'], 'Protocol', 'Protocols by Bytes', 'top10_protocols_bytes.png', ylabel='Number of Bytes')
+    add_summary_row("*********Protocol Volume Analysis*********")
+    summarize_volume(protocol_volume, 'Protocol', 'protocol', 'carried')
+    add_summary_row("")
+
+    # Dissect the UDP, DNS, TLS, HTTP and QUIC rows
+    dissected = application_protocol_analysis(data)
+
+    # Fingerprint the TLS handshakes and label the applications
+    servers = tls_fingerprint_analysis(data, dissected)
+
     # Extract TCP details from the data
     extracted_data = extract_TCP_details(data)
     if extracted_data.empty:
-        table_summary.add_row(["No TCP data found in the input dataframe."])
-        return
+        add_summary_row("No TCP data found in the input dataframe.")
     else:
-        # Analyze and plot the top 10 source IP and TCP port combinations
-        if 'Source_IP:TCP_Port' in extracted_data.columns:
-            Top10(extracted_data, 'Source_IP:TCP_Port', 'Source IP and TCP Port combinations', 'top10_source_ip_tcp_port.png')
-        
-        # Analyze and plot the top 10 private source IP and TCP port combinations
-        if 'Source_Type' in extracted_data.columns and 'Private' in extracted_data['Source_Type'].values:
-            Top10(extracted_data[extracted_data['Source_Type'] == 'Private'], 'Source_IP:TCP_Port', 'Private Source IP and TCP Port combinations', 'top10_private_source_ip_tcp_port.png')
-        
-        # Analyze and plot the top 10 public source IP and TCP port combinations
-        if 'Source_Type' in extracted_data.columns and 'Public' in extracted_data['Source_Type'].values:
-            Top10(extracted_data[extracted_data['Source_Type'] == 'Public'], 'Source_IP:TCP_Port', 'Public Source IP and TCP Port combinations', 'top10_public_source_ip_tcp_port.png')
-        
-        # Analyze and plot the top 10 destination IP and TCP port combinations
-        if 'Destination_IP:TCP_Port' in extracted_data.columns:
-            Top10(extracted_data, 'Destination_IP:TCP_Port', 'Destination IP and TCP Port combinations', 'top10_destination_ip_tcp_port.png')
-        
-        # Analyze and plot the top 10 private destination IP and TCP port combinations
-        if 'Destination_Type' in extracted_data.columns and 'Private' in extracted_data['Destination_Type'].values:
-            Top10(extracted_data[extracted_data['Destination_Type'] == 'Private'], 'Destination_IP:TCP_Port', 'Private Destination IP and TCP Port combinations', 'top10_private_destination_ip_tcp_port.png')
-        
-        # Analyze and plot the top 10 public destination IP and TCP port combinations
-        if 'Destination_Type' in extracted_data.columns and 'Public' in extracted_data['Destination_Type'].values:
-            Top10(extracted_data[extracted_data['Destination_Type'] == 'Public'], 'Destination_IP:TCP_Port', 'Public Destination IP and TCP Port combinations', 'top10_public_destination_ip_tcp_port.png')
+        # Plot and summarize the top 10 source and destination IP and TCP port combinations
+        endpoint_volume_analysis(extracted_data)
+
+        # Detect vertical port scans and horizontal host sweeps from the TCP SYNs
+        scan_detector = ScanDetector()
+        scan_detector.update(materialize(select_rows(extracted_data, 'TCP_Control_Msg', 'SYN')))
+        scan_analysis(scan_detector)
+
+        # Measure the retransmissions, duplicate ACKs, zero windows and handshake RTT of the TCP flows
+        tcp_performance_analysis(extracted_data)
         
         # Analyze and plot the distribution of TCP messages
         if 'TCP_Msg' in extracted_data.columns:
@@ -720,29 +1440,78 @@ def protocol_analysis(data):
         # Analyze and plot the distribution of TCP control messages
         if 'TCP_Control_Msg' in extracted_data.columns:
             plot_analysis('TCP Control Messages Distribution', extracted_data, 'TCP_Control_Msg')
-        
-        # Extract ARP details from the data
-        extract_ARP_details(data)
+
+    # Extract ARP details from the data
+    extract_ARP_details(data)
+    return servers
+
+###############################################Baseline Comparison#############################################
+# Function to compare the run against the baseline of the previous runs and save it to the baseline store
+def baseline_analysis(path=None, runs=BASELINE_RUNS):
+    """
+    Compares the snapshot of the run against the baseline of the previous runs and saves it.
+
+    The baseline store keeps the top-N lists, protocol histogram, TCP control metrics and ARP mapping
+    of every run (see baseline_store.py), so the comparison never reloads the old captures. Drifts
+    (new top talker, protocol share shift, TCP ratio shift, changed MAC address) are added to the
+    warnings table. A capture that is already stored is compared against the runs saved before it
+    and is not saved again.
+
+    Parameters:
+    path (str): The path to the baseline store. Defaults to baseline_path.
+    runs (int): The number of previous runs the baseline is made of.
+
+    Returns:
+    int: The id of the saved (or already stored) run.
+    """
+    path = path or baseline_path
+    run_id, baseline_runs, drift, stored = record_run(snapshot, path, runs)
+
+    add_summary_row("*********Baseline Comparison*********")
+    if baseline_runs:
+        add_summary_row(f"Compared against the last {baseline_runs} runs: {len(drift)} drift(s) found.")
+    else:
+        add_summary_row("No previous run in the baseline store, this run starts the baseline.")
+    if stored:
+        add_summary_row(f"The capture is already stored as run {run_id} in the baseline store {path}, not saved again")
+    else:
+        add_summary_row(f"Run {run_id} saved to the baseline store {path}")
+    add_summary_row("")
+    snapshot['baseline'] = {'path': path, 'run_id': run_id, 'baseline_runs': baseline_runs, 'drifts': len(drift), 'stored': stored}
+    add_warnings(drift)
+    return run_id
 
 ###############################################Data Analysis#############################################
 
-# Function to perform data analysis
-def data_analysis(data):
+# Function to run all the analysis steps
+def run_analysis(data, evaluate_warnings=True, record_baseline=True, rules=None):
     """
-    Perform comprehensive data analysis on the input DataFrame.
+    Runs all the analysis steps on the input DataFrame, filling the result model (aggregates and snapshot)
+    and, unless tables_enabled is False, the summary and warnings tables.
 
     This function performs the following steps:
     1. Preprocesses the data to handle missing values and identify address types.
     2. Analyzes the source addresses in the data.
     3. Analyzes the destination addresses in the data.
-    4. Analyzes the protocols in the data, including TCP and ARP details.
+    4. Analyzes the conversations (address pairs) in the data.
+    5. Analyzes the protocols in the data, including TCP and ARP details.
+    6. Evaluates the warning rules against the aggregates collected by the previous steps.
+    7. Compares the run against the baseline of the previous runs and saves it to the baseline store, when baseline_path is set.
 
     Parameters:
     data (pd.DataFrame): The input DataFrame containing network data.
+    evaluate_warnings (bool): Set to False to skip step 6, e.g. when the caller annotates the warnings itself.
+    record_baseline (bool): Set to False to skip step 7, e.g. for a sample of the capture. Also skipped when baseline_path is empty.
+    rules (list): The warning rules (see analyze_rules.load_warning_rules). Defaults to the configured rules.
 
     Returns:
-    None
+    tuple: (data, servers)
+        - data (pd.DataFrame): The preprocessed DataFrame (missing values removed, address types identified).
+        - servers (pd.Series): The application of every server address labeled by the TLS fingerprinting,
+          pass it to analyze_dns.dns_analysis to only resolve the other public destinations.
     """
+    snapshot['capture'] = data.attrs.get('capture')
+
     # Step 1: Preprocess the data
     data = data_preprocessing(data)
     
@@ -751,9 +1520,39 @@ def data_analysis(data):
     
     # Step 3: Analyze the destination addresses
     destination_analysis(data)
+
+    # Step 4: Analyze the conversations
+    conversation_analysis(data)
     
-    # Step 4: Analyze the protocols in the data
-    protocol_analysis(data)
+    # Step 5: Analyze the protocols in the data
+    servers = protocol_analysis(data)
+
+    # Step 6: Evaluate all the warning rules in one pass over the collected aggregates, then add the detected scans
+    if evaluate_warnings:
+        add_warnings(evaluate_warning_rules(aggregates, rules) + scan_warnings(snapshot.get('scans', [])))
+
+    # Step 7: Compare against the baseline and save the run
+    if record_baseline and baseline_path:
+        baseline_analysis()
+
+    return data, servers
+
+
+# Function to perform data analysis
+def data_analysis(data):
+    """
+    Perform comprehensive data analysis on the input DataFrame.
+
+    This function runs all the analysis steps (see run_analysis) and prints the summary and
+    warnings tables.
+
+    Parameters:
+    data (pd.DataFrame): The input DataFrame containing network data.
+
+    Returns:
+    tuple: (data, servers), the preprocessed data and the servers labeled by the TLS fingerprinting (see run_analysis).
+    """
+    data, servers = run_analysis(data)
     
     # Print the summary table at the end
     print(table_summary)
@@ -763,6 +1562,7 @@ def data_analysis(data):
     
     # Notify the user where the graphs/plots have been saved
     print(f"\nThe graphs/plots have been saved in the {plots_dir}")
+    return data, servers
 
     
     
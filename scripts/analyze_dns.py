@@ -5,6 +5,7 @@ import matplotlib.pyplot as plt
 import requests
 import pandas as pd
 import os
+from scripts.public_suffix import reduce_to_registrable_domains
 
 
 
@@ -125,14 +126,14 @@ def dns_resolution_and_value_counts(source_list):
     tuple: A tuple containing:
         - rDNS_dict (dict): A dictionary with resolved DNS values for each source.
         - rDNS_error (dict): A dictionary with sources that encountered errors and their corresponding status codes.
-        - unique_domains (list): A list of unique domain names extracted from the resolved DNS values.
+        - unique_domains (list): A list of unique registrable domains (public suffix plus one label) extracted from the resolved DNS values.
         - value_counts (pd.Series): A pandas Series containing the counts of each unique domain, with a category "Others" for domains with counts less than 4.
     The function performs the following steps:
     1. Builds the API URL and key for DNS resolution.
     2. Iterates over the source list and makes API requests to resolve DNS.
     3. Identifies nested dictionaries in the API response and extracts DNS NS values.
     4. Updates the rDNS_dict with the resolved DNS values and logs any errors in rDNS_error.
-    5. Extracts unique domain names from the resolved DNS values.
+    5. Reduces the resolved DNS values to registrable domains using the bundled public suffix list.
     6. Counts the occurrences of each unique domain.
     7. Aggregates domains with counts less than 4 into a category called "Others".
     8. Plots a pie chart of the external domains being accessed from the network.
@@ -156,18 +157,10 @@ def dns_resolution_and_value_counts(source_list):
         else:
             rDNS_error[source] = api_response.status_code
 
-    # Get the unique domain names from the rDNS values
-    unique_domains = []
-    list_of_domains = []
-    for key, value in rDNS_dict.items():
-        for item in value:
-            sub_domain = item.split('.')[-3]
-            domain = item.split('.')[-2]
-            top_level_domain = item.split('.')[-1]
-            domain_entry = sub_domain + '.' + domain + '.' + top_level_domain
-            list_of_domains.append(domain_entry)
-            if domain_entry not in unique_domains:
-                unique_domains.append(domain_entry)
+    # Reduce every resolved name to its registrable domain using the public suffix trie (memoized, linear in the number of names)
+    list_of_domains = reduce_to_registrable_domains(item for value in rDNS_dict.values() for item in value)
+    # Get the unique domain names from the rDNS values, keeping the order in which they were first seen
+    unique_domains = list(dict.fromkeys(list_of_domains))
     
     # Get the value counts for the list of domains
     value_counts = pd.Series(list_of_domains).value_counts()
@@ -184,6 +177,23 @@ def dns_resolution_and_value_counts(source_list):
     plt.show()
     return rDNS_dict, rDNS_error, unique_domains, value_counts
 
-def dns_analysis(data):
-    data = data[data['Destination_Type'] == 'Public']
-    dns_resolution_and_value_counts(unique_destination_addresses(data))
\ No newline at end of file
+# Function to resolve the public destinations that the TLS fingerprinting could not label
+def dns_analysis(data, labeled_destinations=None):
+    """
+    Resolves the public destination addresses of the data (see dns_resolution_and_value_counts).
+
+    Parameters:
+    data (pd.DataFrame or SQLCapture): The preprocessed data, with the Destination_Type column.
+    labeled_destinations (pd.Series or list): The addresses already labeled with an application (e.g. the
+                                              servers returned by analyze.run_analysis), only the other
+                                              public destinations are looked up.
+    """
+    # Imported here, analyze creates the results directories when it is imported
+    from scripts.analyze import materialize, select_rows
+
+    data = materialize(select_rows(data, 'Destination_Type', 'Public'), ['Destination'])
+    destinations = unique_destination_addresses(data)
+    if labeled_destinations is not None:
+        labeled = set(labeled_destinations.index if isinstance(labeled_destinations, pd.Series) else labeled_destinations)
+        destinations = [destination for destination in destinations if destination not in labeled]
+    return dns_resolution_and_value_counts(destinations)
@@ -0,0 +1,227 @@
+# This is the file with the structured (JSON / NDJSON) export of the analysis results
+
+# Importing the necessary libraries
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import sys
+
+# Make the 'scripts' package importable when the export is started from the scripts directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scripts.capture_schema import load_capture
+
+
+# Version of the result schema, increase it when a field is renamed or removed
+RESULT_SCHEMA_VERSION = 1
+
+
+#########################################################################Result Model#########################################################################
+# Function to convert numpy/pandas scalars to plain Python values for JSON
+def to_builtin(value):
+    """
+    Converts numpy and pandas scalars to plain Python values so they can be serialized to JSON.
+
+    Parameters:
+    value: The value to convert.
+
+    Returns:
+    The value as a Python builtin (str, int, float, bool or None).
+    """
+    if hasattr(value, 'item'):
+        return value.item()
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+# Function to build the structured results of the analysis of a capture
+def build_results(data, capture=None, top_n=10, rules=None, baseline=None):
+    """
+    Analyzes a capture and returns the results as a JSON serializable dictionary.
+
+    The analysis stages of analyze.run_analysis fill one result model (analyze.aggregates and
+    analyze.snapshot) and these results are read from it. The summary, warnings and ARP mapping
+    tables of the text report and the plots are not built, and the printed output is discarded
+    while the capture is analyzed.
+
+    Parameters:
+    data (pd.DataFrame or SQLCapture): The capture, as loaded by capture_schema.load_capture (or duckdb_backend.load_capture_duckdb).
+    capture (str): The name or path of the capture, stored in the results.
+    top_n (int): The number of entries of the top-N lists.
+    rules (list): The warning rules (see analyze_rules.load_warning_rules). Defaults to the configured rules.
+    baseline (str): The path to a baseline store (see baseline_store.py) the run is compared against
+                    and saved to. None skips the baseline comparison.
+
+    Returns:
+    dict: The results, with the keys:
+        - schema_version (int), capture (str), generated_at (str, ISO 8601 UTC)
+        - summary (dict): rows, skipped_lines, rows_with_missing_values, total_packets, total_bytes,
+                          conversations, the packets per source/destination address type, the rows
+                          of every Info flag (see info_flags.py) and untracked_packets (SYN packets
+                          from sources over the scan detector tracking limit)
+        - aggregates (dict): the metrics the warning rules are evaluated against
+        - warnings (list): category, description, recommendation, severity, metric, value, threshold
+                           of the warning rules, the detected scans and the baseline drifts
+        - top (dict): for source, destination, conversation, source_endpoint, destination_endpoint,
+                      dns_name, tls_server_name and http_host,
+                      the by_packets and by_bytes lists of {<key>, packets, bytes, mean_bytes}
+        - protocols (list): {protocol, packets, bytes, mean_bytes} for every protocol
+        - tcp (dict): control_messages and messages counts, the TCP control metrics, and the TCP
+                      performance metrics (retransmissions, duplicate ACKs, zero windows, handshake RTT)
+        - tls (dict): source of the TLS handshakes ('pcap', 'csv', 'info' or None), the handshakes per
+                      application and the application of every labeled server address (see analyze_tls.py)
+        - arp (dict): the IP address to MAC address mapping
+        - scans (list): source, kind, distinct, exact for every detected scan
+        - baseline (dict): path, run_id, baseline_runs, drifts (the number of drift warnings) and
+                           stored (True if the capture was already in the store and not saved again),
+                           None without a baseline store
+    """
+    # Imported here, analyze imports this module
+    from scripts import analyze
+
+    analyze.reset_analysis()
+    plots_enabled, tables_enabled, snapshot_top_n = analyze.plots_enabled, analyze.tables_enabled, analyze.snapshot_top_n
+    analyze.plots_enabled, analyze.tables_enabled, analyze.snapshot_top_n = False, False, top_n
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            analyze.run_analysis(data, record_baseline=False, rules=rules)
+            analyze.snapshot['capture'] = capture
+            if baseline:
+                analyze.baseline_analysis(baseline)
+    finally:
+        analyze.plots_enabled, analyze.tables_enabled, analyze.snapshot_top_n = plots_enabled, tables_enabled, snapshot_top_n
+    model = analyze.snapshot
+    tcp = model.get('tcp', {})
+
+    return {
+        'schema_version': RESULT_SCHEMA_VERSION,
+        'capture': capture,
+        'generated_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'summary': {
+            'rows': model['summary']['rows'],
+            'skipped_lines': model['summary']['skipped_lines'],
+            'rows_with_missing_values': model['summary']['rows_with_missing_values'],
+            'total_packets': model['summary'].get('total_packets', 0),
+            'total_bytes': model['summary'].get('total_bytes', 0),
+            'conversations': model['summary'].get('conversations', 0),
+            'info_flags': model['summary']['info_flags'],
+            'source_address_types': model['summary'].get('source_address_types', {}),
+            'destination_address_types': model['summary'].get('destination_address_types', {}),
+            'untracked_packets': model['summary'].get('untracked_packets', 0),
+        },
+        'aggregates': {key: to_builtin(value) for key, value in analyze.aggregates.items()},
+        'warnings': [{key: to_builtin(value) for key, value in warning.items()} for warning in model.get('warnings', [])],
+        'top': model.get('top', {}),
+        'protocols': model.get('protocols', []),
+        'tcp': {
+            'control_messages': tcp.get('control_messages', {}),
+            'messages': tcp.get('messages', {}),
+            'metrics': {key: to_builtin(value) for key, value in tcp.get('metrics', {}).items()},
+            'performance': {key: to_builtin(value) for key, value in tcp.get('performance', {}).items()},
+        },
+        'tls': model.get('tls', {'source': None, 'applications': {}, 'servers': {}}),
+        'arp': model.get('arp', {}),
+        'scans': model.get('scans', []),
+        'baseline': model.get('baseline'),
+    }
+
+
+#########################################################################Writers#########################################################################
+# Function to flatten the results into NDJSON records
+def iter_ndjson_records(results):
+    """
+    Flattens the results of build_results into one record per line item, for bulk loading.
+
+    Every record carries schema_version, capture and generated_at, and a 'record' field with one of:
+    'summary', 'aggregates', 'warning', 'top', 'protocol', 'tcp_control_message', 'tcp_message', 'tls_server', 'arp', 'scan'
+    and 'baseline' (when the run was compared against a baseline store).
+
+    Parameters:
+    results (dict): The output of build_results.
+
+    Yields:
+    dict: The records.
+    """
+    header = {key: results[key] for key in ('schema_version', 'capture', 'generated_at')}
+    yield dict(header, record='summary', **results['summary'])
+    yield dict(header, record='aggregates', **results['aggregates'])
+    for warning in results['warnings']:
+        yield dict(header, record='warning', **warning)
+    for dimension, rankings in results['top'].items():
+        for ranking, entries in rankings.items():
+            for rank, entry in enumerate(entries, start=1):
+                yield dict(header, record='top', dimension=dimension, ranking=ranking, rank=rank,
+                           value=entry[dimension], packets=entry['packets'], bytes=entry['bytes'], mean_bytes=entry['mean_bytes'])
+    for protocol in results['protocols']:
+        yield dict(header, record='protocol', **protocol)
+    for message, message_count in results['tcp']['control_messages'].items():
+        yield dict(header, record='tcp_control_message', message=message, count=message_count)
+    for message, message_count in results['tcp']['messages'].items():
+        yield dict(header, record='tcp_message', message=message, count=message_count)
+    for ip, application in results['tls']['servers'].items():
+        yield dict(header, record='tls_server', ip=ip, application=application)
+    for ip, mac in results['arp'].items():
+        yield dict(header, record='arp', ip=ip, mac=mac)
+    for scan in results['scans']:
+        yield dict(header, record='scan', **scan)
+    if results['baseline']:
+        yield dict(header, record='baseline', **results['baseline'])
+
+
+# Function to write the results as one JSON document
+def write_json(results, f):
+    """
+    Writes the results of build_results to an open text file as one JSON document.
+    """
+    json.dump(results, f, indent=2, default=to_builtin)
+    f.write('\n')
+
+
+# Function to write the results as NDJSON
+def write_ndjson(results, f):
+    """
+    Writes the results of build_results to an open text file, one JSON record per line.
+    """
+    for record in iter_ndjson_records(results):
+        f.write(json.dumps(record, default=to_builtin))
+        f.write('\n')
+
+
+# Function to export the results of several captures
+def export_captures(paths, output, output_format='ndjson', top_n=10, baseline=None):
+    """
+    Analyzes several captures and writes their results to one file.
+
+    With 'ndjson' the records of every capture are streamed to the file as soon as the capture is
+    analyzed; with 'json' the file holds a JSON array with one document per capture.
+
+    Parameters:
+    paths (list): The paths to the capture CSVs.
+    output (str): The path of the output file.
+    output_format (str): 'ndjson' or 'json'.
+    top_n (int): The number of entries of the top-N lists.
+    baseline (str): The path to a baseline store every capture is compared against and saved to, in the given order.
+    """
+    with open(output, 'w', encoding='utf-8') as f:
+        if output_format == 'ndjson':
+            for path in paths:
+                write_ndjson(build_results(load_capture(path), capture=path, top_n=top_n, baseline=baseline), f)
+        else:
+            json.dump([build_results(load_capture(path), capture=path, top_n=top_n, baseline=baseline) for path in paths], f, indent=2, default=to_builtin)
+            f.write('\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the analysis results of one or more captures as JSON or NDJSON.')
+    parser.add_argument('captures', nargs='+', help='The paths to the capture CSVs')
+    parser.add_argument('-o', '--output', required=True, help='The output file')
+    parser.add_argument('--format', choices=['ndjson', 'json'], default='ndjson')
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--baseline', default=None, help='Compare every capture against this baseline store and save it there')
+    args = parser.parse_args()
+    export_captures(args.captures, args.output, args.format, args.top_n, args.baseline)
+    print(f'The results have been saved to {args.output}')
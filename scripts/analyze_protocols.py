@@ -0,0 +1,224 @@
+# This is the file with the Info column dissectors of the UDP, DNS, TLS, HTTP and QUIC rows
+
+# Importing the necessary libraries
+import re
+import pandas as pd
+
+
+# The dissectors, by protocol (the values of the Protocol column)
+DISSECTORS = {}
+
+# The typed columns produced by the dissectors, by name, in registration order
+DISSECTOR_FIELDS = {}
+
+# The columns of the capture copied to the output of dissect_protocols
+CAPTURE_COLUMNS = ['Time', 'Source', 'Destination', 'Protocol', 'Length']
+
+# DNS response codes as printed by Wireshark, and their short names
+DNS_RCODES = {
+    'Format error': 'FormErr',
+    'Server failure': 'ServFail',
+    'No such name': 'NXDomain',
+    'Not implemented': 'NotImp',
+    'Refused': 'Refused',
+    'Name exists': 'YXDomain',
+    'RR set exists': 'YXRRSet',
+    'RR set does not exist': 'NXRRSet',
+    'Not authoritative': 'NotAuth',
+    'Name out of zone': 'NotZone',
+}
+
+# TLS versions older than TLS 1.2 (deprecated by RFC 8996)
+LEGACY_TLS_VERSIONS = ['SSLv2', 'SSLv3', 'TLSv1', 'TLSv1.1']
+
+UDP_PATTERN = re.compile(r'^\s*(?P<Source_Port>\d+)\s*(?:>|→)\s*(?P<Destination_Port>\d+)(?:\s+Len=(?P<UDP_Length>\d+))?')
+DNS_PATTERN = re.compile(
+    r'^Standard query (?P<Response>response )?0x(?P<DNS_Id>[0-9a-fA-F]+)\s+'
+    r'(?:(?P<Rcode>' + '|'.join(re.escape(rcode) for rcode in DNS_RCODES) + r')\s+)?'
+    r'(?P<DNS_Qtype>[A-Z0-9]+|Unknown \(\d+\))\s+(?P<DNS_Qname>[^\s,]+)'
+)
+TLS_PATTERN = re.compile(r'^\s*(?P<TLS_Message>[^,(]+?)\s*(?:\(SNI=(?P<TLS_SNI>[^)]+)\))?\s*(?:,|$)')
+HTTP_PATTERN = re.compile(
+    r'^\s*(?:(?P<HTTP_Method>[A-Z]+) (?P<HTTP_URI>\S+) HTTP/[\d.]+'
+    r'|HTTP/[\d.]+ (?P<HTTP_Status>\d{3}))'
+)
+HTTP_HOST_PATTERN = re.compile(r'^(?:[a-zA-Z][a-zA-Z0-9+.-]*://)?(?P<Host>[^/:?#\s]+)')
+QUIC_PATTERN = re.compile(
+    r'^\s*(?P<QUIC_Packet_Type>[^,(]+?)\s*(?:\(KP\d\))?\s*(?:,|$)'
+    r'(?:.*?\bDCID=(?P<QUIC_DCID>[0-9a-fA-F]+))?(?:.*?\bSCID=(?P<QUIC_SCID>[0-9a-fA-F]+))?'
+)
+
+
+#########################################################################Dissector Registry#########################################################################
+# Function to register a dissector for one or more protocols
+def register_dissector(protocols, fields):
+    """
+    Registers a dissector function for one or more values of the Protocol column (used as a decorator).
+
+    The dissector receives the rows of one protocol (a DataFrame with the Info column and the
+    CAPTURE_COLUMNS present in the capture) and returns a DataFrame with some of the registered fields,
+    with the index of the rows. New protocols are added by registering a dissector, dissect_protocols
+    still reads the capture once.
+
+    Parameters:
+    protocols (list): The values of the Protocol column handled by the dissector.
+    fields (dict): The columns produced by the dissector and their pandas dtypes. A column shared by
+                   several dissectors (e.g. Source_Port) must have the same dtype in all of them.
+
+    Returns:
+    function: The decorator.
+
+    Example:
+    >>> @register_dissector(['SSDP'], {'SSDP_Method': 'category'})
+    ... def dissect_ssdp(rows):
+    ...     return rows['Info'].str.extract(r'^(?P<SSDP_Method>[A-Z-]+) ')
+    """
+    for name, dtype in fields.items():
+        if DISSECTOR_FIELDS.get(name, dtype) != dtype:
+            raise ValueError(f"The field {name} is already registered with the dtype {DISSECTOR_FIELDS[name]}")
+
+    def decorator(dissector):
+        DISSECTOR_FIELDS.update(fields)
+        for protocol in protocols:
+            DISSECTORS[protocol] = dissector
+        return dissector
+    return decorator
+
+
+# Function to extract the named groups of a compiled pattern from the Info column
+def extract_fields(rows, pattern):
+    """
+    Extracts the named groups of a pattern from the Info column of the rows with one vectorized pass.
+
+    Returns:
+    pd.DataFrame: One column per named group (strings, missing when the group did not match), with the index of the rows.
+    """
+    return rows['Info'].astype(str).str.extract(pattern)
+
+
+#########################################################################Dissectors#########################################################################
+# Function to dissect the UDP rows ('51000 > 53 Len=32')
+@register_dissector(['UDP'], {'Source_Port': 'Int32', 'Destination_Port': 'Int32', 'UDP_Length': 'Int32'})
+def dissect_udp(rows):
+    return extract_fields(rows, UDP_PATTERN)
+
+
+# Function to dissect the DNS, mDNS and LLMNR rows ('Standard query response 0x2b3c No such name AAAA foo.example.com SOA ...')
+@register_dissector(['DNS', 'MDNS', 'LLMNR'], {'DNS_Id': 'string', 'DNS_Response': 'boolean', 'DNS_Qtype': 'category',
+                                              'DNS_Qname': 'string', 'DNS_Rcode': 'category'})
+def dissect_dns(rows):
+    fields = extract_fields(rows, DNS_PATTERN)
+    matched = fields['DNS_Id'].notna()
+    fields['DNS_Response'] = fields['Response'].notna().where(matched)
+    # Responses without an error code are NoError, queries have no response code
+    fields['DNS_Rcode'] = fields['Rcode'].map(DNS_RCODES).where(fields['Rcode'].notna(), fields['DNS_Response'].map({True: 'NoError'}))
+    return fields.drop(columns=['Response', 'Rcode'])
+
+
+# Function to dissect the TLS rows ('Client Hello (SNI=www.example.com)'), the version is the Protocol column
+@register_dissector(['SSL', 'SSLv2', 'SSLv3', 'TLSv1', 'TLSv1.1', 'TLSv1.2', 'TLSv1.3'],
+                    {'TLS_Version': 'category', 'TLS_Message': 'category', 'TLS_SNI': 'string'})
+def dissect_tls(rows):
+    fields = extract_fields(rows, TLS_PATTERN)
+    fields['TLS_Version'] = rows['Protocol'].astype(str)
+    return fields
+
+
+# Function to dissect the HTTP rows ('GET /index.html HTTP/1.1', 'HTTP/1.1 200 OK')
+@register_dissector(['HTTP', 'HTTP/JSON', 'HTTP/XML'], {'HTTP_Method': 'category', 'HTTP_URI': 'string',
+                                                       'HTTP_Host': 'string', 'HTTP_Status': 'Int16'})
+def dissect_http(rows):
+    fields = extract_fields(rows, HTTP_PATTERN)
+    # The Info column only holds the request line: the host is the one of an absolute (proxy) or
+    # CONNECT URI, otherwise the address of the server (the destination of requests, the source of responses)
+    absolute_uri = fields['HTTP_URI'].notna() & ~fields['HTTP_URI'].fillna('/').str.startswith('/')
+    uri_host = fields['HTTP_URI'].where(absolute_uri).str.extract(HTTP_HOST_PATTERN)['Host']
+    server = rows['Destination'].astype(str).where(fields['HTTP_Method'].notna(), rows['Source'].astype(str))
+    fields['HTTP_Host'] = uri_host.fillna(server.where(fields['HTTP_Method'].notna() | fields['HTTP_Status'].notna()))
+    return fields
+
+
+# Function to dissect the QUIC rows ('Initial, DCID=8a3f21c0, PKN: 1, CRYPTO, PADDING')
+@register_dissector(['QUIC'], {'QUIC_Packet_Type': 'category', 'QUIC_DCID': 'string', 'QUIC_SCID': 'string'})
+def dissect_quic(rows):
+    return extract_fields(rows, QUIC_PATTERN)
+
+
+#########################################################################Dissection#########################################################################
+# Function to dissect the Info column of every row with a registered dissector
+def dissect_protocols(data):
+    """
+    Dissects the Info column of the rows of the registered protocols (UDP, DNS, TLS, HTTP, QUIC, ...).
+
+    The rows are grouped by Protocol once and every group is handed to its dissector, so the capture is
+    read once whatever the number of dissectors. The rows of other protocols are left out.
+
+    Parameters:
+    data (pd.DataFrame): The capture (or any subset of its rows) with the Protocol and Info columns.
+
+    Returns:
+    pd.DataFrame: The dissected rows with the CAPTURE_COLUMNS present in the data, then every registered
+                  field with its dtype (missing when it does not apply to the protocol of the row), in
+                  the order of the data.
+    """
+    columns = [column for column in CAPTURE_COLUMNS if column in data.columns]
+    parts = []
+    for protocol, positions in data.groupby('Protocol', observed=True, sort=False).indices.items():
+        dissector = DISSECTORS.get(str(protocol))
+        if dissector is None:
+            continue
+        rows = data.iloc[positions]
+        fields = dissector(rows)
+        parts.append(pd.concat([rows[columns].astype({'Source': str, 'Destination': str, 'Protocol': str}), fields], axis=1))
+
+    if not parts:
+        dissected = pd.DataFrame(columns=columns + list(DISSECTOR_FIELDS))
+    else:
+        dissected = pd.concat(parts).sort_index().reindex(columns=columns + list(DISSECTOR_FIELDS))
+    for name, dtype in DISSECTOR_FIELDS.items():
+        values = dissected[name]
+        if dtype.startswith(('Int', 'UInt')):
+            values = pd.to_numeric(values, errors='coerce')
+        dissected[name] = values.astype(dtype)
+    return dissected
+
+
+# Function to compute the metrics of the dissected rows
+def protocol_metrics(dissected):
+    """
+    Computes the metrics of the dissected rows the summary and the warning rules use.
+
+    Parameters:
+    dissected (pd.DataFrame): The output of dissect_protocols.
+
+    Returns:
+    dict: dissected_rows, udp_packets, dns_queries, dns_responses, tls_packets, tls_client_hellos,
+          http_requests, http_responses and quic_packets, plus dns_nxdomain_percent and dns_error_percent
+          when there are DNS responses, tls_legacy_percent when there are TLS rows and http_error_percent
+          when there are HTTP responses.
+    """
+    protocols = dissected['Protocol'].astype(str)
+    dns_response = dissected['DNS_Response'].fillna(False).astype(bool)
+    dns_query = (~dns_response) & dissected['DNS_Id'].notna()
+    tls_packets = int(dissected['TLS_Version'].notna().sum())
+    http_responses = int(dissected['HTTP_Status'].notna().sum())
+    metrics = {
+        'dissected_rows': len(dissected),
+        'udp_packets': int((protocols == 'UDP').sum()),
+        'dns_queries': int(dns_query.sum()),
+        'dns_responses': int(dns_response.sum()),
+        'tls_packets': tls_packets,
+        'tls_client_hellos': int((dissected['TLS_Message'] == 'Client Hello').sum()),
+        'http_requests': int(dissected['HTTP_Method'].notna().sum()),
+        'http_responses': http_responses,
+        'quic_packets': int(dissected['QUIC_Packet_Type'].notna().sum()),
+    }
+    if metrics['dns_responses']:
+        rcodes = dissected.loc[dns_response, 'DNS_Rcode'].astype(str)
+        metrics['dns_nxdomain_percent'] = round(int((rcodes == 'NXDomain').sum()) / metrics['dns_responses'] * 100, 2)
+        metrics['dns_error_percent'] = round(int((rcodes != 'NoError').sum()) / metrics['dns_responses'] * 100, 2)
+    if tls_packets:
+        metrics['tls_legacy_percent'] = round(int(dissected['TLS_Version'].isin(LEGACY_TLS_VERSIONS).sum()) / tls_packets * 100, 2)
+    if http_responses:
+        metrics['http_error_percent'] = round(int((dissected['HTTP_Status'] >= 400).sum()) / http_responses * 100, 2)
+    return metrics
@@ -0,0 +1,155 @@
+# This is the file with the warning rule engine
+
+# Importing the necessary libraries
+import json
+import operator
+import os
+
+
+# Location of the bundled warning rules, can be overridden with the WARNING_RULES environment variable
+default_rules_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'warning_rules.json')
+
+# Comparison operators that can be used in a rule
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+
+# Keys every rule has to define
+REQUIRED_RULE_KEYS = ('metric', 'operator', 'threshold', 'category', 'description', 'recommendation')
+
+# Severity of a metric that no rule flags
+DEFAULT_SEVERITY = 'Low'
+
+
+class DescriptionFields(dict):
+    """
+    The fields the rule descriptions are formatted with: an aggregate that no stage produced for the
+    capture is shown as 'n/a' instead of failing the evaluation.
+    """
+
+    def __missing__(self, key):
+        return 'n/a'
+
+
+#########################################################################Warning Rules#########################################################################
+# Function to load the warning rules from a JSON file
+def load_warning_rules(path=None):
+    """
+    Loads the warning rules from a JSON file.
+
+    Each rule is a dictionary with the following keys:
+        - metric (str): The name of the aggregate the rule is evaluated against.
+        - operator (str): One of '>', '>=', '<', '<=', '==', '!='.
+        - threshold (float): The value the metric is compared with.
+        - category (str): The category shown in the warnings table.
+        - description (str): The description shown in the warnings table. It is formatted with the
+                             aggregates plus 'value', 'threshold' and 'severity' (a missing aggregate is 'n/a').
+        - recommendation (str): The recommendation shown in the warnings table.
+        - severity (str, optional): The severity of the warning (e.g. 'High', 'Moderate').
+        - group (str, optional): Rules sharing a group are mutually exclusive, only the first
+                                 matching rule of a group (in file order) raises a warning.
+
+    Parameters:
+    path (str): The path to the rules file. Defaults to the WARNING_RULES environment variable
+                or the bundled warning_rules.json.
+
+    Returns:
+    list: The list of rule dictionaries.
+
+    Raises:
+    ValueError: If a rule is missing a required key or uses an unknown operator.
+    """
+    path = path or os.getenv('WARNING_RULES') or default_rules_path
+    with open(path, encoding='utf-8') as f:
+        rules = json.load(f)
+
+    for index, rule in enumerate(rules):
+        missing = [key for key in REQUIRED_RULE_KEYS if key not in rule]
+        if missing:
+            raise ValueError(f"Warning rule {index} in {path} is missing {', '.join(missing)}")
+        if rule['operator'] not in OPERATORS:
+            raise ValueError(f"Warning rule {index} in {path} has an unknown operator: {rule['operator']}")
+    return rules
+
+
+# Function to evaluate all the warning rules against a snapshot of the aggregates
+def evaluate_warning_rules(aggregates, rules=None):
+    """
+    Evaluates every warning rule against one snapshot of precomputed aggregates.
+
+    The aggregates are computed once by the analysis stages, so the cost of a rule is a dictionary
+    lookup and a comparison; adding rules does not add passes over the data. Rules whose metric is
+    missing from the snapshot (e.g. no TCP traffic in the capture) are skipped.
+
+    Parameters:
+    aggregates (dict): The metric name to value mapping built by the analysis stages.
+    rules (list): The rules to evaluate. Defaults to load_warning_rules().
+
+    Returns:
+    list: A list of dictionaries with the keys 'category', 'description', 'recommendation',
+          'severity', 'metric', 'value' and 'threshold', in rule order.
+
+    Example:
+    >>> evaluate_warning_rules({'tcp_rst_percent': 30.0})
+    [{'category': 'TCP RST', 'description': 'TCP RST control messages: 30.0% (Moderate)', ...}]
+    """
+    if rules is None:
+        rules = load_warning_rules()
+
+    triggered = []
+    matched_groups = set()
+    for rule in rules:
+        group = rule.get('group')
+        if group is not None and group in matched_groups:
+            continue
+        value = aggregates.get(rule['metric'])
+        if value is None:
+            continue
+        if not OPERATORS[rule['operator']](value, rule['threshold']):
+            continue
+        if group is not None:
+            matched_groups.add(group)
+
+        severity = rule.get('severity', '')
+        fields = DescriptionFields(aggregates, value=value, threshold=rule['threshold'], severity=severity)
+        triggered.append({
+            'category': rule['category'],
+            'description': rule['description'].format_map(fields),
+            'recommendation': rule['recommendation'],
+            'severity': severity,
+            'metric': rule['metric'],
+            'value': value,
+            'threshold': rule['threshold'],
+        })
+    return triggered
+
+
+# Function to get the severity of a metric value from the warning rules
+def metric_severity(metric, value, rules=None):
+    """
+    Returns the severity of the first rule of a metric whose condition holds for the value, the label
+    of the metric in the summary (e.g. 'TCP RST control messages: 30.0% (Moderate)').
+
+    Parameters:
+    metric (str): The name of the aggregate.
+    value (float): The value of the aggregate.
+    rules (list): The rules. Defaults to load_warning_rules().
+
+    Returns:
+    str: The severity of the matching rule, DEFAULT_SEVERITY when no rule matches.
+
+    Example:
+    >>> metric_severity('tcp_rst_percent', 30.0)
+    'Moderate'
+    """
+    if rules is None:
+        rules = load_warning_rules()
+    for rule in rules:
+        if rule['metric'] == metric and value is not None and OPERATORS[rule['operator']](value, rule['threshold']):
+            return rule.get('severity') or DEFAULT_SEVERITY
+    return DEFAULT_SEVERITY
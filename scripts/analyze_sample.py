@@ -0,0 +1,234 @@
+# This is the file with the quick-look functions: analysis of a sample of the capture with confidence intervals
+
+# Importing the necessary libraries
+import argparse
+import csv
+import os
+import random
+import statistics
+import sys
+
+import pandas as pd
+
+# Make the 'scripts' package importable when the quick look is started from the scripts directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scripts import analyze
+from scripts.analyze_rules import evaluate_warning_rules
+from scripts.capture_schema import CAPTURE_SCHEMA
+
+
+# Denominator (in the aggregates) of every percentage metric the warning rules use, used for the confidence intervals
+PERCENT_DENOMINATORS = {
+    'top_source_percent': 'total_packets',
+    'top_destination_percent': 'total_packets',
+    'tcp_rst_percent': 'tcp_control_msgs',
+    'tcp_syn_percent': 'tcp_control_msgs',
+    'tcp_syn_ack_percent': 'tcp_control_msgs',
+    'tcp_retransmission_percent': 'tcp_data_segments',
+    'tcp_dup_ack_percent': 'tcp_packets',
+    'malformed_percent': 'total_packets',
+    'dns_nxdomain_percent': 'dns_responses',
+    'dns_error_percent': 'dns_responses',
+    'http_error_percent': 'http_responses',
+    'tls_legacy_percent': 'tls_packets',
+}
+
+
+#########################################################################Sampling#########################################################################
+# Function to read a sample of lines from a capture CSV without reading the whole file
+def sample_capture(path, sample_size=10000, method='stratified', seed=None):
+    """
+    Reads a sample of the rows of a capture CSV by seeking to random byte offsets.
+
+    For every offset the partial line is discarded and the next full line is kept, so only about
+    sample_size lines are read whatever the size of the file.
+    - 'uniform': the offsets are drawn uniformly over the whole file.
+    - 'stratified': the file is split into sample_size equal strata and one offset is drawn in each.
+      Wireshark exports are in time order, so this is a time-stratified sample.
+
+    Note:
+    - A line is picked with a probability proportional to the length of the line before it. Capture
+      lines have similar lengths, so the bias is small for a quick look, but the results are estimates.
+
+    Parameters:
+    path (str): The path to the capture CSV (with a header line).
+    sample_size (int): The number of lines to sample.
+    method (str): 'stratified' or 'uniform'.
+    seed (int): The seed of the random generator, for reproducible samples.
+
+    Returns:
+    pd.DataFrame: The sampled rows using the capture schema. data.attrs contains 'skipped_lines',
+                  'sample_method', 'sampled_bytes' and 'estimated_total_rows'.
+    """
+    if method not in ('stratified', 'uniform'):
+        raise ValueError(f"Unknown sampling method: {method}")
+    rng = random.Random(seed)
+    file_size = os.path.getsize(path)
+
+    rows = []
+    skipped_lines = 0
+    sampled_bytes = 0
+    with open(path, 'rb') as f:
+        header = next(csv.reader([f.readline().decode('utf-8', errors='replace')]))
+        data_start = f.tell()
+        data_size = file_size - data_start
+
+        if data_size <= 0:
+            offsets = []
+        elif method == 'uniform':
+            offsets = sorted(rng.randrange(data_start, file_size) for _ in range(sample_size))
+        else:
+            stratum = data_size / sample_size
+            offsets = [data_start + int((i + rng.random()) * stratum) for i in range(sample_size)]
+
+        line_starts = set()
+        for offset in offsets:
+            # Move back one byte so an offset at the start of a line keeps that line
+            f.seek(max(offset - 1, data_start - 1))
+            f.readline()
+            line_start = f.tell()
+            line = f.readline()
+            if not line or line_start in line_starts:
+                continue
+            line_starts.add(line_start)
+            sampled_bytes += len(line)
+            fields = next(csv.reader([line.decode('utf-8', errors='replace')]), [])
+            if len(fields) != len(header):
+                skipped_lines += 1
+                continue
+            rows.append(fields)
+
+    data = pd.DataFrame(rows, columns=header)
+    schema = {column: dtype for column, dtype in CAPTURE_SCHEMA.items() if column in data.columns}
+    for column, dtype in schema.items():
+        if dtype in ('uint32', 'float64'):
+            data[column] = pd.to_numeric(data[column], errors='coerce')
+    data = data.astype({column: dtype for column, dtype in schema.items() if dtype not in ('uint32', 'float64')})
+
+    data.attrs['skipped_lines'] = skipped_lines
+    data.attrs['sample_method'] = method
+    data.attrs['sampled_bytes'] = sampled_bytes
+    # The mean sampled line length gives an estimate of the number of rows in the whole capture
+    sampled_lines = len(rows) + skipped_lines
+    data.attrs['estimated_total_rows'] = round(data_size / (sampled_bytes / sampled_lines)) if sampled_lines else 0
+    return data
+
+
+# Function to compute the confidence interval of a proportion
+def proportion_interval(successes, n, confidence=0.95):
+    """
+    Computes the Wilson score interval of a proportion, in percent.
+
+    Parameters:
+    successes (int): The number of sampled rows with the property.
+    n (int): The number of sampled rows.
+    confidence (float): The confidence level, e.g. 0.95.
+
+    Returns:
+    tuple: The (low, high) bounds of the interval in percent, rounded to 2 decimal places.
+
+    Raises:
+    ValueError: If successes is not between 0 and n.
+
+    Example:
+    >>> proportion_interval(50, 100)
+    (40.38, 59.62)
+    """
+    if not 0 <= successes <= n:
+        raise ValueError(f"The number of successes ({successes}) must be between 0 and the number of rows ({n})")
+    if n == 0:
+        return (0.0, 100.0)
+    z = statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+    p = successes / n
+    centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+    margin = (z / (1 + z * z / n)) * ((p * (1 - p) / n + z * z / (4 * n * n)) ** 0.5)
+    return (round(max(centre - margin, 0.0) * 100, 2), round(min(centre + margin, 1.0) * 100, 2))
+
+#########################################################################Quick Look#########################################################################
+# Function to add the share of the top values of a column, with confidence intervals, to the summary
+def summarize_sampled_shares(data, column, label, confidence, top_n=5):
+    """
+    Adds the top values of a column of the sample to the summary, with the confidence interval of their share.
+
+    Parameters:
+    data (pd.DataFrame): The sampled (preprocessed) DataFrame.
+    column (str): The column to analyze.
+    label (str): The label used in the summary.
+    confidence (float): The confidence level of the intervals.
+    top_n (int): The number of values to report.
+    """
+    counts = data[column].value_counts()
+    counts = counts[counts > 0]
+    total = int(counts.sum())
+    analyze.add_summary_row(f"Top {label} (share of sampled packets, {int(confidence * 100)}% confidence interval)")
+    for value, value_count in counts.head(top_n).items():
+        low, high = proportion_interval(int(value_count), total, confidence)
+        analyze.add_summary_row(f"{value}: {round(value_count / total * 100, 2)}% ({low}% - {high}%)")
+
+
+# Function to run the quick-look analysis of a capture
+def quick_look(path, sample_size=10000, method='stratified', confidence=0.95, seed=None):
+    """
+    Runs the usual analysis steps on a sample of the capture and reports the results with confidence intervals.
+
+    This function performs the following steps:
+    1. Reads a sample of the capture without reading the whole file (see sample_capture), and clears
+       the tables and aggregates left over by a previous analysis.
+    2. Runs the preprocessing, source, destination and protocol analysis on the sample.
+    3. Adds the sampling details and the share of the top sources, destinations and protocols, with
+       their confidence intervals, to the summary.
+    4. Evaluates the warning rules and adds the detected scans; every warning is marked as sampled,
+       with the confidence interval of the percentage when it is based on a sampled percentage.
+    5. Prints the summary and warnings tables.
+
+    Parameters:
+    path (str): The path to the capture CSV.
+    sample_size (int): The number of lines to sample.
+    method (str): 'stratified' (time-stratified) or 'uniform'.
+    confidence (float): The confidence level of the intervals.
+    seed (int): The seed of the random generator, for reproducible samples.
+
+    Returns:
+    None
+    """
+    sample = sample_capture(path, sample_size, method, seed)
+    analyze.reset_analysis()
+
+    analyze.add_summary_row("*********Quick Look (sampled)*********")
+    analyze.add_summary_row(f"Sampling method: {method}, sampled rows: {len(sample)}")
+    analyze.add_summary_row(f"Estimated total number of rows in the capture: {sample.attrs['estimated_total_rows']}")
+    analyze.add_summary_row("All the figures below are estimates computed from the sample.")
+    analyze.add_summary_row("")
+
+    data, _ = analyze.run_analysis(sample, evaluate_warnings=False, record_baseline=False)
+
+    analyze.add_summary_row("*********Sampled Shares*********")
+    summarize_sampled_shares(data, 'Source', 'Source IPs', confidence)
+    summarize_sampled_shares(data, 'Destination', 'Destination IPs', confidence)
+    summarize_sampled_shares(data, 'Protocol', 'Protocols', confidence)
+
+    # Mark every warning as computed from the sample
+    for warning in evaluate_warning_rules(analyze.aggregates) + analyze.scan_warnings(analyze.snapshot.get('scans', [])):
+        denominator = analyze.aggregates.get(PERCENT_DENOMINATORS.get(warning['metric']))
+        successes = round(warning['value'] * denominator / 100) if denominator else None
+        if successes is not None and 0 <= successes <= denominator:
+            low, high = proportion_interval(successes, denominator, confidence)
+            marker = f" [sampled estimate, {int(confidence * 100)}% CI {low}% - {high}%]"
+        else:
+            marker = " [sampled estimate]"
+        analyze.add_warnings([dict(warning, description=warning['description'] + marker)])
+
+    print(analyze.table_summary)
+    print(analyze.table_warnings)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Quick look at a large capture using a sample of its rows.')
+    parser.add_argument('capture', help='The path to the capture CSV')
+    parser.add_argument('--sample-size', type=int, default=10000)
+    parser.add_argument('--method', choices=['stratified', 'uniform'], default='stratified')
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    quick_look(args.capture, args.sample_size, args.method, args.confidence, args.seed)
@@ -0,0 +1,223 @@
+# This is the file with the port scan and host sweep detection functions
+
+# Importing the necessary libraries
+import numpy as np
+import pandas as pd
+
+
+# Default thresholds: a source that opens connections (TCP SYN) to more distinct ports or hosts is reported
+PORT_SCAN_THRESHOLD = 100
+HOST_SWEEP_THRESHOLD = 50
+
+# Memory bounds: exact hash sets are kept up to EXACT_LIMIT values, then replaced by a HyperLogLog
+# sketch of 2**PRECISION one byte registers; at most MAX_SOURCES sources are tracked
+EXACT_LIMIT = 128
+PRECISION = 10
+MAX_SOURCES = 65536
+
+
+#########################################################################Distinct Counting#########################################################################
+# Function to hash the values of a Series to 64-bit integers
+def hash_values(values):
+    """
+    Hashes the values of a Series to unsigned 64-bit integers, vectorized.
+
+    Parameters:
+    values (pd.Series): The values to hash.
+
+    Returns:
+    np.ndarray: The uint64 hashes.
+    """
+    return pd.util.hash_pandas_object(values.astype(str), index=False).to_numpy(dtype=np.uint64)
+
+
+# Function to compute the number of significant bits of unsigned 64-bit integers
+def bit_length(values):
+    """
+    Computes the bit length of every unsigned 64-bit integer of an array.
+
+    The values are split into two 32-bit halves, which float64 represents exactly, so frexp
+    gives the exact bit length.
+
+    Parameters:
+    values (np.ndarray): The uint64 values.
+
+    Returns:
+    np.ndarray: The bit length of each value (0 for 0).
+    """
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+class DistinctCounter:
+    """
+    Counts the distinct values added to it in bounded memory.
+
+    Small cardinalities are counted exactly with a sorted array of hashes. Past `exact_limit`
+    distinct values the counter switches to a HyperLogLog sketch (standard error about
+    1.04 / sqrt(2**precision), 3.25% with the default precision). Counters can be merged, so
+    chunks of a capture or the results of several workers can be combined.
+
+    Parameters:
+    exact_limit (int): The number of distinct values counted exactly.
+    precision (int): The number of index bits of the HyperLogLog sketch.
+    """
+
+    __slots__ = ('exact_limit', 'precision', 'hashes', 'registers')
+
+    def __init__(self, exact_limit=EXACT_LIMIT, precision=PRECISION):
+        self.exact_limit = exact_limit
+        self.precision = precision
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.registers = None
+
+    def add_hashes(self, hashes):
+        """
+        Adds an array of uint64 hashes to the counter.
+        """
+        if self.registers is None:
+            self.hashes = np.union1d(self.hashes, hashes)
+            if len(self.hashes) > self.exact_limit:
+                self.registers = np.zeros(1 << self.precision, dtype=np.uint8)
+                self.update_registers(self.hashes)
+                self.hashes = np.empty(0, dtype=np.uint64)
+        else:
+            self.update_registers(hashes)
+
+    def update_registers(self, hashes):
+        """
+        Updates the HyperLogLog registers with an array of uint64 hashes.
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        value_bits = 64 - self.precision
+        index = (hashes >> np.uint64(value_bits)).astype(np.int64)
+        remainder = hashes & np.uint64((1 << value_bits) - 1)
+        # The rank is the position of the leftmost 1 bit of the remaining bits
+        rank = (value_bits - bit_length(remainder) + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other):
+        """
+        Merges another counter into this one.
+        """
+        if other.registers is None:
+            self.add_hashes(other.hashes)
+        elif self.registers is None:
+            hashes = self.hashes
+            self.registers = other.registers.copy()
+            self.hashes = np.empty(0, dtype=np.uint64)
+            self.update_registers(hashes)
+        else:
+            np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        """
+        Returns the (exact or estimated) number of distinct values.
+        """
+        if self.registers is None:
+            return len(self.hashes)
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = np.count_nonzero(self.registers == 0)
+        # Small range correction (linear counting)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)
+        return int(round(estimate))
+
+    def is_exact(self):
+        """
+        Returns True while the counter still counts exactly.
+        """
+        return self.registers is None
+
+#########################################################################Scan Detection#########################################################################
+class ScanDetector:
+    """
+    Keeps, per source, the number of distinct destination ports and destination hosts it opened
+    TCP connections to (SYN packets), to detect vertical port scans and horizontal host sweeps.
+
+    Memory is bounded: each counter is at most max(exact_limit * 8, 2**precision) bytes and at
+    most `max_sources` sources are tracked; packets from further sources are only counted in
+    `untracked_packets`, so a capture with spoofed sources cannot exhaust the memory.
+
+    Parameters:
+    port_threshold (int): The number of distinct destination ports above which a source is reported.
+    host_threshold (int): The number of distinct destination hosts above which a source is reported.
+    max_sources (int): The maximum number of sources tracked.
+    exact_limit (int): See DistinctCounter.
+    precision (int): See DistinctCounter.
+    """
+
+    def __init__(self, port_threshold=PORT_SCAN_THRESHOLD, host_threshold=HOST_SWEEP_THRESHOLD,
+                 max_sources=MAX_SOURCES, exact_limit=EXACT_LIMIT, precision=PRECISION):
+        self.port_threshold = port_threshold
+        self.host_threshold = host_threshold
+        self.max_sources = max_sources
+        self.exact_limit = exact_limit
+        self.precision = precision
+        self.ports = {}
+        self.hosts = {}
+        self.untracked_packets = 0
+
+    def new_counter(self):
+        return DistinctCounter(self.exact_limit, self.precision)
+
+    def update(self, tcp_data):
+        """
+        Adds a chunk of TCP packets to the detector.
+
+        Parameters:
+        tcp_data (pd.DataFrame): TCP packets with the columns 'Source', 'Destination',
+                                 'Destination_Port' and 'TCP_Control_Msg' (see extract_TCP_details).
+        """
+        syn = tcp_data[tcp_data['TCP_Control_Msg'] == 'SYN']
+        if syn.empty:
+            return
+        hashes = pd.DataFrame({
+            'Source': syn['Source'].astype(str).values,
+            'Port': hash_values(syn['Destination_Port']),
+            'Host': hash_values(syn['Destination']),
+        })
+        for source, group in hashes.groupby('Source', sort=False):
+            if source not in self.ports:
+                if len(self.ports) >= self.max_sources:
+                    self.untracked_packets += len(group)
+                    continue
+                self.ports[source] = self.new_counter()
+                self.hosts[source] = self.new_counter()
+            self.ports[source].add_hashes(group['Port'].unique())
+            self.hosts[source].add_hashes(group['Host'].unique())
+
+    def merge(self, other):
+        """
+        Merges the counters of another detector (e.g. of another chunk or worker) into this one.
+        """
+        for source in other.ports:
+            if source not in self.ports:
+                if len(self.ports) >= self.max_sources:
+                    continue
+                self.ports[source] = self.new_counter()
+                self.hosts[source] = self.new_counter()
+            self.ports[source].merge(other.ports[source])
+            self.hosts[source].merge(other.hosts[source])
+        self.untracked_packets += other.untracked_packets
+
+    def scans(self):
+        """
+        Returns the sources above the thresholds.
+
+        Returns:
+        list: A list of dictionaries with the keys 'source', 'kind' ('vertical' or 'horizontal'),
+              'distinct' (the number of distinct ports or hosts) and 'exact' (False when estimated
+              by the sketch), sorted by decreasing distinct count.
+        """
+        found = []
+        for source in self.ports:
+            for kind, counter, threshold in (('vertical', self.ports[source], self.port_threshold),
+                                             ('horizontal', self.hosts[source], self.host_threshold)):
+                distinct = counter.count()
+                if distinct > threshold:
+                    found.append({'source': source, 'kind': kind, 'distinct': distinct, 'exact': counter.is_exact()})
+        return sorted(found, key=lambda scan: scan['distinct'], reverse=True)
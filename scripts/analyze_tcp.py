@@ -0,0 +1,201 @@
+# This is the file with the TCP performance functions: retransmissions, duplicate ACKs, zero windows and handshake RTT
+
+# Importing the necessary libraries
+import numpy as np
+import pandas as pd
+from scripts.info_flags import FLAGS_COLUMN, has_flag
+
+
+# Seq, Ack, Win and Len fields of the Info column of TCP rows, in the order Wireshark prints them
+# (Ack is missing before the handshake completes)
+TCP_FIELDS_PATTERN = r'\bSeq=(?P<Seq>\d+)(?:\s+Ack=(?P<Ack>\d+))?(?:\s+Win=(?P<Win>\d+))?(?:\s+Len=(?P<Len>\d+))?'
+TCP_FIELDS = ['Seq', 'Ack', 'Win', 'Len']
+
+# The columns identifying a flow (one direction of a TCP connection)
+FLOW_COLUMNS = ['Source', 'Source_Port', 'Destination', 'Destination_Port']
+
+# The percentiles reported for the per-flow retransmission rates and the handshake RTTs
+PERCENTILES = (50, 90, 99)
+
+
+#########################################################################Field Extraction#########################################################################
+# Function to extract the Seq, Ack, Win and Len fields of the Info column
+def extract_tcp_fields(info):
+    """
+    Extracts the Seq, Ack, Win and Len fields of the Info column of TCP rows with one vectorized
+    regular expression pass.
+
+    Parameters:
+    info (pd.Series): The Info column of the TCP rows.
+
+    Returns:
+    pd.DataFrame: The Seq, Ack, Win and Len columns (nullable Int64, missing when the field is not
+                  in the Info), with the index of info.
+
+    Example:
+    >>> extract_tcp_fields(pd.Series(['443 > 51000 [ACK] Seq=1 Ack=518 Win=65535 Len=1460'])).iloc[0].tolist()
+    [1, 518, 65535, 1460]
+    """
+    fields = info.astype(str).str.extract(TCP_FIELDS_PATTERN)
+    return fields.apply(pd.to_numeric, errors='coerce').astype('Int64')
+
+#########################################################################Flow Analysis#########################################################################
+# Function to flag the retransmissions, duplicate ACKs and zero window events of every TCP packet
+def flag_tcp_events(tcp_details):
+    """
+    Flags the retransmissions, duplicate ACKs and zero window events of TCP packets.
+
+    Every flag combines the Wireshark expert info (the Info_Flags bitmask, see info_flags.py) with a check
+    of the numeric fields, so the events are found whether or not the capture was exported with the analysis flags:
+    - Retransmission: a data segment (Len > 0) whose last byte (Seq + Len) was already covered by an
+      earlier segment of the flow, or a data segment with a '... Retransmission' message. Keep-alives are
+      excluded, and so are the retransmitted SYNs and FINs (Len = 0), which are not in the data segments the
+      retransmission rate is computed over.
+    - Dup_ACK: a bare ACK (Len = 0) repeating the Ack and Win of the previous packet of the flow, or
+      a 'TCP Dup ACK' message.
+    - Zero_Window: a packet advertising Win = 0 (resets excluded), or a 'TCP ZeroWindow' message.
+
+    The packets are processed in capture order with grouped cumulative operations, in linear time.
+
+    Parameters:
+    tcp_details (pd.DataFrame): The output of analyze.parse_TCP_details, with the Seq, Ack, Win, Len and Info_Flags columns.
+
+    Returns:
+    pd.DataFrame: The Flow_Id (integer id of the flow), Retransmission, Dup_ACK and Zero_Window columns.
+    """
+    flow_id = tcp_details.groupby(FLOW_COLUMNS, sort=False, dropna=False).ngroup()
+    seq = tcp_details['Seq'].astype('float64')
+    ack = tcp_details['Ack'].astype('float64')
+    win = tcp_details['Win'].astype('float64')
+    length = tcp_details['Len'].astype('float64')
+    flags = tcp_details[FLAGS_COLUMN]
+    control_msg = tcp_details['TCP_Control_Msg'].astype(str)
+
+    # Highest sequence number covered by the earlier segments of the flow
+    segment_end = seq + length
+    covered = segment_end.groupby(flow_id).cummax().groupby(flow_id).shift()
+    covered = covered.groupby(flow_id).ffill()
+    retransmission = (length > 0) & (((segment_end <= covered) & ~has_flag(flags, 'KEEP_ALIVE')) | has_flag(flags, 'RETRANSMISSION'))
+
+    previous_ack = ack.groupby(flow_id).shift()
+    previous_win = win.groupby(flow_id).shift()
+    dup_ack = ((length == 0) & (control_msg == 'ACK') & (ack == previous_ack) & (win == previous_win)) | has_flag(flags, 'DUP_ACK')
+
+    zero_window = ((win == 0) & ~control_msg.str.contains('RST', regex=False)) | has_flag(flags, 'ZERO_WINDOW')
+
+    return pd.DataFrame({
+        'Flow_Id': flow_id,
+        'Retransmission': retransmission.to_numpy(dtype=bool),
+        'Dup_ACK': dup_ack.to_numpy(dtype=bool),
+        'Zero_Window': zero_window.to_numpy(dtype=bool),
+    }, index=tcp_details.index)
+
+
+# Function to measure the handshake round trip time of every flow
+def handshake_rtt(tcp_details):
+    """
+    Measures the handshake RTT of every flow: the time between the first SYN of the client and the
+    first SYN/ACK of the server, in milliseconds.
+
+    The SYNs and SYN/ACKs are matched with a hash join on the flow (reversed for the SYN/ACK), in linear time.
+
+    Parameters:
+    tcp_details (pd.DataFrame): The output of analyze.parse_TCP_details, with the Time column.
+
+    Returns:
+    pd.Series: The handshake RTT in ms, indexed by the client flow columns (Source, Source_Port,
+               Destination, Destination_Port). Empty if the capture has no complete handshake.
+    """
+    syn = tcp_details[tcp_details['TCP_Control_Msg'] == 'SYN'].groupby(FLOW_COLUMNS, sort=False)['Time'].min()
+    syn_ack = tcp_details[tcp_details['TCP_Control_Msg'] == 'SYN, ACK'].groupby(FLOW_COLUMNS, sort=False)['Time'].min()
+    # The SYN/ACK travels in the other direction
+    syn_ack.index = syn_ack.index.set_names(['Destination', 'Destination_Port', 'Source', 'Source_Port'])
+    syn_ack = syn_ack.reorder_levels(FLOW_COLUMNS)
+
+    times = pd.concat([syn.rename('SYN'), syn_ack.rename('SYN_ACK')], axis=1, join='inner')
+    rtt = (times['SYN_ACK'] - times['SYN']) * 1000
+    return rtt[rtt >= 0].round(3).rename('Handshake_RTT_ms')
+
+
+# Function to compute the TCP performance of every flow and the summary metrics
+def tcp_performance(tcp_details):
+    """
+    Computes the retransmissions, duplicate ACKs, zero window events and handshake RTT of every flow,
+    and the metrics the warning rules are evaluated against.
+
+    Parameters:
+    tcp_details (pd.DataFrame): The output of analyze.parse_TCP_details.
+
+    Returns:
+    tuple: (flows, metrics), see flow_performance.
+    """
+    events = flag_tcp_events(tcp_details)
+    events['Data_Segment'] = (tcp_details['Len'].fillna(0) > 0).to_numpy()
+
+    flows = events.groupby('Flow_Id', sort=False).agg(
+        Packets=('Retransmission', 'size'),
+        Data_Segments=('Data_Segment', 'sum'),
+        Retransmissions=('Retransmission', 'sum'),
+        Dup_ACKs=('Dup_ACK', 'sum'),
+        Zero_Window_Events=('Zero_Window', 'sum'),
+    )
+    # Label every flow with its first packet
+    first_rows = tcp_details.groupby(events['Flow_Id'], sort=False, dropna=False)[FLOW_COLUMNS].first().loc[flows.index]
+    flows = pd.concat([first_rows, flows], axis=1).reset_index(drop=True)
+    rtt = handshake_rtt(tcp_details) if 'Time' in tcp_details.columns else pd.Series(dtype='float64')
+    return flow_performance(flows, rtt)
+
+
+# Function to derive the rates, the handshake RTT and the summary metrics from the per-flow counts
+def flow_performance(flows, rtt):
+    """
+    Derives the retransmission rate and handshake RTT of every flow and the summary metrics from the
+    per-flow event counts. Shared by tcp_performance and the DuckDB backend, which counts the events in SQL.
+
+    Parameters:
+    flows (pd.DataFrame): One row per flow, in the order of their first packet, with the flow columns
+                          (Source, Source_Port, Destination, Destination_Port) and the Packets,
+                          Data_Segments, Retransmissions, Dup_ACKs and Zero_Window_Events counts.
+    rtt (pd.Series): The output of handshake_rtt.
+
+    Returns:
+    tuple: (flows, metrics)
+        - flows (pd.DataFrame): One row per flow ('A:port > B:port') with the Packets, Data_Segments,
+          Retransmissions, Retransmission_Percent, Dup_ACKs, Zero_Window_Events and Handshake_RTT_ms columns.
+        - metrics (dict): tcp_packets, tcp_data_segments, tcp_retransmissions, tcp_retransmission_percent,
+          tcp_dup_acks, tcp_dup_ack_percent, tcp_zero_window_events, tcp_zero_window_flows,
+          tcp_flow_retransmission_p<N>_percent, tcp_handshakes and tcp_handshake_rtt_p<N>_ms
+          (the percentile metrics only when there are data segments or handshakes).
+    """
+    # Flows without ports (e.g. Info columns with only '[Malformed Packet]') are labeled 'None'
+    keys = flows[FLOW_COLUMNS].astype(object).where(flows[FLOW_COLUMNS].notna(), None).astype(str)
+    flows = flows.drop(columns=FLOW_COLUMNS).astype('int64')
+    flows['Retransmission_Percent'] = (flows['Retransmissions'] / flows['Data_Segments'].where(flows['Data_Segments'] > 0) * 100).round(2)
+    flows['Handshake_RTT_ms'] = rtt.reindex(pd.MultiIndex.from_frame(keys)).to_numpy() if not rtt.empty else np.nan
+    flows.index = keys['Source'] + ':' + keys['Source_Port'] + ' > ' + keys['Destination'] + ':' + keys['Destination_Port']
+    flows.index.name = 'Flow'
+    flows = flows[['Packets', 'Data_Segments', 'Retransmissions', 'Retransmission_Percent', 'Dup_ACKs', 'Zero_Window_Events', 'Handshake_RTT_ms']]
+
+    packets = int(flows['Packets'].sum())
+    data_segments = int(flows['Data_Segments'].sum())
+    retransmissions = int(flows['Retransmissions'].sum())
+    dup_acks = int(flows['Dup_ACKs'].sum())
+    metrics = {
+        'tcp_packets': packets,
+        'tcp_data_segments': data_segments,
+        'tcp_retransmissions': retransmissions,
+        'tcp_retransmission_percent': round(retransmissions / data_segments * 100, 2) if data_segments else 0.0,
+        'tcp_dup_acks': dup_acks,
+        'tcp_dup_ack_percent': round(dup_acks / packets * 100, 2) if packets else 0.0,
+        'tcp_zero_window_events': int(flows['Zero_Window_Events'].sum()),
+        'tcp_zero_window_flows': int((flows['Zero_Window_Events'] > 0).sum()),
+        'tcp_handshakes': int(rtt.size),
+    }
+    flow_rates = flows['Retransmission_Percent'].dropna()
+    if not flow_rates.empty:
+        for percentile, value in zip(PERCENTILES, np.percentile(flow_rates, PERCENTILES)):
+            metrics[f'tcp_flow_retransmission_p{percentile}_percent'] = round(float(value), 2)
+    if not rtt.empty:
+        for percentile, value in zip(PERCENTILES, np.percentile(rtt, PERCENTILES)):
+            metrics[f'tcp_handshake_rtt_p{percentile}_ms'] = round(float(value), 3)
+    return flows, metrics
@@ -0,0 +1,421 @@
+# This is the file with the TLS fingerprinting (JA3/JA4/SNI) and the offline application labeling
+
+# Importing the necessary libraries
+import functools
+import io
+import json
+import os
+import shutil
+import subprocess
+import pandas as pd
+
+
+# Location of the bundled application index (registrable domains of well known services)
+default_index_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tls_applications.json')
+
+# Path to the local index of the learned fingerprints, empty (the default) keeps them in memory only; set the TLS_FINGERPRINTS
+# environment variable (e.g. to ../results/tls_fingerprints.json) to save them and label the next captures with them
+learned_index_path = os.environ.get('TLS_FINGERPRINTS', '')
+
+# The fingerprint kinds of the index, in labeling order: the server name first, then the client
+# fingerprints and last the server fingerprint (the same server software answers many applications)
+FINGERPRINT_KINDS = ['SNI', 'JA4', 'JA3', 'JA3S']
+
+# The accepted CSV headers of every fingerprint column (Wireshark custom columns keep the field name or its title)
+TLS_FIELD_COLUMNS = {
+    'JA3': ['JA3', 'ja3', 'tls.handshake.ja3'],
+    'JA3S': ['JA3S', 'ja3s', 'tls.handshake.ja3s'],
+    'JA4': ['JA4', 'ja4', 'tls.handshake.ja4'],
+    'SNI': ['SNI', 'Server Name', 'tls.handshake.extensions_server_name'],
+}
+
+# The tshark fields of every fingerprint column (JA4 needs Wireshark 4.2 or later, JA3 is in every recent version)
+TSHARK_FIELDS = {
+    'JA3': 'tls.handshake.ja3',
+    'JA3S': 'tls.handshake.ja3s',
+    'JA4': 'tls.handshake.ja4',
+    'SNI': 'tls.handshake.extensions_server_name',
+}
+
+# The tshark display filter of the Client Hello (1) and Server Hello (2) messages
+TSHARK_FILTER = 'tls.handshake.type == 1 || tls.handshake.type == 2'
+
+# The columns of the handshake table
+HANDSHAKE_COLUMNS = ['Source', 'Destination', 'Server'] + FINGERPRINT_KINDS
+
+# A fingerprint is learned only when all its handshakes went to one application, and at least this many
+MIN_LEARN_HANDSHAKES = int(os.environ.get('TLS_LEARN_MIN_HANDSHAKES', 3))
+
+
+#########################################################################Handshake Extraction#########################################################################
+# Function to find the pcap file a capture was exported from
+def capture_pcap(data):
+    """
+    Returns the pcap file of a capture: the CAPTURE_PCAP environment variable, otherwise the .pcapng or
+    .pcap file next to the CSV export with the same name (data.attrs['capture']), otherwise None.
+    """
+    pcap = os.getenv('CAPTURE_PCAP')
+    if pcap:
+        return pcap
+    capture = data.attrs.get('capture')
+    if not capture:
+        return None
+    for extension in ('.pcapng', '.pcap'):
+        candidate = os.path.splitext(capture)[0] + extension
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+# Function to parse the tab separated output of tshark into a handshake table
+def parse_tshark_handshakes(output):
+    """
+    Parses the output of read_tshark_handshakes (tshark -T fields with a header line).
+
+    Parameters:
+    output (str): The tab separated fields: ip.src, ipv6.src, ip.dst, ipv6.dst, tls.handshake.type and
+                  the available TSHARK_FIELDS.
+
+    Returns:
+    pd.DataFrame: The HANDSHAKE_COLUMNS, one row per Client Hello or Server Hello.
+
+    Example:
+    >>> parse_tshark_handshakes('ip.src\\tipv6.src\\tip.dst\\tipv6.dst\\ttls.handshake.type\\ttls.handshake.ja3\\n'
+    ...                         '10.0.0.2\\t\\t142.250.1.1\\t\\t1\\t0123456789abcdef0123456789abcdef\\n').loc[0, 'Server']
+    '142.250.1.1'
+    """
+    fields = pd.read_csv(io.StringIO(output), sep='\t', dtype=str, keep_default_na=False)
+    fields = fields.replace('', None)
+    columns = {field: name for name, field in TSHARK_FIELDS.items()}
+    handshakes = fields.rename(columns=columns).reindex(columns=['tls.handshake.type'] + FINGERPRINT_KINDS)
+    handshakes['Source'] = fields['ip.src'].fillna(fields['ipv6.src'])
+    handshakes['Destination'] = fields['ip.dst'].fillna(fields['ipv6.dst'])
+    # Several handshake messages can share a record ('1,2'), the first one is the one of the fingerprints
+    server_hello = handshakes['tls.handshake.type'].fillna('').str.split(',').str[0] == '2'
+    handshakes['Server'] = handshakes['Source'].where(server_hello, handshakes['Destination'])
+    return handshakes[HANDSHAKE_COLUMNS]
+
+
+# Function to extract the TLS handshakes of a pcap file with tshark
+def read_tshark_handshakes(pcap):
+    """
+    Extracts the fingerprints and server names of the TLS handshakes of a pcap file with tshark.
+
+    The fields the installed tshark does not know (e.g. tls.handshake.ja4 before Wireshark 4.2) are
+    dropped and the extraction is run again without them.
+
+    Parameters:
+    pcap (str): The path to the pcap file.
+
+    Returns:
+    pd.DataFrame: The handshake table (see parse_tshark_handshakes), or None when tshark is not installed.
+    """
+    tshark = shutil.which('tshark')
+    if tshark is None:
+        return None
+    fields = ['ip.src', 'ipv6.src', 'ip.dst', 'ipv6.dst', 'tls.handshake.type'] + list(TSHARK_FIELDS.values())
+    while True:
+        command = [tshark, '-r', pcap, '-Y', TSHARK_FILTER, '-T', 'fields', '-E', 'header=y', '-E', 'separator=/t',
+                   '-E', 'occurrence=f'] + [argument for field in fields for argument in ('-e', field)]
+        process = subprocess.run(command, capture_output=True, text=True)
+        if process.returncode == 0:
+            return parse_tshark_handshakes(process.stdout)
+        # 'tshark: Some fields aren't valid:' is followed by one tab indented line per field
+        invalid = {line.strip() for line in process.stderr.splitlines() if line.startswith('\t')}
+        if not invalid or not invalid & set(TSHARK_FIELDS.values()):
+            raise RuntimeError(f"tshark failed on {pcap}: {process.stderr.strip()}")
+        fields = [field for field in fields if field not in invalid]
+
+
+# Function to get the TLS handshakes from the Wireshark-exported TLS field columns of the capture
+def csv_handshakes(data):
+    """
+    Returns the handshake table of the rows with a TLS field column (see TLS_FIELD_COLUMNS) filled, or
+    None when the export has no TLS field column.
+    """
+    columns = {}
+    for name, headers in TLS_FIELD_COLUMNS.items():
+        header = next((header for header in headers if header in data.columns), None)
+        if header is not None:
+            columns[header] = name
+    if not columns:
+        return None
+    fields = data[list(columns)].rename(columns=columns).astype('string').reindex(columns=FINGERPRINT_KINDS)
+    rows = fields.notna().any(axis=1)
+    handshakes = fields[rows].astype(object).where(fields[rows].notna(), None)
+    handshakes['Source'] = data.loc[rows, 'Source'].astype(str)
+    handshakes['Destination'] = data.loc[rows, 'Destination'].astype(str)
+    # The Server Hello is the only message with a JA3S, its server is the source
+    server_hello = handshakes['JA3S'].notna() & handshakes[['SNI', 'JA4', 'JA3']].isna().all(axis=1)
+    handshakes['Server'] = handshakes['Source'].where(server_hello, handshakes['Destination'])
+    return handshakes[HANDSHAKE_COLUMNS].reset_index(drop=True)
+
+
+# Function to get the TLS handshakes of a capture from the best available source
+def tls_handshakes(data, dissected=None, pcap=None):
+    """
+    Returns the TLS handshakes of a capture, from the first available source:
+    1. The pcap file the capture was exported from, read with tshark (JA3, JA3S, JA4 and SNI).
+    2. The TLS field columns of the CSV export (see TLS_FIELD_COLUMNS).
+    3. The server names of the Client Hellos in the Info column (see analyze_protocols.dissect_tls).
+
+    Parameters:
+    data (pd.DataFrame or SQLCapture): The capture.
+    dissected (pd.DataFrame): The output of analyze_protocols.dissect_protocols, for the third source.
+    pcap (str): The pcap file. Defaults to capture_pcap(data).
+
+    Returns:
+    tuple: (handshakes, source)
+        - handshakes (pd.DataFrame): The HANDSHAKE_COLUMNS, one row per handshake message.
+        - source (str): 'pcap', 'csv' or 'info'.
+    """
+    pcap = pcap or capture_pcap(data)
+    if pcap:
+        try:
+            handshakes = read_tshark_handshakes(pcap)
+        except (OSError, RuntimeError) as error:
+            print(f"The TLS handshakes could not be read from {pcap}: {error}")
+            handshakes = None
+        if handshakes is not None:
+            return handshakes, 'pcap'
+
+    # The TLS field columns are only read from a pandas capture
+    if isinstance(data, pd.DataFrame):
+        handshakes = csv_handshakes(data)
+        if handshakes is not None:
+            return handshakes, 'csv'
+
+    handshakes = pd.DataFrame(columns=HANDSHAKE_COLUMNS, dtype=object)
+    if dissected is not None and 'TLS_SNI' in dissected.columns:
+        hellos = dissected[dissected['TLS_SNI'].notna()]
+        handshakes = pd.DataFrame({'Source': hellos['Source'].astype(str), 'Destination': hellos['Destination'].astype(str),
+                                   'Server': hellos['Destination'].astype(str), 'SNI': hellos['TLS_SNI'].astype(object)},
+                                  columns=HANDSHAKE_COLUMNS).reset_index(drop=True)
+    return handshakes, 'info'
+
+
+#########################################################################Fingerprint Index#########################################################################
+# Function to load an index file
+def load_index_file(path):
+    """
+    Loads an index file: {"sni": {registrable domain or host name: application}, "ja3": {...},
+    "ja3s": {...}, "ja4": {...}}. A missing file is an empty index.
+    """
+    index = {kind.lower(): {} for kind in FINGERPRINT_KINDS}
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for kind, entries in json.load(f).items():
+                index.setdefault(kind.lower(), {}).update({key.lower(): application for key, application in entries.items()})
+    return index
+
+
+class FingerprintIndex:
+    """
+    A local fingerprint -> application index: the bundled tls_applications.json, overridden by the
+    entries learned from the previous captures (learned_index_path).
+
+    Every distinct value is resolved once (the results are memoized), so a capture is labeled with one
+    dictionary lookup per unique fingerprint and a vectorized mapping of the handshakes.
+
+    Parameters:
+    path (str): The index of the learned fingerprints. Defaults to learned_index_path, an empty string
+                keeps the learned fingerprints in memory only.
+
+    Example:
+    >>> index = FingerprintIndex('')
+    >>> index.lookup('SNI', pd.Series(['rr3---sn-4g5e6nzl.googlevideo.com', 'example.org'])).tolist()
+    ['YouTube', None]
+    """
+
+    def __init__(self, path=None):
+        self.path = learned_index_path if path is None else path
+        self.bundled = load_index_file(default_index_path)
+        self.learned = load_index_file(self.path)
+        self.changed = False
+        self.cache = {}
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.bundled.values()) + sum(len(entries) for entries in self.learned.values())
+
+    def application(self, kind, value):
+        """
+        Returns the application of one value, or None. A server name matches its own entry or the entry
+        of its nearest parent domain ('rr3.googlevideo.com' -> 'googlevideo.com').
+        """
+        kind = kind.lower()
+        key = (kind, value)
+        if key not in self.cache:
+            value = value.strip().rstrip('.').lower()
+            candidates = [value]
+            if kind == 'sni':
+                labels = value.split('.')
+                candidates = ['.'.join(labels[position:]) for position in range(len(labels))]
+            self.cache[key] = next((entries[candidate] for candidate in candidates
+                                    for entries in (self.learned[kind], self.bundled[kind]) if candidate in entries), None)
+        return self.cache[key]
+
+    def lookup(self, kind, values):
+        """
+        Returns the application of every value of a Series (None when unknown or missing), looking up the
+        unique values only.
+        """
+        codes, uniques = pd.factorize(values)
+        applications = pd.Series([self.application(kind, value) for value in uniques] + [None], dtype=object)
+        # factorize codes the missing values as -1, the last entry
+        return pd.Series(applications.to_numpy()[codes], index=values.index, dtype=object)
+
+    def learn(self, kind, value, application):
+        """
+        Adds a fingerprint to the learned index.
+        """
+        kind = kind.lower()
+        self.learned.setdefault(kind, {})[value.lower()] = application
+        self.cache = {key: cached for key, cached in self.cache.items() if key[0] != kind}
+        self.changed = True
+
+    def save(self):
+        """
+        Saves the learned fingerprints to the index file (when there is one and they changed), merged with
+        the ones saved in the meantime by other processes (e.g. the service workers).
+        """
+        if not self.path or not self.changed:
+            return
+        saved = load_index_file(self.path)
+        for kind, entries in self.learned.items():
+            saved.setdefault(kind, {}).update(entries)
+        self.learned = saved
+        self.cache = {}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(self.learned, f, indent=2, sort_keys=True)
+            f.write('\n')
+        self.changed = False
+
+
+# Function to get the fingerprint index, loaded once per process
+def fingerprint_index(path=None):
+    """
+    Returns the fingerprint index of an index file, loaded once per process and file.
+
+    Parameters:
+    path (str): The index of the learned fingerprints. Defaults to learned_index_path, read at every call.
+    """
+    return load_fingerprint_index(learned_index_path if path is None else path)
+
+
+@functools.lru_cache(maxsize=None)
+def load_fingerprint_index(path):
+    return FingerprintIndex(path)
+
+
+#########################################################################Application Labeling#########################################################################
+# Function to learn the fingerprints of the handshakes labeled by their server name
+def learn_fingerprints(handshakes, sni_applications, index, min_handshakes=MIN_LEARN_HANDSHAKES):
+    """
+    Learns the unknown JA4, JA3 and JA3S fingerprints whose handshakes all went to one application
+    (from their server names), seen in at least min_handshakes handshakes. Fingerprints shared by
+    several applications (browsers, common TLS libraries) are never learned.
+
+    Parameters:
+    handshakes (pd.DataFrame): The handshake table.
+    sni_applications (pd.Series): The application of the server name of every handshake.
+    index (FingerprintIndex): The index the fingerprints are added to.
+    min_handshakes (int): The minimum number of handshakes of a learned fingerprint.
+
+    Returns:
+    int: The number of fingerprints learned.
+    """
+    # A Server Hello has no server name, its application is the one of the Client Hellos to its server (if only one)
+    server_applications = sni_applications.dropna().groupby(handshakes['Server']).agg(['nunique', 'first'])
+    server_applications = server_applications.loc[server_applications['nunique'] == 1, 'first']
+
+    learned = 0
+    for kind in FINGERPRINT_KINDS[1:]:
+        applications = sni_applications if kind != 'JA3S' else handshakes['Server'].map(server_applications)
+        rows = handshakes[kind].notna() & applications.notna()
+        if not rows.any():
+            continue
+        rows &= index.lookup(kind, handshakes[kind]).isna()
+        groups = applications[rows].groupby(handshakes.loc[rows, kind]).agg(['nunique', 'size', 'first'])
+        for fingerprint, group in groups[(groups['nunique'] == 1) & (groups['size'] >= min_handshakes)].iterrows():
+            index.learn(kind, fingerprint, group['first'])
+            learned += 1
+    return learned
+
+
+# Function to label the TLS handshakes and their servers with an application
+def label_applications(handshakes, index, learn=True):
+    """
+    Labels every handshake with the application of its server name, otherwise of its JA4, JA3 or JA3S
+    fingerprint, and every server with the most common application of its handshakes.
+
+    Parameters:
+    handshakes (pd.DataFrame): The handshake table (see tls_handshakes).
+    index (FingerprintIndex): The fingerprint index.
+    learn (bool): Set to False to skip learning new fingerprints (see learn_fingerprints).
+
+    Returns:
+    tuple: (handshakes, servers, learned)
+        - handshakes (pd.DataFrame): The handshake table with the Application and Labeled_By columns.
+        - servers (pd.Series): The application of every labeled server address.
+        - learned (int): The number of fingerprints learned.
+    """
+    handshakes = handshakes.copy()
+    applications = {kind: index.lookup(kind, handshakes[kind]) for kind in FINGERPRINT_KINDS[:1]}
+    learned = learn_fingerprints(handshakes, applications['SNI'], index) if learn else 0
+    applications.update({kind: index.lookup(kind, handshakes[kind]) for kind in FINGERPRINT_KINDS[1:]})
+
+    handshakes['Application'] = pd.Series(None, index=handshakes.index, dtype=object)
+    handshakes['Labeled_By'] = pd.Series(None, index=handshakes.index, dtype=object)
+    for kind in FINGERPRINT_KINDS:
+        unlabeled = handshakes['Application'].isna() & applications[kind].notna()
+        handshakes.loc[unlabeled, 'Application'] = applications[kind][unlabeled]
+        handshakes.loc[unlabeled, 'Labeled_By'] = kind
+
+    labeled = handshakes[handshakes['Application'].notna()]
+    if labeled.empty:
+        servers = pd.Series(dtype=object, name='Application')
+    else:
+        counts = labeled.groupby(['Server', 'Application']).size().sort_values(ascending=False, kind='stable')
+        servers = counts.reset_index().drop_duplicates('Server').set_index('Server')['Application']
+    return handshakes, servers, learned
+
+
+# Function to fingerprint the TLS handshakes of a capture and label the applications
+def fingerprint_applications(data, dissected=None, index=None, pcap=None):
+    """
+    Fingerprints the TLS handshakes of a capture (see tls_handshakes) and labels the applications from
+    the fingerprint index, offline and in linear time. The learned fingerprints are saved to the index.
+
+    Parameters:
+    data (pd.DataFrame or SQLCapture): The capture.
+    dissected (pd.DataFrame): The output of analyze_protocols.dissect_protocols.
+    index (FingerprintIndex): The fingerprint index. Defaults to fingerprint_index().
+    pcap (str): The pcap file. Defaults to capture_pcap(data).
+
+    Returns:
+    tuple: (handshakes, servers, source, metrics)
+        - handshakes (pd.DataFrame): The labeled handshakes (see label_applications).
+        - servers (pd.Series): The application of every labeled server address.
+        - source (str): The source of the handshakes, 'pcap', 'csv' or 'info'.
+        - metrics (dict): tls_handshakes, tls_distinct_ja3, tls_distinct_ja4, tls_distinct_sni,
+                          tls_labeled_handshakes, tls_learned_fingerprints, tls_labeled_servers and
+                          tls_labeled_percent when there are handshakes.
+    """
+    index = fingerprint_index() if index is None else index
+    handshakes, source = tls_handshakes(data, dissected, pcap)
+    handshakes, servers, learned = label_applications(handshakes, index)
+    index.save()
+
+    metrics = {
+        'tls_handshakes': len(handshakes),
+        'tls_distinct_ja3': int(handshakes['JA3'].nunique()),
+        'tls_distinct_ja4': int(handshakes['JA4'].nunique()),
+        'tls_distinct_sni': int(handshakes['SNI'].nunique()),
+        'tls_labeled_handshakes': int(handshakes['Application'].notna().sum()),
+        'tls_learned_fingerprints': learned,
+        'tls_labeled_servers': len(servers),
+    }
+    if len(handshakes):
+        metrics['tls_labeled_percent'] = round(metrics['tls_labeled_handshakes'] / len(handshakes) * 100, 2)
+    return handshakes, servers, source, metrics
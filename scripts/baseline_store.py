@@ -0,0 +1,372 @@
+# This is the file with the baseline store: compact snapshots of every run in SQLite and the drift comparison
+
+# Importing the necessary libraries
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+
+from prettytable import PrettyTable
+
+# Make the 'scripts' package importable when the store is used from the scripts directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+
+# Default path of the baseline store, relative to the scripts directory
+DEFAULT_BASELINE_PATH = '../results/baseline.sqlite'
+
+# Number of previous runs the baseline is made of
+BASELINE_RUNS = 10
+
+# Only the first NEW_TALKER_RANKS entries of the current top-N lists are checked for new top talkers
+NEW_TALKER_RANKS = 3
+
+# Shift (in percentage points) of a protocol share or a TCP control message ratio, compared to the
+# baseline mean, above which a drift warning is raised
+PROTOCOL_SHIFT_POINTS = 10.0
+TCP_SHIFT_POINTS = 10.0
+
+# TCP control message ratios compared to the baseline
+TCP_RATIOS = ('tcp_rst_percent', 'tcp_syn_percent', 'tcp_syn_ack_percent')
+
+# Every table is keyed by run_id first, so the last N runs are read with index range scans only
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    capture TEXT,
+    fingerprint TEXT,
+    recorded_at TEXT NOT NULL,
+    total_packets INTEGER NOT NULL,
+    total_bytes INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS top_talkers (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    dimension TEXT NOT NULL,
+    ranking TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    packets INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    PRIMARY KEY (run_id, dimension, ranking, rank)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS protocols (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    protocol TEXT NOT NULL,
+    packets INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    packet_share REAL NOT NULL,
+    PRIMARY KEY (run_id, protocol)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS tcp_metrics (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (run_id, metric)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS arp (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    ip TEXT NOT NULL,
+    mac TEXT NOT NULL,
+    PRIMARY KEY (run_id, ip)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS arp_by_ip ON arp (ip, run_id);
+"""
+
+
+#########################################################################Baseline Store#########################################################################
+# Function to compute the fingerprint of the stored content of a snapshot
+def snapshot_fingerprint(snapshot):
+    """
+    Hashes the content of a snapshot that the baseline store keeps (top-N lists, protocols, TCP
+    control metrics and ARP mapping), so a capture analyzed again is recognized whatever its name.
+
+    Parameters:
+    snapshot (dict): The snapshot of the run (see BaselineStore).
+
+    Returns:
+    str: The SHA-256 hex digest.
+    """
+    content = {
+        'top': snapshot.get('top', {}),
+        'protocols': snapshot.get('protocols', []),
+        'tcp': snapshot.get('tcp', {}).get('metrics', {}),
+        'arp': snapshot.get('arp', {}),
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+
+class BaselineStore:
+    """
+    Stores a compact snapshot of every analyzed capture in a SQLite database and builds the
+    baseline of the last runs from it, so old captures never have to be reloaded.
+
+    A snapshot is a dictionary with the keys used by analyze_export.build_results (the output of
+    build_results, or analyze.snapshot after an analysis):
+    - capture (str): the name or path of the capture
+    - top (dict): per dimension (source, destination, ...) the by_packets and by_bytes lists of
+                  {<dimension>: value, packets, bytes}
+    - protocols (list): {protocol, packets, bytes} for every protocol
+    - tcp (dict): {'metrics': the TCP control metrics}
+    - arp (dict): the IP address to MAC address mapping
+
+    A snapshot whose content is already stored (e.g. the same capture analyzed again) is not saved
+    twice, see snapshot_fingerprint.
+
+    Parameters:
+    path (str): The path to the SQLite database, created if it does not exist. An empty path raises
+                a ValueError, SQLite would silently use a temporary database instead.
+    """
+
+    def __init__(self, path):
+        if not path:
+            raise ValueError('The path to the baseline store is empty')
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.executescript(SCHEMA)
+        # Stores created before the fingerprint column get it on first use
+        if 'fingerprint' not in [row[1] for row in self.connection.execute('PRAGMA table_info(runs)')]:
+            self.connection.execute('ALTER TABLE runs ADD COLUMN fingerprint TEXT')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS runs_by_fingerprint ON runs (fingerprint)')
+
+    def close(self):
+        self.connection.close()
+
+    def find(self, snapshot):
+        """
+        Returns the id of the run the snapshot is already stored as, None if it is not stored.
+        """
+        row = self.connection.execute('SELECT MIN(run_id) FROM runs WHERE fingerprint = ?', (snapshot_fingerprint(snapshot),)).fetchone()
+        return row[0]
+
+    def save(self, snapshot):
+        """
+        Saves the snapshot of a run, unless the same snapshot is already stored.
+
+        Parameters:
+        snapshot (dict): The snapshot of the run (see the class docstring).
+
+        Returns:
+        int: The id of the run (of the stored run for a snapshot that is already stored).
+        """
+        run_id = self.find(snapshot)
+        if run_id is not None:
+            return run_id
+        protocols = snapshot.get('protocols', [])
+        total_packets = sum(protocol['packets'] for protocol in protocols)
+        total_bytes = sum(protocol['bytes'] for protocol in protocols)
+        with self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO runs (capture, fingerprint, recorded_at, total_packets, total_bytes) VALUES (?, ?, ?, ?, ?)',
+                (snapshot.get('capture'), snapshot_fingerprint(snapshot), datetime.datetime.now(datetime.timezone.utc).isoformat(), total_packets, total_bytes))
+            run_id = cursor.lastrowid
+            self.connection.executemany(
+                'INSERT INTO top_talkers VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(run_id, dimension, ranking, rank, str(entry[dimension]), entry['packets'], entry['bytes'])
+                 for dimension, rankings in snapshot.get('top', {}).items()
+                 for ranking, entries in rankings.items()
+                 for rank, entry in enumerate(entries, start=1)])
+            self.connection.executemany(
+                'INSERT INTO protocols VALUES (?, ?, ?, ?, ?)',
+                [(run_id, str(protocol['protocol']), protocol['packets'], protocol['bytes'],
+                  round(protocol['packets'] / total_packets * 100, 2) if total_packets else 0.0)
+                 for protocol in protocols])
+            self.connection.executemany(
+                'INSERT INTO tcp_metrics VALUES (?, ?, ?)',
+                [(run_id, metric, value) for metric, value in snapshot.get('tcp', {}).get('metrics', {}).items()])
+            self.connection.executemany(
+                'INSERT INTO arp VALUES (?, ?, ?)',
+                [(run_id, ip, mac) for ip, mac in snapshot.get('arp', {}).items()])
+        return run_id
+
+    def baseline(self, runs=BASELINE_RUNS, before=None):
+        """
+        Builds the baseline of the last runs.
+
+        Parameters:
+        runs (int): The number of runs the baseline is made of.
+        before (int): Only use the runs saved before this run id. Defaults to the latest runs.
+
+        Returns:
+        dict: The baseline, with the keys:
+            - runs (list): the ids of the runs used (empty when there is no previous run)
+            - talkers (dict): per dimension, the set of the values in any top-N list of the runs
+            - protocol_shares (dict): the mean share of the packets (in percent) of every protocol,
+                                      a protocol missing from a run counts as 0%
+            - tcp (dict): the mean of every TCP control metric, missing values count as 0
+            - arp (dict): the IP address to MAC address mapping, the latest MAC address of every IP address
+        """
+        run_ids = [row[0] for row in self.connection.execute(
+            'SELECT run_id FROM runs WHERE run_id < ? ORDER BY run_id DESC LIMIT ?',
+            (before if before is not None else sys.maxsize, runs))]
+        baseline = {'runs': run_ids, 'talkers': {}, 'protocol_shares': {}, 'tcp': {}, 'arp': {}}
+        if not run_ids:
+            return baseline
+
+        low, high = min(run_ids), max(run_ids)
+        for dimension, value in self.connection.execute(
+                'SELECT DISTINCT dimension, value FROM top_talkers WHERE run_id BETWEEN ? AND ?', (low, high)):
+            baseline['talkers'].setdefault(dimension, set()).add(value)
+        baseline['protocol_shares'] = {protocol: share for protocol, share in self.connection.execute(
+            'SELECT protocol, SUM(packet_share) / ? FROM protocols WHERE run_id BETWEEN ? AND ? GROUP BY protocol',
+            (len(run_ids), low, high))}
+        baseline['tcp'] = {metric: value for metric, value in self.connection.execute(
+            'SELECT metric, SUM(value) / ? FROM tcp_metrics WHERE run_id BETWEEN ? AND ? GROUP BY metric',
+            (len(run_ids), low, high))}
+        # Rows are read in run order, so the latest MAC address of every IP address wins
+        baseline['arp'] = {ip: mac for ip, mac in self.connection.execute(
+            'SELECT ip, mac FROM arp WHERE run_id BETWEEN ? AND ? ORDER BY run_id', (low, high))}
+        return baseline
+
+#########################################################################Drift Detection#########################################################################
+# Function to create a drift warning
+def drift_warning(category, description, recommendation, severity, metric, value, threshold=None):
+    """
+    Creates a drift warning with the same keys as the warnings of analyze_rules.evaluate_warning_rules.
+    """
+    return {'category': category, 'description': description, 'recommendation': recommendation,
+            'severity': severity, 'metric': metric, 'value': value, 'threshold': threshold}
+
+
+# Function to compare a snapshot against a baseline
+def drift_warnings(snapshot, baseline, new_talker_ranks=NEW_TALKER_RANKS,
+                   protocol_shift=PROTOCOL_SHIFT_POINTS, tcp_shift=TCP_SHIFT_POINTS):
+    """
+    Compares the snapshot of a run against the baseline of the previous runs.
+
+    The following drifts are reported:
+    - New Top Talker: one of the first new_talker_ranks sources or destinations (by packets or by
+      bytes) is not in any top-N list of the baseline runs.
+    - Protocol Shift: the share of the packets of a protocol moved by more than protocol_shift
+      percentage points from its baseline mean (including new and vanished protocols).
+    - TCP Ratio Shift: a TCP control message ratio moved by more than tcp_shift percentage points
+      from its baseline mean.
+    - ARP Change: a known IP address is now mapped to another MAC address.
+
+    Parameters:
+    snapshot (dict): The snapshot of the run (see BaselineStore).
+    baseline (dict): The output of BaselineStore.baseline.
+    new_talker_ranks (int): The number of top entries checked for new top talkers.
+    protocol_shift (float): The protocol share shift threshold, in percentage points.
+    tcp_shift (float): The TCP control message ratio shift threshold, in percentage points.
+
+    Returns:
+    list: The drift warnings, empty when the baseline has no runs.
+    """
+    if not baseline['runs']:
+        return []
+    runs = len(baseline['runs'])
+    warnings = []
+
+    for dimension in ('source', 'destination'):
+        known = baseline['talkers'].get(dimension, set())
+        reported = set()
+        for ranking, entries in snapshot.get('top', {}).get(dimension, {}).items():
+            for rank, entry in enumerate(entries[:new_talker_ranks], start=1):
+                value = str(entry[dimension])
+                if value in known or value in reported:
+                    continue
+                reported.add(value)
+                measure = 'packets' if ranking == 'by_packets' else 'bytes'
+                warnings.append(drift_warning(
+                    'New Top Talker',
+                    f"{value} is the #{rank} {dimension} by {measure} ({entry[measure]} {measure}) and is not a top {dimension} in the last {runs} runs.",
+                    'Investigate - new device or change in traffic pattern', 'Moderate', f'top_{dimension}', value))
+
+    protocols = snapshot.get('protocols', [])
+    total_packets = sum(protocol['packets'] for protocol in protocols)
+    shares = {str(protocol['protocol']): protocol['packets'] / total_packets * 100 for protocol in protocols} if total_packets else {}
+    for protocol in sorted(set(shares) | set(baseline['protocol_shares'])):
+        share = shares.get(protocol, 0.0)
+        baseline_share = baseline['protocol_shares'].get(protocol, 0.0)
+        if abs(share - baseline_share) > protocol_shift:
+            warnings.append(drift_warning(
+                'Protocol Shift',
+                f"{protocol} share of the packets: {round(share, 2)}% (baseline mean of the last {runs} runs: {round(baseline_share, 2)}%).",
+                'Investigate - change in traffic mix', 'Moderate', f'{protocol}_packet_share', round(share, 2), protocol_shift))
+
+    metrics = snapshot.get('tcp', {}).get('metrics', {})
+    if metrics.get('tcp_control_msgs'):
+        for metric in TCP_RATIOS:
+            value = metrics.get(metric, 0.0)
+            baseline_value = baseline['tcp'].get(metric, 0.0)
+            if abs(value - baseline_value) > tcp_shift:
+                warnings.append(drift_warning(
+                    'TCP Ratio Shift',
+                    f"{metric}: {value}% (baseline mean of the last {runs} runs: {round(baseline_value, 2)}%).",
+                    'Investigate further', 'Moderate', metric, value, tcp_shift))
+
+    for ip, mac in snapshot.get('arp', {}).items():
+        known_mac = baseline['arp'].get(ip)
+        if known_mac is not None and known_mac.lower() != mac.lower():
+            warnings.append(drift_warning(
+                'ARP Change',
+                f"{ip} is now at {mac}, it was at {known_mac} in the baseline.",
+                'Investigate - potential ARP spoofing or replaced device', 'High', 'arp_mac', mac))
+
+    return warnings
+
+
+# Function to compare a snapshot against the baseline of the store and save it
+def record_run(snapshot, path, runs=BASELINE_RUNS, save=True):
+    """
+    Compares a snapshot against the last runs of a baseline store, then saves it.
+
+    A snapshot that is already stored is compared against the runs saved before it and is not saved
+    again, so analyzing the same capture twice gives the same drifts and adds no run.
+
+    Parameters:
+    snapshot (dict): The snapshot of the run (see BaselineStore).
+    path (str): The path to the SQLite database.
+    runs (int): The number of previous runs the baseline is made of.
+    save (bool): Set to False to only compare.
+
+    Returns:
+    tuple: (run_id or None, the number of baseline runs, the drift warnings, True if the run was
+           already stored)
+    """
+    store = BaselineStore(path)
+    try:
+        stored_run_id = store.find(snapshot)
+        baseline = store.baseline(runs, before=stored_run_id)
+        warnings = drift_warnings(snapshot, baseline)
+        run_id = store.save(snapshot) if save else stored_run_id
+    finally:
+        store.close()
+    return run_id, len(baseline['runs']), warnings, stored_run_id is not None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare captures against the baseline of the previous runs and save them to the baseline store.')
+    parser.add_argument('captures', nargs='+', help='The paths to the capture CSVs, saved in the given order')
+    parser.add_argument('--db', default=os.environ.get('BASELINE_DB') or DEFAULT_BASELINE_PATH,
+                        help='The path to the baseline store (default: %(default)s, the BASELINE_DB environment variable when not empty)')
+    parser.add_argument('--runs', type=int, default=BASELINE_RUNS, help='The number of previous runs the baseline is made of')
+    parser.add_argument('--compare-only', action='store_true', help='Do not save the captures to the store')
+    args = parser.parse_args()
+
+    # Imported here, analyze imports this module
+    from scripts.analyze_export import build_results
+    from scripts.capture_schema import load_capture
+
+    for capture in args.captures:
+        run_id, baseline_runs, warnings, stored = record_run(build_results(load_capture(capture), capture=capture),
+                                                     args.db, args.runs, save=not args.compare_only)
+        table_drift = PrettyTable()
+        table_drift.title = f'Drift of {capture} against the last {baseline_runs} runs'
+        table_drift.field_names = ['Category', 'Description', 'Recommendation']
+        table_drift.max_width = 60
+        table_drift.align = 'l'
+        for warning in warnings:
+            table_drift.add_row([warning['category'], warning['description'], warning['recommendation']])
+        print(table_drift)
+        if stored:
+            print(f'Already stored as run {run_id} in {args.db}, not saved again')
+        elif run_id is not None:
+            print(f'Saved as run {run_id} in {args.db}')
@@ -0,0 +1,114 @@
+# This is the file with the capture schema and the functions to load a Wireshark CSV export
+
+# Importing the necessary libraries
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+except ImportError:  # pyarrow is optional, the loader falls back to the pandas CSV parser
+    pa = None
+    pa_csv = None
+
+
+# Columns of the default Wireshark CSV export and the pandas dtypes they are loaded as.
+# Addresses and protocols repeat a lot, so they are stored as categoricals; Info is mostly unique
+# text and is kept as an Arrow-backed string to avoid one Python object per row.
+CAPTURE_SCHEMA = {
+    'No.': 'uint32',
+    'Time': 'float64',
+    'Source': 'category',
+    'Destination': 'category',
+    'Protocol': 'category',
+    'Length': 'uint32',
+    'Info': pd.StringDtype('pyarrow') if pa is not None else pd.StringDtype(),
+}
+
+
+#########################################################################Capture Loading#########################################################################
+# Function to build the pyarrow column types for the capture schema
+def arrow_column_types():
+    """
+    Maps the capture schema to the pyarrow types used by the pyarrow CSV reader.
+
+    Returns:
+    dict: The column name to pyarrow type mapping.
+    """
+    return {
+        'No.': pa.uint32(),
+        'Time': pa.float64(),
+        'Source': pa.dictionary(pa.int32(), pa.string()),
+        'Destination': pa.dictionary(pa.int32(), pa.string()),
+        'Protocol': pa.dictionary(pa.int32(), pa.string()),
+        'Length': pa.uint32(),
+        'Info': pa.string(),
+    }
+
+
+# Function to load a Wireshark CSV export with the capture schema
+def load_capture(path):
+    """
+    Loads a Wireshark CSV export into a DataFrame using the capture schema.
+
+    The file is read with the multithreaded pyarrow CSV engine when pyarrow is installed, otherwise
+    with the pandas parser. Malformed lines (e.g. a wrong number of fields) are skipped, and the
+    number of skipped lines is stored in data.attrs['skipped_lines'] so that data_preprocessing can
+    report it in the summary, and the path in data.attrs['capture'].
+
+    Parameters:
+    path (str): The path to the CSV file.
+
+    Returns:
+    pd.DataFrame: The capture with categorical Source/Destination/Protocol, string Info,
+                  uint32 No./Length and float64 Time columns. No. and Length are nullable
+                  (float64 with pyarrow, UInt32 otherwise) when they have blank cells.
+
+    Example:
+    >>> data = load_capture('../data/capture.csv')
+    >>> data.attrs['skipped_lines']
+    0
+    """
+    skipped_lines = 0
+
+    # Count every rejected line instead of silently dropping it
+    def skip_line(bad_line):
+        nonlocal skipped_lines
+        skipped_lines += 1
+        return 'skip' if pa_csv is not None else None
+
+    if pa_csv is not None:
+        table = pa_csv.read_csv(
+            path,
+            read_options=pa_csv.ReadOptions(use_threads=True),
+            parse_options=pa_csv.ParseOptions(invalid_row_handler=skip_line),
+            convert_options=pa_csv.ConvertOptions(column_types=arrow_column_types(), strings_can_be_null=True),
+        )
+        # Dictionary columns become categoricals, plain strings stay Arrow-backed
+        data = table.to_pandas(types_mapper={pa.string(): CAPTURE_SCHEMA['Info']}.get)
+    else:
+        # The numeric columns are read as text and converted afterwards, so a blank or unparsable cell (e.g. of a
+        # short line, which the pandas parser pads instead of rejecting) is a missing value dropped by the
+        # preprocessing instead of failing the load; the integers are narrowed to uint32 when complete
+        numeric = [column for column, dtype in CAPTURE_SCHEMA.items() if dtype in ('uint32', 'float64')]
+        dtypes = {column: 'string' if column in numeric else dtype for column, dtype in CAPTURE_SCHEMA.items()}
+        data = pd.read_csv(path, dtype=dtypes, on_bad_lines=skip_line, engine='python')
+        for column in numeric:
+            if column in data.columns:
+                values = pd.to_numeric(data[column], errors='coerce')
+                if CAPTURE_SCHEMA[column] == 'uint32':
+                    values = values.astype('UInt32' if values.hasnans else 'uint32')
+                data[column] = values.astype('float64') if CAPTURE_SCHEMA[column] == 'float64' else values
+
+    data.attrs['skipped_lines'] = skipped_lines
+    data.attrs['capture'] = path
+    return data
+
+
+# Function to get the capture schema columns of the data
+def schema_columns(data):
+    """
+    Returns the columns of the data that are in the capture schema. Extra columns of the export (e.g. the
+    TLS fields read by analyze_tls.py) are only filled on some rows, so missing values are only checked
+    on these columns.
+    """
+    return [column for column in CAPTURE_SCHEMA if column in data.columns]
@@ -0,0 +1,497 @@
+# This is the file with the DuckDB backend: the analysis aggregations run as SQL in an embedded engine, out of core
+
+# Importing the necessary libraries
+import argparse
+import csv
+import itertools
+import os
+import sys
+
+import pandas as pd
+
+# DuckDB is optional, the pandas backend is used without it
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# Make the 'scripts' package importable when the backend is used from the scripts directory
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from scripts.analyze_protocols import DISSECTORS, dissect_protocols, protocol_metrics
+from scripts.analyze_tcp import FLOW_COLUMNS, TCP_FIELDS, TCP_FIELDS_PATTERN, flow_performance, tcp_performance
+from scripts.capture_schema import CAPTURE_SCHEMA
+from scripts.info_flags import FLAGS_COLUMN, INFO_FLAGS, flag_patterns
+
+
+# DuckDB type of every capture schema column (see capture_schema.CAPTURE_SCHEMA)
+DUCKDB_TYPES = {'uint32': 'UINTEGER', 'float64': 'DOUBLE'}
+
+# Optional leading TCP message(s) in brackets, source port > destination port, then the control message in brackets,
+# the same fields analyze.parse_TCP_details splits out of the Info column
+TCP_INFO_PATTERN = r'^(?:\[([^\]]*)\]\s*)?(?:\[[^\]]*\]\s*)?([^\s\[\]>]+)\s*>\s*([^\s\[\]]+)[^\[\]]*(?:\[([^\]]*)\])?'
+
+# Names of the tables created in a connection
+table_ids = itertools.count(1)
+
+
+# Function to quote a column name for SQL
+def quote(column):
+    return '"' + column.replace('"', '""') + '"'
+
+
+# Function to quote a value for SQL
+def literal(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+# Function to build the SQL expression of the Info_Flags bitmask
+def info_flags_sql():
+    """
+    Returns the SQL expression of the Info_Flags bitmask (see info_flags.compute_info_flags): the
+    alternation of all the patterns selects the flagged rows, whose flags are then resolved one by one.
+    """
+    any_pattern, _ = flag_patterns()
+    bits = ' | '.join(f'CASE WHEN regexp_matches(Info, {literal(pattern)}) THEN {bit} ELSE 0 END' for bit, pattern in INFO_FLAGS.values())
+    return f'CAST(CASE WHEN regexp_matches(Info, {literal(any_pattern)}) THEN {bits} ELSE 0 END AS USMALLINT)'
+
+
+# Function to open a DuckDB connection configured for large captures
+def connect(database=':memory:', threads=None, memory_limit=None, temp_directory=None):
+    """
+    Opens a DuckDB connection.
+
+    DuckDB uses all the cores by default and spills the tables and the intermediate results of the
+    aggregations to temp_directory when they do not fit in memory_limit.
+
+    Parameters:
+    database (str): The path to a database file, or ':memory:'. A file keeps the loaded capture on disk.
+    threads (int): The number of threads. Defaults to the number of cores.
+    memory_limit (str): The memory limit, e.g. '4GB'. Defaults to 80% of the RAM.
+    temp_directory (str): The directory used to spill to disk. Defaults to '<database>.tmp'.
+
+    Returns:
+    duckdb.DuckDBPyConnection: The connection.
+    """
+    if duckdb is None:
+        raise ImportError("The DuckDB backend requires the 'duckdb' package (pip install duckdb)")
+    connection = duckdb.connect(database)
+    if threads:
+        connection.execute(f'SET threads = {int(threads)}')
+    if memory_limit:
+        connection.execute(f'SET memory_limit = {literal(memory_limit)}')
+    if temp_directory:
+        connection.execute(f'SET temp_directory = {literal(temp_directory)}')
+    return connection
+
+#########################################################################SQL Capture#########################################################################
+class SQLCapture:
+    """
+    A capture (or a subset of it) kept in DuckDB, used by the analysis stages in place of a DataFrame.
+
+    The stages reach it through the aggregation functions of analyze.py (traffic_volume, value_counts,
+    select_rows, has_value, materialize), which call the methods of the same name here. Every method
+    runs one SQL query and only the aggregated result (or a small subset) is returned as pandas.
+
+    Parameters:
+    connection (duckdb.DuckDBPyConnection): The connection holding the capture.
+    source (str): The query the rows are read from (e.g. 'SELECT * FROM capture_1').
+    attrs (dict): Metadata of the capture (skipped_lines, capture), as in DataFrame.attrs.
+    """
+
+    def __init__(self, connection, source, attrs=None):
+        self.connection = connection
+        self.source = source
+        self.attrs = dict(attrs or {})
+        self.columns = [column[0] for column in connection.execute(f'DESCRIBE {self.source}').fetchall()]
+
+    def sql(self, query):
+        """
+        Runs a query over the rows, referenced as 'capture' in the query.
+        """
+        return self.connection.execute(f'WITH capture AS ({self.source}) {query}')
+
+    def __len__(self):
+        return self.sql('SELECT count(*) FROM capture').fetchone()[0]
+
+    @property
+    def empty(self):
+        return self.sql('SELECT 1 FROM capture LIMIT 1').fetchone() is None
+
+    @property
+    def shape(self):
+        return (len(self), len(self.columns))
+
+    def head(self, n=5):
+        return self.sql(f'SELECT * FROM capture LIMIT {int(n)}').df()
+
+    def derive(self, query, materialize=False):
+        """
+        Returns a new SQLCapture over a query of these rows, stored in a table when materialize is True.
+        """
+        if not materialize:
+            return SQLCapture(self.connection, f'WITH capture AS ({self.source}) {query}', self.attrs)
+        table = f'capture_{next(table_ids)}'
+        self.connection.execute(f'CREATE TEMP TABLE {table} AS WITH capture AS ({self.source}) {query}')
+        return SQLCapture(self.connection, f'SELECT * FROM {table}', self.attrs)
+
+    def missing_value_rows(self):
+        """
+        Returns the number of rows with at least one missing value.
+        """
+        condition = ' OR '.join(f'{quote(column)} IS NULL' for column in self.columns)
+        return self.sql(f'SELECT count(*) FROM capture WHERE {condition}').fetchone()[0]
+
+    def dropna(self):
+        """
+        Returns the rows without missing values.
+        """
+        condition = ' AND '.join(f'{quote(column)} IS NOT NULL' for column in self.columns)
+        return self.derive(f'SELECT * FROM capture WHERE {condition}')
+
+    def add_info_flags(self):
+        """
+        Adds the Info_Flags column. It is computed when the rows are next stored in a table (by identify_address_types).
+        """
+        return self.derive(f'SELECT *, {info_flags_sql()} AS {FLAGS_COLUMN} FROM capture')
+
+    def flags_sql(self):
+        """
+        Returns the Info_Flags column, or its expression if the column was not added.
+        """
+        return FLAGS_COLUMN if FLAGS_COLUMN in self.columns else info_flags_sql()
+
+    def flag_counts(self):
+        """
+        Returns the number of rows of every registered Info flag, like info_flags.flag_counts.
+        """
+        flags = self.flags_sql()
+        counts = ', '.join(f'count(*) FILTER (WHERE ({flags} & {bit}) <> 0) AS {name}' for name, (bit, _) in INFO_FLAGS.items())
+        row = self.sql(f'SELECT {counts} FROM capture').fetchone()
+        return dict(zip(INFO_FLAGS, (int(value) for value in row)))
+
+    def identify_address_types(self):
+        """
+        Adds the Source_Type, Destination_Type and Conversation columns in one pass and stores the
+        result in a table, the later stages all read from it.
+
+        The distinct (address, is ARP) pairs are classified with analyze.identify_address_type, as with
+        the pandas backend, and joined back to the rows.
+        """
+        from scripts.analyze import identify_address_type
+
+        addresses = self.sql("""SELECT DISTINCT Address, Is_ARP FROM (
+                SELECT Source AS Address, Protocol = 'ARP' AS Is_ARP FROM capture
+                UNION ALL SELECT Destination, Protocol = 'ARP' FROM capture)""").df()
+        addresses['Address_Type'] = [identify_address_type(address, 'ARP' if is_arp else '')
+                                     for address, is_arp in zip(addresses['Address'], addresses['Is_ARP'])]
+        types = f'address_types_{next(table_ids)}'
+        self.connection.register(f'{types}_frame', addresses)
+        self.connection.execute(f'CREATE TEMP TABLE {types} AS SELECT * FROM {types}_frame')
+        self.connection.unregister(f'{types}_frame')
+        return self.derive(f"""
+            SELECT capture.*,
+                source_types.Address_Type AS Source_Type,
+                destination_types.Address_Type AS Destination_Type,
+                CASE WHEN Source <= Destination THEN Source || ' <-> ' || Destination
+                     ELSE Destination || ' <-> ' || Source END AS Conversation
+            FROM capture
+            JOIN {types} AS source_types ON source_types.Address = capture.Source AND source_types.Is_ARP = (capture.Protocol = 'ARP')
+            JOIN {types} AS destination_types ON destination_types.Address = capture.Destination AND destination_types.Is_ARP = (capture.Protocol = 'ARP')""",
+            materialize=True)
+
+    def value_counts(self, column):
+        """
+        Counts the rows per value of a column, like DataFrame[column].value_counts().
+
+        Returns:
+        pd.Series: The counts in descending order, indexed by the column values, named 'count'.
+        """
+        counts = self.sql(f'SELECT {quote(column)}, count(*) AS count FROM capture WHERE {quote(column)} IS NOT NULL '
+                          f'GROUP BY ALL ORDER BY count DESC').df()
+        return counts.set_index(column)['count']
+
+    def traffic_volume(self, columns):
+        """
+        Counts the packets, bytes and mean frame size per value of one or more columns, like analyze.traffic_volume.
+
+        Returns:
+        pd.DataFrame: A DataFrame indexed by the column value(s) with the columns 'Packets', 'Bytes' and 'Mean_Bytes'.
+        """
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        keys = ', '.join(quote(column) for column in columns)
+        not_null = ' AND '.join(f'{quote(column)} IS NOT NULL' for column in columns)
+        volume = self.sql(f'SELECT {keys}, count(*) AS Packets, CAST(coalesce(sum(Length), 0) AS BIGINT) AS Bytes '
+                          f'FROM capture WHERE {not_null} GROUP BY ALL').df()
+        volume = volume.set_index(columns if len(columns) > 1 else columns[0])
+        volume['Mean_Bytes'] = (volume['Bytes'] / volume['Packets']).round(2)
+        return volume
+
+    def select_rows(self, column, value):
+        """
+        Returns the rows where the column equals the value.
+        """
+        return self.derive(f'SELECT * FROM capture WHERE {quote(column)} = {literal(value)}')
+
+    def has_value(self, column, value):
+        """
+        Returns True if the column contains the value.
+        """
+        return self.sql(f'SELECT 1 FROM capture WHERE {quote(column)} = {literal(value)} LIMIT 1').fetchone() is not None
+
+    def materialize(self, columns=None):
+        """
+        Returns the rows (or some of their columns) as a DataFrame, only used for small subsets
+        (e.g. the TCP SYNs or ARP messages) or narrow projections.
+        """
+        select = '*' if columns is None else ', '.join(quote(column) for column in columns)
+        return self.sql(f'SELECT {select} FROM capture').df()
+
+    def tcp_details(self):
+        """
+        Extracts the TCP details of the TCP rows with one regular expression pass, like analyze.parse_TCP_details,
+        and stores them in a table.
+
+        Returns:
+        SQLCapture: The TCP rows with the No., Source, Source_Port, Source_Type, Destination, Destination_Port,
+                    Destination_Type, TCP_Msg, TCP_Control_Msg, Length, Time, Seq, Ack, Win, Len, Info_Flags,
+                    Source_IP:TCP_Port and Destination_IP:TCP_Port columns.
+        """
+        numeric_fields = ', '.join(f'TRY_CAST(nullif(numbers.{field}, {literal("")}) AS BIGINT) AS {field}' for field in TCP_FIELDS)
+        return self.derive(f"""
+            SELECT "No.", Source, Source_Port, Source_Type, Destination, Destination_Port, Destination_Type,
+                TCP_Msg, TCP_Control_Msg, Length, Time, {numeric_fields}, {self.flags_sql()} AS {FLAGS_COLUMN},
+                Source || ':' || Source_Port AS "Source_IP:TCP_Port",
+                Destination || ':' || Destination_Port AS "Destination_IP:TCP_Port"
+            FROM (
+                SELECT *,
+                    coalesce(nullif(fields.msg, ''), 'None') AS TCP_Msg,
+                    nullif(fields.src, '') AS Source_Port,
+                    nullif(fields.dst, '') AS Destination_Port,
+                    nullif(fields.ctrl, '') AS TCP_Control_Msg
+                FROM (SELECT *, regexp_extract(Info, {literal(TCP_INFO_PATTERN)}, ['msg', 'src', 'dst', 'ctrl']) AS fields,
+                          regexp_extract(Info, {literal(TCP_FIELDS_PATTERN)}, {TCP_FIELDS}) AS numbers
+                      FROM capture WHERE Protocol = 'TCP')
+            )""", materialize=True)
+
+    def tcp_performance(self):
+        """
+        Computes the TCP performance of the output of tcp_details, like analyze_tcp.tcp_performance: the
+        retransmissions, duplicate ACKs and zero window events of every packet are flagged with window
+        functions over the flows (in frame number order) and counted per flow in SQL, only the per-flow
+        counts and the handshake RTTs are returned to pandas.
+
+        Returns:
+        tuple: (flows, metrics), see analyze_tcp.flow_performance.
+        """
+        flow = 'PARTITION BY Source, Source_Port, Destination, Destination_Port ORDER BY "No."'
+        bits = {name: INFO_FLAGS[name][0] for name in ('RETRANSMISSION', 'DUP_ACK', 'ZERO_WINDOW', 'KEEP_ALIVE')}
+        # Same conditions as analyze_tcp.flag_tcp_events, a comparison with a missing field is false
+        flows = self.sql(f"""
+            SELECT Source, Source_Port, Destination, Destination_Port,
+                count(*) AS Packets,
+                count(*) FILTER (WHERE coalesce(Len, 0) > 0) AS Data_Segments,
+                count(*) FILTER (WHERE coalesce(Len > 0 AND ((Seq + Len <= Covered AND ({FLAGS_COLUMN} & {bits['KEEP_ALIVE']}) = 0)
+                                                             OR ({FLAGS_COLUMN} & {bits['RETRANSMISSION']}) <> 0), false)) AS Retransmissions,
+                count(*) FILTER (WHERE coalesce(Len = 0 AND TCP_Control_Msg = 'ACK' AND Ack = Previous_Ack AND Win = Previous_Win, false)
+                                 OR ({FLAGS_COLUMN} & {bits['DUP_ACK']}) <> 0) AS Dup_ACKs,
+                count(*) FILTER (WHERE coalesce(Win = 0 AND NOT contains(coalesce(TCP_Control_Msg, ''), 'RST'), false)
+                                 OR ({FLAGS_COLUMN} & {bits['ZERO_WINDOW']}) <> 0) AS Zero_Window_Events
+            FROM (
+                SELECT *,
+                    max(Seq + Len) OVER ({flow} ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING) AS Covered,
+                    lag(Ack) OVER ({flow}) AS Previous_Ack,
+                    lag(Win) OVER ({flow}) AS Previous_Win
+                FROM capture)
+            GROUP BY ALL
+            ORDER BY min("No.")""").df()
+
+        rtt = pd.Series(dtype='float64')
+        if 'Time' in self.columns:
+            join = ' AND '.join(f'syn.{column} = syn_ack.{reverse}' for column, reverse in zip(FLOW_COLUMNS, FLOW_COLUMNS[2:] + FLOW_COLUMNS[:2]))
+            times = self.sql(f"""
+                SELECT syn.Source, syn.Source_Port, syn.Destination, syn.Destination_Port, (syn_ack.Time - syn.Time) * 1000 AS Handshake_RTT_ms
+                FROM (SELECT Source, Source_Port, Destination, Destination_Port, min(Time) AS Time FROM capture
+                      WHERE TCP_Control_Msg = 'SYN' GROUP BY ALL) AS syn
+                JOIN (SELECT Source, Source_Port, Destination, Destination_Port, min(Time) AS Time FROM capture
+                      WHERE TCP_Control_Msg = 'SYN, ACK' GROUP BY ALL) AS syn_ack ON {join}""").df()
+            rtt = times.set_index(FLOW_COLUMNS)['Handshake_RTT_ms']
+            rtt = rtt[rtt >= 0].round(3)
+        return flow_performance(flows, rtt)
+
+    def cube_cells(self, bucket_seconds=60):
+        """
+        Aggregates the rows into the cells of the traffic cube in SQL, like traffic_cube.cube_cells.
+        """
+        from scripts.traffic_cube import CUBE_DIMENSIONS, PORT_PROTOCOLS, PORTS_PATTERN
+
+        protocols = ', '.join(literal(protocol) for protocol in PORT_PROTOCOLS)
+        fields = f"regexp_extract(Info, {literal(PORTS_PATTERN)}, ['Source_Port', 'Destination_Port', 'TCP_Flags'])"
+        time_bucket = f'floor(Time / {float(bucket_seconds)}) * {float(bucket_seconds)}' if 'Time' in self.columns else '0.0'
+        dimensions = ', '.join(quote(dimension) for dimension in CUBE_DIMENSIONS)
+        return self.sql(f"""
+            SELECT Source_Type, Destination_Type, Protocol,
+                   CASE WHEN Protocol = 'TCP' THEN nullif(ports.TCP_Flags, '') END AS TCP_Flags,
+                   {time_bucket} AS Time_Bucket,
+                   Source, TRY_CAST(nullif(ports.Source_Port, '') AS INTEGER) AS Source_Port,
+                   Destination, TRY_CAST(nullif(ports.Destination_Port, '') AS INTEGER) AS Destination_Port,
+                   count(*) AS Packets, sum(Length) AS Bytes
+            FROM (SELECT *, CASE WHEN Protocol IN ({protocols}) THEN {fields} END AS ports FROM capture)
+            GROUP BY {dimensions}
+        """).df()
+
+    def protocol_rows(self, protocols):
+        """
+        Returns the rows of some protocols (e.g. the ones analyze_protocols.dissect_protocols dissects) as a DataFrame.
+        """
+        values = ', '.join(literal(protocol) for protocol in protocols)
+        return self.sql(f'SELECT * FROM capture WHERE Protocol IN ({values})').df()
+
+    def arp_rows(self):
+        """
+        Returns the rows analyze.map_ARP_addresses reads (ARP messages and 'is at' replies) as a DataFrame.
+        """
+        flags = self.flags_sql()
+        return self.sql(f"SELECT * FROM capture WHERE (Protocol = 'ARP' AND ({flags} & {INFO_FLAGS['ARP'][0]}) <> 0) "
+                        f"OR ({flags} & {INFO_FLAGS['IS_AT'][0]}) <> 0").df()
+
+
+# Function to load a capture into DuckDB
+def load_capture_duckdb(path, connection=None, **options):
+    """
+    Loads a Wireshark CSV export, or a Parquet file with the same columns, into DuckDB.
+
+    CSV files are parsed once, in parallel, into a DuckDB table with the capture schema types. Malformed
+    lines are skipped and counted in attrs['skipped_lines'], as with capture_schema.load_capture.
+    Parquet files are queried in place.
+
+    Parameters:
+    path (str): The path to the CSV or Parquet file.
+    connection (duckdb.DuckDBPyConnection): The connection to use. Defaults to a new connection (see connect).
+    **options: The options of connect (database, threads, memory_limit, temp_directory).
+
+    Returns:
+    SQLCapture: The capture.
+    """
+    connection = connection or connect(**options)
+    table = f'capture_{next(table_ids)}'
+    if path.lower().endswith('.parquet'):
+        connection.execute(f'CREATE TEMP VIEW {table} AS SELECT * FROM read_parquet({literal(path)})')
+        return SQLCapture(connection, f'SELECT * FROM {table}', {'skipped_lines': 0, 'capture': path})
+
+    # Every column of the header is declared (extra columns, e.g. TLS fields, as text) so the rows that fill them are
+    # not rejected, only the capture schema columns are kept
+    with open(path, newline='', encoding='utf-8') as f:
+        header = next(csv.reader(f), [])
+    columns = '{' + ', '.join(f"{literal(column)}: {literal(DUCKDB_TYPES.get(str(CAPTURE_SCHEMA.get(column)), 'VARCHAR'))}"
+                              for column in header) + '}'
+    # Empty strings are missing values, as with the pyarrow reader; the schema columns missing from the export (e.g.
+    # an export without Time) are left out, as with capture_schema.load_capture
+    select = ', '.join(f'nullif({quote(column)}, {literal("")}) AS {quote(column)}' if DUCKDB_TYPES.get(str(dtype)) is None
+                       else quote(column) for column, dtype in CAPTURE_SCHEMA.items() if column in header)
+    connection.execute(f"""
+        CREATE TEMP TABLE {table} AS SELECT {select} FROM read_csv({literal(path)}, header = true, auto_detect = false,
+            delim = ',', quote = '"', escape = '"', columns = {columns},
+            store_rejects = true, rejects_table = '{table}_errors', rejects_scan = '{table}_scans')""")
+    skipped_lines = connection.execute(f'SELECT count(DISTINCT line) FROM {table}_errors').fetchone()[0]
+    return SQLCapture(connection, f'SELECT * FROM {table}', {'skipped_lines': skipped_lines, 'capture': path})
+
+#########################################################################Equivalence Check#########################################################################
+# Function to compare two count Series or traffic volumes
+def compare_counts(name, expected, actual):
+    """
+    Compares the pandas and DuckDB results of one aggregation, ignoring the order of the rows and the index types.
+
+    Returns:
+    list: The differences found (empty if the results are equal).
+    """
+    # Categorical columns report unused categories with a count of 0, and the index types differ between the backends
+    expected = expected[expected > 0] if isinstance(expected, pd.Series) else expected
+    expected = expected.set_axis(pd.Index([str(key) for key in expected.index], tupleize_cols=False)).sort_index()
+    actual = actual.set_axis(pd.Index([str(key) for key in actual.index], tupleize_cols=False)).sort_index()
+    if not expected.index.equals(actual.index):
+        missing = expected.index.difference(actual.index)
+        extra = actual.index.difference(expected.index)
+        return [f'{name}: {len(missing)} value(s) only in pandas (e.g. {list(missing[:3])}), '
+                f'{len(extra)} value(s) only in DuckDB (e.g. {list(extra[:3])})']
+    differences = (expected.astype('float64') != actual.astype('float64'))
+    if differences.values.any():
+        return [f'{name}: different counts for {int(differences.values.sum())} value(s)']
+    return []
+
+
+# Function to check the DuckDB backend returns the same results as the pandas backend
+def check_equivalence(path):
+    """
+    Runs the aggregations of the source, destination, conversation, protocol, dissector and TCP stages and
+    of the traffic cube with both backends on a capture and compares the results.
+
+    Parameters:
+    path (str): The path to the capture CSV.
+
+    Returns:
+    list: The differences found, empty if the backends agree.
+
+    Example:
+    >>> check_equivalence('../data/capture.csv')
+    []
+    """
+    from scripts import analyze
+    from scripts.capture_schema import load_capture, schema_columns
+
+    frame = load_capture(path)
+    # Only the capture schema columns are checked for missing values, as in analyze.data_preprocessing
+    frame = analyze.identify_address_types(frame.dropna(subset=schema_columns(frame)))
+    frame = frame.assign(Conversation=analyze.conversation_keys(frame))
+    capture = load_capture_duckdb(path)
+    table = capture.dropna().identify_address_types()
+
+    differences = []
+    if frame.attrs.get('skipped_lines') != table.attrs['skipped_lines']:
+        differences.append(f"skipped_lines: {frame.attrs.get('skipped_lines')} with pandas, {table.attrs['skipped_lines']} with DuckDB")
+    for column in ('Source', 'Destination', 'Protocol', 'Source_Type', 'Destination_Type'):
+        differences += compare_counts(f'value_counts({column})', frame[column].value_counts(), table.value_counts(column))
+    for columns in (['Source_Type', 'Source'], ['Destination_Type', 'Destination'], 'Conversation', 'Protocol'):
+        differences += compare_counts(f'traffic_volume({columns})', analyze.traffic_volume(frame, columns), table.traffic_volume(columns))
+
+    if analyze.count_flags(frame) != table.flag_counts():
+        differences.append(f'flag_counts: {analyze.count_flags(frame)} with pandas, {table.flag_counts()} with DuckDB')
+
+    tcp_frame = analyze.parse_TCP_details(frame[frame['Protocol'] == 'TCP'])
+    tcp_table = table.tcp_details()
+    for column in ('TCP_Msg', 'TCP_Control_Msg', 'Source_IP:TCP_Port', 'Destination_IP:TCP_Port'):
+        differences += compare_counts(f'TCP value_counts({column})', tcp_frame[column].value_counts(), tcp_table.value_counts(column))
+    if analyze.tcp_control_metrics(tcp_frame) != analyze.tcp_control_metrics(tcp_table):
+        differences.append('tcp_control_metrics: different metrics')
+    expected_flows, expected_metrics = tcp_performance(tcp_frame)
+    actual_flows, actual_metrics = tcp_table.tcp_performance()
+    differences += compare_counts('tcp_performance flows', expected_flows[['Packets', 'Data_Segments', 'Retransmissions', 'Dup_ACKs', 'Zero_Window_Events']],
+                                  actual_flows[['Packets', 'Data_Segments', 'Retransmissions', 'Dup_ACKs', 'Zero_Window_Events']])
+    for metric in sorted(set(expected_metrics) | set(actual_metrics)):
+        if expected_metrics.get(metric) != actual_metrics.get(metric):
+            differences.append(f'{metric}: {expected_metrics.get(metric)} with pandas, {actual_metrics.get(metric)} with DuckDB')
+
+    from scripts.traffic_cube import TrafficCube, cube_cells
+    expected_cube = TrafficCube(cube_cells(frame))
+    actual_cube = TrafficCube(table.cube_cells())
+    for dimensions in (['Source_Type', 'Destination_Type', 'Protocol', 'TCP_Flags', 'Time_Bucket'], 'Source_IP:Port', 'Destination_IP:Port'):
+        differences += compare_counts(f'traffic cube rollup({dimensions})', expected_cube.rollup(dimensions)[['Packets', 'Bytes']],
+                                      actual_cube.rollup(dimensions)[['Packets', 'Bytes']])
+
+    expected_metrics = protocol_metrics(dissect_protocols(frame))
+    actual_metrics = protocol_metrics(dissect_protocols(table.protocol_rows(list(DISSECTORS))))
+    for metric in sorted(set(expected_metrics) | set(actual_metrics)):
+        if expected_metrics.get(metric) != actual_metrics.get(metric):
+            differences.append(f'{metric}: {expected_metrics.get(metric)} with pandas, {actual_metrics.get(metric)} with DuckDB')
+    return differences
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check that the DuckDB backend returns the same aggregations as the pandas backend.')
+    parser.add_argument('capture', help='The path to the capture CSV')
+    args = parser.parse_args()
+    differences = check_equivalence(args.capture)
+    for difference in differences:
+        print(difference)
+    print('The backends are equivalent' if not differences else f'{len(differences)} difference(s) found')
+    sys.exit(1 if differences else 0)
@@ -0,0 +1,144 @@
+# This is the file with the keyword flags of the Info column, computed once in the preprocessing
+
+# Importing the necessary libraries
+import re
+import numpy as np
+import pandas as pd
+
+
+# The registered flags: name -> (bit, pattern). The patterns are regular expressions valid for both
+# Python and RE2 (used by the DuckDB backend), so no lookarounds or backreferences
+INFO_FLAGS = {}
+
+# The flag bitmask column
+FLAGS_COLUMN = 'Info_Flags'
+
+# The dtype of the bitmask column (up to 16 flags, see register_info_flag)
+FLAGS_DTYPE = np.uint16
+
+
+#########################################################################Flag Registry#########################################################################
+# Function to register a keyword flag
+def register_info_flag(name, pattern):
+    """
+    Registers a flag set on the rows whose Info column matches a pattern.
+
+    Parameters:
+    name (str): The name of the flag, a valid regular expression group name (e.g. 'DUP_ACK').
+    pattern (str): The regular expression, valid for Python and RE2 (e.g. re.escape('Dup ACK')).
+
+    Returns:
+    int: The bit of the flag in the Info_Flags column.
+    """
+    if name in INFO_FLAGS:
+        return INFO_FLAGS[name][0]
+    if len(INFO_FLAGS) == np.iinfo(FLAGS_DTYPE).bits:
+        raise ValueError(f"No bit left for the flag {name}, increase FLAGS_DTYPE")
+    bit = 1 << len(INFO_FLAGS)
+    INFO_FLAGS[name] = (bit, pattern)
+    return bit
+
+
+register_info_flag('ARP', 'ARP')
+register_info_flag('WHO_HAS', 'Who has')
+register_info_flag('IS_AT', 'is at')
+register_info_flag('MALFORMED', 'Malformed')
+register_info_flag('RETRANSMISSION', 'Retransmission')
+register_info_flag('DUP_ACK', 'Dup ACK')
+# 'TCP ZeroWindow' but not 'TCP ZeroWindowProbe'
+register_info_flag('ZERO_WINDOW', 'ZeroWindow(?:[^P]|$)')
+register_info_flag('KEEP_ALIVE', 'Keep-Alive')
+
+
+# Function to get the combined patterns of the registered flags
+def flag_patterns():
+    """
+    Returns the combined patterns of the registered flags.
+
+    Returns:
+    tuple: (any_pattern, named_pattern)
+        - any_pattern (str): The alternation of all the patterns, matching the rows with at least one flag.
+        - named_pattern (re.Pattern): The same alternation with one named group per flag, telling which flag matched.
+    """
+    any_pattern = '|'.join(f'(?:{pattern})' for _, pattern in INFO_FLAGS.values())
+    named_pattern = re.compile('|'.join(f'(?P<{name}>{pattern})' for name, (_, pattern) in INFO_FLAGS.items()))
+    return any_pattern, named_pattern
+
+
+#########################################################################Flagging#########################################################################
+# Function to compute the flag bitmask of the Info column
+def compute_info_flags(info):
+    """
+    Computes the bitmask of the registered flags of every row of the Info column.
+
+    The column is scanned once with the alternation of all the patterns. The flags of the matching rows
+    are then resolved with the named pattern, once per distinct Info value (the matching rows are
+    usually a small share of the capture).
+
+    Parameters:
+    info (pd.Series): The Info column.
+
+    Returns:
+    pd.Series: The bitmask (FLAGS_DTYPE), with the index of info.
+
+    Example:
+    >>> flags = compute_info_flags(pd.Series(['[TCP Dup ACK 12#1] 443 > 51000 [ACK] Seq=1', 'Who has 10.0.0.1? Tell 10.0.0.2']))
+    >>> has_flag(flags, 'DUP_ACK').tolist()
+    [True, False]
+    """
+    any_pattern, named_pattern = flag_patterns()
+    info = info.astype(str)
+    matched = info.str.contains(any_pattern, regex=True).to_numpy(dtype=bool)
+
+    flags = np.zeros(len(info), dtype=FLAGS_DTYPE)
+    codes, values = pd.factorize(info[matched])
+    # The sum of the distinct bits of the matches is their bitwise or
+    bitmasks = np.array([sum({INFO_FLAGS[match.lastgroup][0] for match in named_pattern.finditer(value)}) for value in values],
+                        dtype=FLAGS_DTYPE)
+    flags[matched] = bitmasks[codes] if len(values) else 0
+    return pd.Series(flags, index=info.index, name=FLAGS_COLUMN)
+
+
+# Function to add the flag bitmask column to the data
+def add_info_flags(data):
+    """
+    Adds the Info_Flags column (see compute_info_flags) to the data.
+    """
+    data.loc[:, FLAGS_COLUMN] = compute_info_flags(data['Info'])
+    return data
+
+
+# Function to get the flag bitmask of the data
+def info_flags(data):
+    """
+    Returns the Info_Flags column of the data, computed from the Info column if the data was not preprocessed.
+    """
+    if FLAGS_COLUMN in data.columns:
+        return data[FLAGS_COLUMN]
+    return compute_info_flags(data['Info'])
+
+
+# Function to test flags on a bitmask
+def has_flag(flags, *names):
+    """
+    Returns True for the rows with at least one of the named flags.
+
+    Parameters:
+    flags (pd.Series): The Info_Flags bitmask.
+    *names (str): The flag names (see INFO_FLAGS).
+
+    Returns:
+    pd.Series: The boolean mask.
+    """
+    mask = 0
+    for name in names:
+        mask |= INFO_FLAGS[name][0]
+    return (flags & mask) != 0
+
+
+# Function to count the rows of every flag
+def flag_counts(flags):
+    """
+    Returns the number of rows of every registered flag, by flag name.
+    """
+    return {name: int(((flags & bit) != 0).sum()) for name, (bit, _) in INFO_FLAGS.items()}
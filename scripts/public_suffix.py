@@ -0,0 +1,133 @@
+# This is the file with the domain reduction functions (public suffix list lookups)
+
+# Importing the necessary libraries
+import functools
+import os
+
+
+# Location of the bundled public suffix list, can be overridden with the PUBLIC_SUFFIX_LIST environment variable
+default_suffix_list_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'public_suffix_list.dat')
+
+# Markers stored in the trie nodes (they can never collide with a DNS label)
+RULE_END = '$'
+EXCEPTION_END = '!'
+
+
+#########################################################################Public Suffix Trie#########################################################################
+# Function to build a trie of reversed labels from a public suffix list file
+def load_public_suffix_trie(path=None):
+    """
+    Builds a trie from a public suffix list file.
+
+    Each rule is stored with its labels reversed, so 'co.uk' becomes trie['uk']['co'].
+    Nodes that terminate a rule are marked with RULE_END and exception rules ('!www.ck')
+    are marked with EXCEPTION_END.
+
+    Parameters:
+    path (str): The path to the public suffix list. Defaults to the PUBLIC_SUFFIX_LIST
+                environment variable or the bundled list.
+
+    Returns:
+    dict: The nested dictionary trie.
+    """
+    path = path or os.getenv('PUBLIC_SUFFIX_LIST') or default_suffix_list_path
+    trie = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            # Skip blank lines and comments, only the first token of a line is the rule
+            if not line or line.startswith('//'):
+                continue
+            rule = line.split()[0].lower()
+            exception = rule.startswith('!')
+            if exception:
+                rule = rule[1:]
+            node = trie
+            for label in reversed(rule.split('.')):
+                node = node.setdefault(label, {})
+            node[EXCEPTION_END if exception else RULE_END] = True
+    return trie
+
+
+# Load the trie once when the module is imported
+suffix_trie = load_public_suffix_trie()
+
+
+# Function to find how many labels of a domain belong to its public suffix
+def public_suffix_length(labels, trie=None):
+    """
+    Returns the number of trailing labels that form the public suffix of a domain.
+
+    Follows the public suffix list algorithm: the longest matching rule wins, wildcards
+    match any single label, exception rules remove one label from the match and the
+    implicit default rule '*' makes an unknown TLD its own suffix.
+
+    Parameters:
+    labels (list): The domain labels, e.g. ['ns1', 'example', 'co', 'uk'].
+    trie (dict): The public suffix trie. Defaults to the module trie.
+
+    Returns:
+    int: The number of labels in the public suffix.
+
+    Example:
+    >>> public_suffix_length(['ns1', 'example', 'co', 'uk'])
+    2
+    """
+    node = suffix_trie if trie is None else trie
+    length = 1
+    for depth, label in enumerate(reversed(labels), start=1):
+        child = node.get(label)
+        if child is not None and EXCEPTION_END in child:
+            return depth - 1
+        if child is None:
+            child = node.get('*')
+        if child is None:
+            break
+        if RULE_END in child:
+            length = depth
+        node = child
+    return length
+
+
+# Function to reduce a host name to its registrable domain (public suffix plus one label)
+@functools.lru_cache(maxsize=None)
+def registrable_domain(name):
+    """
+    Reduces a host name to its registrable domain.
+
+    The result is memoized so repeated names (common in NS and rDNS answers) are only
+    resolved once.
+
+    Parameters:
+    name (str): The host name, e.g. 'ns-1.awsdns-01.co.uk.'.
+
+    Returns:
+    str: The registrable domain, e.g. 'awsdns-01.co.uk'. Names that are themselves a
+         public suffix, or have a single label, are returned normalized but unchanged.
+
+    Example:
+    >>> registrable_domain('a.ns.example.co.uk')
+    'example.co.uk'
+    >>> registrable_domain('localhost')
+    'localhost'
+    """
+    normalized = name.strip().rstrip('.').lower()
+    labels = normalized.split('.')
+    suffix_length = public_suffix_length(labels)
+    if len(labels) <= suffix_length:
+        return normalized
+    return '.'.join(labels[-(suffix_length + 1):])
+
+
+# Function to reduce a list of host names to their registrable domains
+def reduce_to_registrable_domains(names):
+    """
+    Maps every host name in an iterable to its registrable domain.
+
+    Parameters:
+    names (iterable): The host names to reduce. Empty or missing names are skipped.
+
+    Returns:
+    list: The registrable domains, in the same order as the input names.
+    """
+    return [registrable_domain(name) for name in names if name]
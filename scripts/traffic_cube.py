@@ -0,0 +1,186 @@
+# This is the file with the pre-aggregated traffic cube used for the interactive drill-down in the notebook
+
+# Importing the necessary libraries
+import pandas as pd
+from scripts.analyze import identify_address_types
+from scripts.capture_schema import schema_columns
+
+
+# The dimensions of the cube, in grouping order
+CUBE_DIMENSIONS = ['Source_Type', 'Destination_Type', 'Protocol', 'TCP_Flags', 'Time_Bucket',
+                   'Source', 'Source_Port', 'Destination', 'Destination_Port']
+
+# The measures of the cube and their pandas dtypes
+CUBE_MEASURES = {'Packets': 'int64', 'Bytes': 'int64'}
+
+# The pandas dtypes of the dimensions
+CUBE_TYPES = {'Source_Type': 'category', 'Destination_Type': 'category', 'Protocol': 'category', 'TCP_Flags': 'category',
+              'Time_Bucket': 'float64', 'Source': 'category', 'Source_Port': 'Int32', 'Destination': 'category',
+              'Destination_Port': 'Int32'}
+
+# The endpoint dimensions, built from an address and a port dimension ('192.168.1.2:443')
+CUBE_ENDPOINTS = {'Source_IP:Port': ('Source', 'Source_Port'), 'Destination_IP:Port': ('Destination', 'Destination_Port')}
+
+# The protocols with ports in the Info column
+PORT_PROTOCOLS = ['TCP', 'UDP']
+
+# Optional leading TCP message(s) in brackets, source port > destination port, then the TCP control message in brackets
+PORTS_PATTERN = r'^(?:\[[^\]]*\]\s*)*(?P<Source_Port>\d+)\s*(?:>|→)\s*(?P<Destination_Port>\d+)(?:[^\[]*\[(?P<TCP_Flags>[^\]]*)\])?'
+
+
+#########################################################################Cube Build#########################################################################
+# Function to aggregate the packets of a capture into the cells of the cube
+def cube_cells(data, bucket_seconds=60):
+    """
+    Aggregates the packets into one row per combination of the CUBE_DIMENSIONS, with the packet and byte counts.
+
+    The ports and TCP control messages (flags) of the TCP and UDP rows are extracted from the Info
+    column with one vectorized regular expression pass.
+
+    Parameters:
+    data (pd.DataFrame): The capture without missing values, with the Source_Type and Destination_Type columns.
+    bucket_seconds (float): The width of the time buckets in seconds.
+
+    Returns:
+    pd.DataFrame: The CUBE_DIMENSIONS and CUBE_MEASURES columns.
+    """
+    port_rows = data['Protocol'].isin(PORT_PROTOCOLS)
+    fields = data.loc[port_rows, 'Info'].astype(str).str.extract(PORTS_PATTERN).reindex(data.index)
+    flags = fields['TCP_Flags'].where(data['Protocol'] == 'TCP')
+    time_bucket = (data['Time'] // bucket_seconds) * bucket_seconds if 'Time' in data.columns else 0.0
+
+    rows = pd.DataFrame({
+        'Source_Type': data['Source_Type'],
+        'Destination_Type': data['Destination_Type'],
+        'Protocol': data['Protocol'],
+        'TCP_Flags': flags,
+        'Time_Bucket': time_bucket,
+        'Source': data['Source'],
+        'Source_Port': pd.to_numeric(fields['Source_Port']),
+        'Destination': data['Destination'],
+        'Destination_Port': pd.to_numeric(fields['Destination_Port']),
+        'Length': data['Length'],
+    }).astype(CUBE_TYPES)
+    cells = rows.groupby(CUBE_DIMENSIONS, observed=True, sort=False, dropna=False)['Length'].agg(['size', 'sum']).reset_index()
+    cells.columns = CUBE_DIMENSIONS + list(CUBE_MEASURES)
+    return cells.astype(CUBE_MEASURES)
+
+
+# Function to build the traffic cube of a capture
+def build_cube(data, bucket_seconds=60):
+    """
+    Builds the traffic cube of a capture: the packet and byte counts per source address type, destination
+    address type, protocol, TCP control message, time bucket and source/destination address and port.
+
+    The raw packets are read once, all the views of the cube (TrafficCube.slice, rollup, top, timeline)
+    are then answered from the aggregated cells.
+
+    Parameters:
+    data (pd.DataFrame or SQLCapture): The capture (see capture_schema.load_capture or duckdb_backend.load_capture_duckdb).
+    bucket_seconds (float): The width of the time buckets in seconds.
+
+    Returns:
+    TrafficCube: The cube.
+    """
+    if isinstance(data, pd.DataFrame):
+        data = data.dropna(subset=schema_columns(data))
+        if 'Source_Type' not in data.columns:
+            data = identify_address_types(data.copy())
+        cells = cube_cells(data, bucket_seconds)
+    else:
+        # The DuckDB backend aggregates the cells in SQL
+        cells = data.dropna().identify_address_types().cube_cells(bucket_seconds).astype({**CUBE_TYPES, **CUBE_MEASURES})
+    return TrafficCube(cells, bucket_seconds)
+
+
+#########################################################################Cube Queries#########################################################################
+class TrafficCube:
+    """
+    A pre-aggregated traffic cube answering slice and top-N questions without the raw packets.
+
+    Parameters:
+    cells (pd.DataFrame): The output of cube_cells.
+    bucket_seconds (float): The width of the time buckets in seconds.
+
+    Example:
+    >>> cube = build_cube(data)
+    >>> cube.slice(Source_Type='Private', Protocol=['TCP', 'UDP']).top('Destination_IP:Port', by='Bytes')
+    """
+
+    def __init__(self, cells, bucket_seconds=60):
+        self.cells = cells
+        self.bucket_seconds = bucket_seconds
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __repr__(self):
+        return f'TrafficCube({len(self.cells)} cells, {self.packets()} packets, {self.bucket_seconds}s buckets)'
+
+    def packets(self):
+        return int(self.cells['Packets'].sum())
+
+    def bytes(self):
+        return int(self.cells['Bytes'].sum())
+
+    def slice(self, **filters):
+        """
+        Returns the cube restricted to some dimension values.
+
+        Parameters:
+        **filters: One filter per dimension: a value, a list of values, or a function of the column
+                   returning a boolean Series (e.g. Time_Bucket=lambda t: t >= 300).
+
+        Returns:
+        TrafficCube: The sliced cube.
+        """
+        mask = pd.Series(True, index=self.cells.index)
+        for dimension, value in filters.items():
+            if dimension not in CUBE_DIMENSIONS:
+                raise KeyError(f"Unknown cube dimension: {dimension} (expected one of {CUBE_DIMENSIONS})")
+            column = self.cells[dimension]
+            if callable(value):
+                mask &= value(column).fillna(False).astype(bool)
+            elif isinstance(value, (list, tuple, set)):
+                mask &= column.isin(value)
+            else:
+                mask &= (column == value).fillna(False).astype(bool)
+        return TrafficCube(self.cells[mask], self.bucket_seconds)
+
+    def rollup(self, dimensions):
+        """
+        Sums the cells over every other dimension.
+
+        Parameters:
+        dimensions (str or list): The dimension(s) to keep, including the Source_IP:Port and
+                                  Destination_IP:Port endpoint dimensions.
+
+        Returns:
+        pd.DataFrame: The Packets, Bytes and Mean_Bytes columns (as analyze.traffic_volume), indexed by
+                      the dimension values and sorted by packets.
+        """
+        dimensions = [dimensions] if isinstance(dimensions, str) else list(dimensions)
+        if len(dimensions) == 1 and dimensions[0] in CUBE_ENDPOINTS:
+            address, port = CUBE_ENDPOINTS[dimensions[0]]
+            cells = self.cells[self.cells[port].notna()]
+            volume = cells.groupby([address, port], observed=True, sort=False)[list(CUBE_MEASURES)].sum()
+            volume.index = pd.Index([f'{ip}:{number}' for ip, number in volume.index], name=dimensions[0])
+        else:
+            volume = self.cells.groupby(dimensions, observed=True, sort=False)[list(CUBE_MEASURES)].sum()
+        volume['Mean_Bytes'] = (volume['Bytes'] / volume['Packets']).round(2)
+        return volume.sort_values('Packets', ascending=False, kind='stable')
+
+    def top(self, dimensions, n=10, by='Packets'):
+        """
+        Returns the n dimension values with the most packets (by='Packets') or bytes (by='Bytes').
+        """
+        return self.rollup(dimensions).sort_values(by, ascending=False, kind='stable').head(n)
+
+    def timeline(self, dimension=None, measure='Packets'):
+        """
+        Returns the packets (or bytes) per time bucket, with one column per value of a dimension if given.
+        """
+        if dimension is None:
+            return self.cells.groupby('Time_Bucket')[measure].sum()
+        return self.cells.pivot_table(index='Time_Bucket', columns=dimension, values=measure, aggfunc='sum',
+                                      fill_value=0, observed=True)
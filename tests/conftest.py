@@ -0,0 +1,21 @@
+# Shared test setup: makes the 'scripts' package importable and isolates the files the analysis writes
+
+import os
+import sys
+import tempfile
+
+# The analysis writes its plots to ../results/plots relative to the working directory, so the tests run
+# from a scripts directory inside a temporary folder
+working_directory = os.path.join(tempfile.mkdtemp(prefix='wireshark_analysis_tests_'), 'scripts')
+os.makedirs(working_directory)
+os.chdir(working_directory)
+
+# No baseline store, no learned fingerprints and no plot windows during the tests
+os.environ['BASELINE_DB'] = ''
+os.environ['TLS_FINGERPRINTS'] = ''
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# The small checked-in capture used by the end to end tests
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
@@ -0,0 +1,143 @@
+import concurrent.futures
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from conftest import FIXTURES
+from scripts.analysis_service import AnalysisRequestHandler, AnalysisService, parse_query, resolve_capture_path
+
+CAPTURE = os.path.join(FIXTURES, 'capture.csv')
+
+
+def test_parse_query_url_decodes_names_and_values():
+    assert parse_query('path=%2Fdata%2Fmy%20capture%26co.csv&top_n=5&wait=false') == {
+        'path': '/data/my capture&co.csv', 'top_n': '5', 'wait': 'false'}
+    assert parse_query('') == {}
+
+
+def test_capture_paths_are_resolved_in_the_captures_directory(tmp_path):
+    captures = tmp_path / 'data'
+    captures.mkdir()
+    (captures / 'capture.csv').write_text('')
+    expected = os.path.realpath(captures / 'capture.csv')
+    assert resolve_capture_path('capture.csv', str(captures)) == expected
+    assert resolve_capture_path(str(captures / 'capture.csv'), str(captures)) == expected
+
+
+@pytest.mark.parametrize('path', ['../secret.csv', '/etc/passwd', 'sub/../../secret.csv'])
+def test_capture_paths_outside_the_captures_directory_are_rejected(tmp_path, path):
+    captures = tmp_path / 'data'
+    captures.mkdir()
+    with pytest.raises(ValueError, match='captures directory'):
+        resolve_capture_path(path, str(captures))
+
+
+def test_symbolic_links_out_of_the_captures_directory_are_rejected(tmp_path):
+    captures = tmp_path / 'data'
+    captures.mkdir()
+    (tmp_path / 'secret.csv').write_text('')
+    os.symlink(tmp_path / 'secret.csv', captures / 'link.csv')
+    with pytest.raises(ValueError):
+        resolve_capture_path('link.csv', str(captures))
+
+
+@pytest.fixture(scope='module')
+def service():
+    service = AnalysisService(workers=1, max_queued=1)
+    yield service
+    service.shutdown()
+
+
+def wait_for_slot(service):
+    # The slot of a finished job is released by a done callback, just after the result is set
+    assert service.slots.acquire(timeout=30)
+    service.slots.release()
+
+
+def test_submit_and_status(service):
+    wait_for_slot(service)
+    job_id = service.submit(CAPTURE)
+    # One job at most: the queue is full until it is done
+    assert service.submit(CAPTURE) is None
+    status = service.status(job_id, timeout=120)
+    assert status['status'] == 'done'
+    assert status['result']['capture'] == os.path.realpath(CAPTURE)
+    assert service.status('unknown') is None
+
+
+def test_status_of_queued_running_and_failed_jobs(service):
+    future = concurrent.futures.Future()
+    service.jobs['test-job'] = future
+    assert service.status('test-job', timeout=0)['status'] == 'queued'
+    future.set_running_or_notify_cancel()
+    assert service.status('test-job', timeout=0)['status'] == 'running'
+    future.set_exception(ValueError('bad capture'))
+    assert service.status('test-job')['status'] == 'failed'
+    del service.jobs['test-job']
+
+
+@pytest.fixture
+def server(service, monkeypatch):
+    monkeypatch.setattr(AnalysisRequestHandler, 'service', service)
+    monkeypatch.setattr(AnalysisRequestHandler, 'captures_dir', FIXTURES)
+    monkeypatch.setattr(AnalysisRequestHandler, 'max_upload_bytes', 1024 ** 2)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), AnalysisRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def request(url, body=None, content_type='application/json'):
+    """
+    Sends a request and returns the HTTP status and the decoded JSON answer.
+    """
+    data = body if isinstance(body, bytes) or body is None else json.dumps(body).encode()
+    headers = {'Content-Type': content_type} if data is not None else {}
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers), timeout=120) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as error:
+        return error.code, json.load(error)
+
+
+def test_http_round_trip(service, server):
+    assert request(f'{server}/health') == (200, {'status': 'ok'})
+    wait_for_slot(service)
+    status, answer = request(f'{server}/analyze', {'path': 'capture.csv', 'wait': False})
+    assert status == 202 and answer['status'] == 'queued'
+    # The queue holds one job
+    assert request(f'{server}/analyze', {'path': 'capture.csv'})[0] == 503
+    assert service.status(answer['job_id'], timeout=120)['status'] == 'done'
+    status, job = request(f'{server}/jobs/{answer["job_id"]}')
+    assert status == 200 and job['status'] == 'done'
+    assert job['result']['capture'] == os.path.realpath(CAPTURE)
+    assert request(f'{server}/jobs/unknown')[0] == 404
+
+    wait_for_slot(service)
+    with open(CAPTURE, 'rb') as f:
+        status, job = request(f'{server}/analyze?top_n=3', f.read(), content_type='text/csv')
+    assert status == 200 and job['status'] == 'done'
+    assert len(job['result']['top']['source']['by_packets']) == 3
+
+
+@pytest.mark.parametrize('body', [[], 5, 'capture.csv', {'path': 5}, {'path': ['capture.csv']}, {}, {'path': 'capture.csv', 'top_n': 'x'}])
+def test_invalid_requests_get_a_400(server, body):
+    status, answer = request(f'{server}/analyze', body)
+    assert status == 400 and answer['error'].startswith('invalid request')
+
+
+def test_paths_outside_the_captures_directory_get_a_400(server):
+    assert request(f'{server}/analyze', {'path': '../../etc/passwd'})[0] == 400
+
+
+def test_large_uploads_get_a_413(server, monkeypatch):
+    monkeypatch.setattr(AnalysisRequestHandler, 'max_upload_bytes', 100)
+    status, answer = request(f'{server}/analyze', b'x' * 1000, content_type='text/csv')
+    assert status == 413
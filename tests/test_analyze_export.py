@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+
+import numpy as np
+
+from scripts import analyze
+from scripts.analyze_export import build_results, iter_ndjson_records, to_builtin, write_ndjson
+from scripts.capture_schema import load_capture
+
+
+def write_capture(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(['No.', 'Time', 'Source', 'Destination', 'Protocol', 'Length', 'Info'])
+        for number, (source, destination, protocol, info) in enumerate(rows, start=1):
+            writer.writerow([number, number / 1000, source, destination, protocol, 60, info])
+    return str(path)
+
+
+def scan_capture(path):
+    rows = [('10.0.0.66', '10.0.0.1', 'TCP', f'40000 > {port} [SYN] Seq=0 Win=1024 Len=0') for port in range(1, 121)]
+    # ACKs to many ports do not open connections, the scan detector only counts the SYNs
+    rows += [('10.0.0.2', '10.0.0.1', 'TCP', f'40000 > {port} [ACK] Seq=1 Ack=1 Win=1024 Len=0') for port in range(1, 121)]
+    rows += [('10.0.0.1', '10.0.0.2', 'ARP', 'Who has 10.0.0.2? Tell 10.0.0.1')]
+    return write_capture(path, rows)
+
+
+def test_to_builtin_converts_numpy_scalars():
+    assert to_builtin(np.int64(3)) == 3 and type(to_builtin(np.int64(3))) is int
+    assert to_builtin(np.float64(0.5)) == 0.5
+    assert to_builtin(None) is None
+    assert to_builtin(object).startswith("<class")
+
+
+def test_results_are_read_from_the_analysis_model(tmp_path):
+    results = build_results(load_capture(scan_capture(tmp_path / 'scan.csv')), capture='scan.csv')
+    assert results['summary']['rows'] == results['summary']['total_packets'] == 241
+    assert results['summary']['untracked_packets'] == 0
+    assert results['scans'] == [{'source': '10.0.0.66', 'kind': 'vertical', 'distinct': 120, 'exact': True}]
+    assert results['tcp']['control_messages'] == {'SYN': 120, 'ACK': 120}
+    assert results['top']['source_endpoint']['by_packets'][0]['packets'] == 120
+    assert results['baseline'] is None
+    # Only the result model is filled, the tables of the text report are not built
+    assert analyze.table_summary.rows == analyze.table_warnings.rows == []
+    assert analyze.tables_enabled and analyze.plots_enabled
+    assert 'Port Scan' in {warning['category'] for warning in results['warnings']}
+    json.dumps(results)
+
+
+def test_no_table_is_built(tmp_path, monkeypatch):
+    def no_table():
+        raise AssertionError('a PrettyTable was built')
+    monkeypatch.setattr(analyze, 'PrettyTable', no_table)
+    path = write_capture(tmp_path / 'arp.csv', [('10.0.0.1', '10.0.0.2', 'ARP', 'Who has 10.0.0.2? Tell 10.0.0.1'),
+                                                ('10.0.0.2', '10.0.0.1', 'ARP', '10.0.0.2 is at 00:11:22:33:44:55')])
+    assert build_results(load_capture(path), capture=path)['arp']
+
+
+def test_results_do_not_depend_on_the_previous_capture(tmp_path):
+    path = scan_capture(tmp_path / 'scan.csv')
+    first = build_results(load_capture(path), capture=path, top_n=3)
+    second = build_results(load_capture(path), capture=path, top_n=3)
+    first.pop('generated_at'), second.pop('generated_at')
+    assert first == second
+    assert len(first['top']['destination_endpoint']['by_packets']) == 3
+    assert analyze.snapshot_top_n == 10
+
+
+def test_baseline_section_and_ndjson_record(tmp_path):
+    path = scan_capture(tmp_path / 'scan.csv')
+    store = str(tmp_path / 'baseline.sqlite')
+    first = build_results(load_capture(path), capture=path, baseline=store)
+    second = build_results(load_capture(path), capture=path, baseline=store)
+    assert first['baseline'] == {'path': store, 'run_id': 1, 'baseline_runs': 0, 'drifts': 0, 'stored': False}
+    # The same capture again is not saved twice
+    assert second['baseline'] == {'path': store, 'run_id': 1, 'baseline_runs': 0, 'drifts': 0, 'stored': True}
+
+    output = io.StringIO()
+    write_ndjson(second, output)
+    records = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert [record['record'] for record in records].count('baseline') == 1
+    assert len(records) == len(list(iter_ndjson_records(second)))
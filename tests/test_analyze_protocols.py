@@ -0,0 +1,91 @@
+import pandas as pd
+import pytest
+
+from scripts import analyze_protocols
+from scripts.analyze_protocols import dissect_protocols, protocol_metrics, register_dissector
+
+ROWS = [
+    ('UDP', '10.0.0.1', '10.0.0.2', '51000 > 5353 Len=32'),
+    ('DNS', '10.0.0.1', '10.0.0.53', 'Standard query 0x1a2b A www.example.com'),
+    ('DNS', '10.0.0.53', '10.0.0.1', 'Standard query response 0x1a2b A www.example.com A 93.184.216.34'),
+    ('DNS', '10.0.0.53', '10.0.0.1', 'Standard query response 0x2b3c No such name AAAA foo.example.com SOA ns.example.com'),
+    ('TLSv1.3', '10.0.0.1', '93.184.216.34', 'Client Hello (SNI=www.example.com)'),
+    ('TLSv1', '93.184.216.34', '10.0.0.1', 'Server Hello, Certificate, Server Hello Done'),
+    ('HTTP', '10.0.0.1', '93.184.216.34', 'GET /index.html HTTP/1.1'),
+    ('HTTP', '93.184.216.34', '10.0.0.1', 'HTTP/1.1 404 Not Found  (text/html)'),
+    ('HTTP', '10.0.0.1', '10.0.0.8', 'CONNECT www.example.org:443 HTTP/1.1'),
+    ('QUIC', '10.0.0.1', '142.250.1.1', 'Initial, DCID=8a3f21c0, SCID=01ab, PKN: 1, CRYPTO, PADDING'),
+    ('ARP', '10.0.0.1', 'Broadcast', 'Who has 10.0.0.2? Tell 10.0.0.1'),
+]
+
+
+def capture(rows=ROWS):
+    return pd.DataFrame([{'Time': float(number), 'Source': source, 'Destination': destination, 'Protocol': protocol,
+                          'Length': 100, 'Info': info} for number, (protocol, source, destination, info) in enumerate(rows)])
+
+
+@pytest.fixture(scope='module')
+def dissected():
+    return dissect_protocols(capture())
+
+
+def test_rows_of_other_protocols_are_left_out(dissected):
+    assert dissected.index.tolist() == list(range(len(ROWS) - 1))
+    assert dissected['Protocol'].tolist()[:2] == ['UDP', 'DNS']
+
+
+def test_fields_have_their_registered_dtypes(dissected):
+    assert str(dissected['Source_Port'].dtype) == 'Int32'
+    assert str(dissected['HTTP_Status'].dtype) == 'Int16'
+    assert str(dissected['DNS_Qtype'].dtype) == 'category'
+    assert str(dissected['DNS_Response'].dtype) == 'boolean'
+
+
+def test_udp_and_dns_fields(dissected):
+    assert dissected.loc[0, ['Source_Port', 'Destination_Port', 'UDP_Length']].tolist() == [51000, 5353, 32]
+    assert dissected.loc[1, 'DNS_Qname'] == 'www.example.com' and not dissected.loc[1, 'DNS_Response']
+    assert pd.isna(dissected.loc[1, 'DNS_Rcode'])
+    assert dissected.loc[2, 'DNS_Rcode'] == 'NoError'
+    assert dissected.loc[3, ['DNS_Qtype', 'DNS_Rcode']].tolist() == ['AAAA', 'NXDomain']
+
+
+def test_tls_http_and_quic_fields(dissected):
+    assert dissected.loc[4, ['TLS_Version', 'TLS_Message', 'TLS_SNI']].tolist() == ['TLSv1.3', 'Client Hello', 'www.example.com']
+    assert dissected.loc[5, 'TLS_Message'] == 'Server Hello' and pd.isna(dissected.loc[5, 'TLS_SNI'])
+    # The host of a request is its server, of a response its source, of a CONNECT the URI host
+    assert dissected.loc[6, ['HTTP_Method', 'HTTP_Host']].tolist() == ['GET', '93.184.216.34']
+    assert dissected.loc[7, ['HTTP_Status', 'HTTP_Host']].tolist() == [404, '93.184.216.34']
+    assert dissected.loc[8, 'HTTP_Host'] == 'www.example.org'
+    assert dissected.loc[9, ['QUIC_Packet_Type', 'QUIC_DCID', 'QUIC_SCID']].tolist() == ['Initial', '8a3f21c0', '01ab']
+
+
+def test_protocol_metrics(dissected):
+    metrics = protocol_metrics(dissected)
+    assert metrics['dissected_rows'] == 10
+    assert (metrics['dns_queries'], metrics['dns_responses']) == (1, 2)
+    assert metrics['dns_nxdomain_percent'] == metrics['dns_error_percent'] == 50.0
+    assert metrics['tls_client_hellos'] == 1 and metrics['tls_legacy_percent'] == 50.0
+    assert (metrics['http_requests'], metrics['http_responses'], metrics['http_error_percent']) == (2, 1, 100.0)
+    assert metrics['quic_packets'] == 1
+
+
+def test_no_dissected_rows():
+    dissected = dissect_protocols(capture(ROWS[-1:]))
+    assert dissected.empty and list(analyze_protocols.DISSECTOR_FIELDS) == list(dissected.columns[5:])
+    metrics = protocol_metrics(dissected)
+    assert metrics['dissected_rows'] == 0 and 'dns_error_percent' not in metrics
+
+
+def test_registered_dissectors_run_in_the_same_pass(monkeypatch):
+    monkeypatch.setattr(analyze_protocols, 'DISSECTORS', dict(analyze_protocols.DISSECTORS))
+    monkeypatch.setattr(analyze_protocols, 'DISSECTOR_FIELDS', dict(analyze_protocols.DISSECTOR_FIELDS))
+
+    @register_dissector(['SSDP'], {'SSDP_Method': 'category'})
+    def dissect_ssdp(rows):
+        return rows['Info'].str.extract(r'^(?P<SSDP_Method>[A-Z-]+) ')
+
+    dissected = dissect_protocols(capture(ROWS[:1] + [('SSDP', '10.0.0.1', '239.255.255.250', 'M-SEARCH * HTTP/1.1')]))
+    assert dissected['SSDP_Method'].tolist()[1] == 'M-SEARCH' and pd.isna(dissected['SSDP_Method'].iloc[0])
+
+    with pytest.raises(ValueError):
+        register_dissector(['Other'], {'Source_Port': 'string'})
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from scripts.analyze_rules import evaluate_warning_rules, load_warning_rules, metric_severity
+
+
+RULES = [
+    {'group': 'rst', 'metric': 'tcp_rst_percent', 'operator': '>', 'threshold': 50, 'severity': 'High',
+     'category': 'TCP RST', 'description': 'RST {value}% ({severity})', 'recommendation': 'Investigate'},
+    {'group': 'rst', 'metric': 'tcp_rst_percent', 'operator': '>', 'threshold': 25, 'severity': 'Moderate',
+     'category': 'TCP RST', 'description': 'RST {value}% ({severity})', 'recommendation': 'Monitor'},
+    {'metric': 'top_source_percent', 'operator': '>=', 'threshold': 50, 'category': 'Source IP',
+     'description': '{top_source_ip} sent {value}% of the packets', 'recommendation': 'Investigate'},
+]
+
+
+def test_only_the_first_matching_rule_of_a_group_triggers():
+    warnings = evaluate_warning_rules({'tcp_rst_percent': 60.0}, RULES)
+    assert [warning['severity'] for warning in warnings] == ['High']
+    warnings = evaluate_warning_rules({'tcp_rst_percent': 30.0}, RULES)
+    assert [warning['recommendation'] for warning in warnings] == ['Monitor']
+    assert warnings[0]['description'] == 'RST 30.0% (Moderate)'
+
+
+def test_threshold_boundaries_follow_the_operator():
+    assert evaluate_warning_rules({'tcp_rst_percent': 25}, RULES) == []
+    warnings = evaluate_warning_rules({'top_source_percent': 50, 'top_source_ip': '10.0.0.1'}, RULES)
+    assert warnings[0]['description'] == '10.0.0.1 sent 50% of the packets'
+    assert warnings[0]['value'] == 50 and warnings[0]['threshold'] == 50
+
+
+def test_missing_metrics_are_skipped():
+    assert evaluate_warning_rules({}, RULES) == []
+
+
+def test_missing_description_fields_do_not_fail_the_evaluation():
+    # top_source_ip is produced by the source stage, which did not run
+    warnings = evaluate_warning_rules({'top_source_percent': 80}, RULES)
+    assert warnings[0]['description'] == 'n/a sent 80% of the packets'
+
+
+def test_metric_severity_labels_the_summary():
+    assert metric_severity('tcp_rst_percent', 60.0, RULES) == 'High'
+    assert metric_severity('tcp_rst_percent', 30.0, RULES) == 'Moderate'
+    assert metric_severity('tcp_rst_percent', 10.0, RULES) == 'Low'
+    assert metric_severity('tcp_syn_percent', 30.0) == 'Moderate'
+
+
+def test_bundled_rules_are_valid():
+    rules = load_warning_rules()
+    assert rules and all(rule['metric'] for rule in rules)
+
+
+def test_invalid_rules_are_rejected(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps([dict(RULES[2], operator='=>')]))
+    with pytest.raises(ValueError, match='unknown operator'):
+        load_warning_rules(str(path))
+    path.write_text(json.dumps([{key: value for key, value in RULES[2].items() if key != 'threshold'}]))
+    with pytest.raises(ValueError, match='missing threshold'):
+        load_warning_rules(str(path))
@@ -0,0 +1,73 @@
+import csv
+
+import pytest
+
+from scripts import analyze
+from scripts.analyze_sample import proportion_interval, quick_look, sample_capture
+
+
+def write_capture(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_ALL)
+        writer.writerow(['No.', 'Time', 'Source', 'Destination', 'Protocol', 'Length', 'Info'])
+        for number, (source, destination, protocol, info) in enumerate(rows, start=1):
+            writer.writerow([number, number / 1000, source, destination, protocol, 60, info])
+    return str(path)
+
+
+def test_proportion_interval_is_the_wilson_interval():
+    assert proportion_interval(50, 100) == (40.38, 59.62)
+    low, high = proportion_interval(0, 20)
+    assert low == 0.0 and 0 < high < 20
+    low, high = proportion_interval(20, 20)
+    assert 80 < low < 100 and high == 100.0
+    assert proportion_interval(0, 0) == (0.0, 100.0)
+
+
+def test_proportion_interval_narrows_with_the_sample_size():
+    small = proportion_interval(10, 100)
+    large = proportion_interval(1000, 10000)
+    assert large[1] - large[0] < small[1] - small[0]
+    assert proportion_interval(10, 100, confidence=0.99)[1] > small[1]
+
+
+@pytest.mark.parametrize('successes, n', [(5, 1), (-1, 10)])
+def test_proportion_interval_rejects_successes_out_of_range(successes, n):
+    with pytest.raises(ValueError, match='between 0 and the number of rows'):
+        proportion_interval(successes, n)
+
+
+def test_sample_capture_reads_about_sample_size_lines(tmp_path):
+    path = write_capture(tmp_path / 'capture.csv', [('10.0.0.1', '10.0.0.2', 'UDP', f'{port} > 53 Len=10') for port in range(1000)])
+    for method in ('stratified', 'uniform'):
+        sample = sample_capture(path, sample_size=100, method=method, seed=1)
+        assert 50 <= len(sample) <= 100
+        assert sample.attrs['sample_method'] == method
+        assert 800 <= sample.attrs['estimated_total_rows'] <= 1200
+        assert sample['No.'].is_unique
+    assert sample_capture(path, 100, seed=7).equals(sample_capture(path, 100, seed=7))
+
+
+def test_quick_look_marks_every_warning_as_sampled(tmp_path, capsys):
+    rows = [('192.168.1.66', '192.168.1.20', 'TCP', f'{40000 + port} > {port} [SYN] Seq=0 Win=1024 Len=0') for port in range(1, 121)]
+    rows += [('192.168.1.1', '192.168.1.10', 'DNS', f'Standard query response 0x{number:04x} No such name A host{number}.example.org')
+             for number in range(20)]
+    path = write_capture(tmp_path / 'capture.csv', rows)
+
+    # Leftovers of a previous analysis must not leak into the quick look
+    analyze.table_summary.add_row(['Previous capture'])
+    analyze.add_warnings([{'category': 'Previous warning', 'description': 'left over', 'recommendation': 'none'}])
+    analyze.aggregates['tcp_rst_percentage'] = 99.0
+    analyze.plots_enabled = False
+    try:
+        quick_look(path, sample_size=10000, seed=1)
+    finally:
+        analyze.plots_enabled = True
+    warnings = {row[1]: row[2] for row in analyze.table_warnings.rows}
+    assert all('[sampled estimate' in description for description in warnings.values())
+    assert 'Port Scan' in warnings and 'Previous warning' not in warnings
+    assert ['Previous capture'] not in analyze.table_summary.rows
+    assert analyze.aggregates.get('tcp_rst_percentage') != 99.0
+    # DNS responses are a denominator, so the NXDomain warning gets an interval
+    assert 'CI' in next(description for category, description in warnings.items() if 'DNS' in category)
+    analyze.reset_analysis()
@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.analyze_scans import DistinctCounter, ScanDetector, bit_length, hash_values
+
+
+def syn_rows(source, destinations, ports, control='SYN'):
+    return pd.DataFrame({'Source': source, 'Destination': destinations, 'Destination_Port': ports,
+                         'TCP_Control_Msg': control})
+
+
+def test_bit_length_is_exact_on_64_bit_values():
+    values = np.array([0, 1, 2, 3, 2**32 - 1, 2**32, 2**53 + 1, 2**64 - 1], dtype=np.uint64)
+    assert bit_length(values).tolist() == [0, 1, 2, 2, 32, 33, 54, 64]
+
+
+def test_counter_is_exact_up_to_the_limit():
+    counter = DistinctCounter(exact_limit=100)
+    counter.add_hashes(hash_values(pd.Series(range(60))))
+    counter.add_hashes(hash_values(pd.Series(range(40, 100))))
+    assert counter.is_exact() and counter.count() == 100
+
+
+@pytest.mark.parametrize('precision', [10, 14])
+@pytest.mark.parametrize('distinct', [1000, 100000])
+def test_sketch_estimate_is_within_four_standard_errors(precision, distinct):
+    counter = DistinctCounter(exact_limit=128, precision=precision)
+    for chunk in np.array_split(np.arange(distinct), 10):
+        counter.add_hashes(hash_values(pd.Series(chunk)))
+    standard_error = 1.04 / np.sqrt(2 ** precision)
+    assert not counter.is_exact()
+    assert abs(counter.count() - distinct) / distinct < 4 * standard_error
+
+
+def test_merged_counters_match_a_single_counter():
+    hashes = hash_values(pd.Series(range(5000)))
+    single = DistinctCounter()
+    single.add_hashes(hashes)
+    exact, sketch = DistinctCounter(), DistinctCounter()
+    exact.add_hashes(hashes[:50])
+    sketch.add_hashes(hashes[50:])
+    # An exact counter merged into a sketch and a sketch merged into an exact counter
+    left, right = DistinctCounter(), DistinctCounter()
+    left.merge(sketch)
+    left.merge(exact)
+    right.merge(exact)
+    right.merge(sketch)
+    assert left.count() == right.count() == single.count()
+
+
+def test_detector_reports_sources_above_the_thresholds():
+    detector = ScanDetector(port_threshold=10, host_threshold=5)
+    detector.update(pd.concat([
+        syn_rows('10.0.0.66', '10.0.0.1', range(20)),
+        syn_rows('10.0.0.67', [f'10.0.1.{host}' for host in range(8)], 445),
+        syn_rows('10.0.0.68', '10.0.0.1', range(10)),
+        # Only SYNs open connections, the other control messages are ignored
+        syn_rows('10.0.0.69', '10.0.0.1', range(50), control='ACK'),
+    ]))
+    assert detector.scans() == [
+        {'source': '10.0.0.66', 'kind': 'vertical', 'distinct': 20, 'exact': True},
+        {'source': '10.0.0.67', 'kind': 'horizontal', 'distinct': 8, 'exact': True},
+    ]
+
+
+def test_detector_switches_to_the_sketch_for_large_scans():
+    detector = ScanDetector(port_threshold=100, exact_limit=128)
+    detector.update(syn_rows('10.0.0.66', '10.0.0.1', range(5000)))
+    [scan] = detector.scans()
+    assert scan['kind'] == 'vertical' and not scan['exact']
+    assert abs(scan['distinct'] - 5000) / 5000 < 4 * 1.04 / np.sqrt(2 ** 10)
+
+
+def test_detector_bounds_the_number_of_sources():
+    detector = ScanDetector(port_threshold=1, max_sources=2)
+    detector.update(syn_rows(['a', 'a', 'b', 'c', 'c', 'c'], '10.0.0.1', [1, 2, 1, 1, 2, 3]))
+    assert sorted(detector.ports) == ['a', 'b']
+    assert detector.untracked_packets == 3
+
+    other = ScanDetector(port_threshold=1, max_sources=2)
+    other.update(syn_rows(['a', 'd'], '10.0.0.1', [3, 1]))
+    detector.merge(other)
+    assert sorted(detector.ports) == ['a', 'b']
+    assert detector.ports['a'].count() == 3
@@ -0,0 +1,107 @@
+import pandas as pd
+import pytest
+
+from scripts import analyze
+from scripts.analyze_tcp import extract_tcp_fields, flag_tcp_events, handshake_rtt, tcp_performance
+from scripts.capture_schema import load_capture
+
+CLIENT, SERVER = '10.0.0.1', '93.184.216.34'
+
+
+def tcp_rows(packets):
+    """
+    Builds the parse_TCP_details output of (time, source, destination, info) packets.
+    """
+    data = pd.DataFrame([{'Time': time, 'Source': source, 'Destination': destination, 'Protocol': 'TCP', 'Length': 60, 'Info': info}
+                         for time, source, destination, info in packets])
+    return analyze.parse_TCP_details(analyze.identify_address_types(data))
+
+
+def test_extract_tcp_fields_leaves_the_missing_fields_empty():
+    fields = extract_tcp_fields(pd.Series(['51000 > 443 [SYN] Seq=0 Win=64240 Len=0', '[Malformed Packet]']))
+    assert fields.iloc[0].tolist()[0] == 0 and pd.isna(fields.iloc[0]['Ack'])
+    assert fields.iloc[1].isna().all()
+
+
+def test_syn_retries_are_not_data_retransmissions():
+    details = tcp_rows(
+        [(i, CLIENT, SERVER, '[TCP Retransmission] 51000 > 443 [SYN] Seq=0 Win=64240 Len=0') for i in range(5)]
+        + [(6, CLIENT, SERVER, '51000 > 443 [PSH, ACK] Seq=1 Ack=1 Win=64240 Len=100')])
+    flows, metrics = tcp_performance(details)
+    assert metrics['tcp_data_segments'] == 1
+    assert metrics['tcp_retransmissions'] == 0
+    assert 0 <= metrics['tcp_retransmission_percent'] <= 100
+    assert (flows['Retransmission_Percent'].dropna() <= 100).all()
+
+
+def test_data_retransmissions_from_the_sequence_numbers_and_the_flags():
+    details = tcp_rows([
+        (0, CLIENT, SERVER, '51000 > 443 [PSH, ACK] Seq=1 Ack=1 Win=64240 Len=100'),
+        (1, CLIENT, SERVER, '51000 > 443 [PSH, ACK] Seq=101 Ack=1 Win=64240 Len=100'),
+        # Resends bytes 1-100 without the expert info
+        (2, CLIENT, SERVER, '51000 > 443 [PSH, ACK] Seq=1 Ack=1 Win=64240 Len=100'),
+        (3, CLIENT, SERVER, '[TCP Retransmission] 51000 > 443 [PSH, ACK] Seq=201 Ack=1 Win=64240 Len=100'),
+        (4, CLIENT, SERVER, '[TCP Keep-Alive] 51000 > 443 [ACK] Seq=300 Ack=1 Win=64240 Len=1'),
+    ])
+    assert flag_tcp_events(details)['Retransmission'].tolist() == [False, False, True, True, False]
+    metrics = tcp_performance(details)[1]
+    assert metrics['tcp_data_segments'] == 5
+    assert metrics['tcp_retransmission_percent'] == 40.0
+
+
+def test_dup_acks_and_zero_windows():
+    details = tcp_rows([
+        (0, SERVER, CLIENT, '443 > 51000 [ACK] Seq=1 Ack=101 Win=500 Len=0'),
+        (1, SERVER, CLIENT, '443 > 51000 [ACK] Seq=1 Ack=101 Win=500 Len=0'),
+        (2, SERVER, CLIENT, '[TCP ZeroWindow] 443 > 51000 [ACK] Seq=1 Ack=101 Win=0 Len=0'),
+        (3, SERVER, CLIENT, '443 > 51000 [RST] Seq=1 Win=0 Len=0'),
+    ])
+    events = flag_tcp_events(details)
+    assert events['Dup_ACK'].tolist() == [False, True, False, False]
+    assert events['Zero_Window'].tolist() == [False, False, True, False]
+    metrics = tcp_performance(details)[1]
+    assert metrics['tcp_dup_ack_percent'] == 25.0
+    assert metrics['tcp_zero_window_flows'] == 1
+
+
+def test_handshake_rtt_matches_the_first_syn_and_syn_ack():
+    details = tcp_rows([
+        (1.000, CLIENT, SERVER, '51000 > 443 [SYN] Seq=0 Win=64240 Len=0'),
+        (1.250, SERVER, CLIENT, '443 > 51000 [SYN, ACK] Seq=0 Ack=1 Win=65535 Len=0'),
+        (2.000, CLIENT, SERVER, '51001 > 443 [SYN] Seq=0 Win=64240 Len=0'),
+    ])
+    rtt = handshake_rtt(details)
+    assert rtt.tolist() == [250.0]
+    flows, metrics = tcp_performance(details)
+    assert metrics['tcp_handshakes'] == 1
+    assert metrics['tcp_handshake_rtt_p50_ms'] == pytest.approx(250.0)
+    assert flows.loc[f'{CLIENT}:51000 > {SERVER}:443', 'Handshake_RTT_ms'] == 250.0
+    assert pd.isna(flows.loc[f'{CLIENT}:51001 > {SERVER}:443', 'Handshake_RTT_ms'])
+
+
+def test_no_data_segments_gives_a_zero_rate_and_no_percentiles():
+    metrics = tcp_performance(tcp_rows([(0, CLIENT, SERVER, '51000 > 443 [SYN] Seq=0 Win=64240 Len=0')]))[1]
+    assert metrics['tcp_retransmission_percent'] == 0.0
+    assert 'tcp_flow_retransmission_p50_percent' not in metrics
+
+
+@pytest.mark.parametrize('backend', ['pandas', 'duckdb'])
+def test_the_report_is_plotted_without_retransmissions(tmp_path, monkeypatch, backend):
+    path = tmp_path / 'handshake.csv'
+    pd.DataFrame({'No.': [1, 2], 'Time': [0.0, 0.01], 'Source': [CLIENT, SERVER], 'Destination': [SERVER, CLIENT],
+                  'Protocol': ['TCP', 'TCP'], 'Length': [74, 74],
+                  'Info': ['51000 > 443 [SYN] Seq=0 Win=64240 Len=0', '443 > 51000 [SYN, ACK] Seq=0 Ack=1 Win=65535 Len=0']}).to_csv(path, index=False)
+    if backend == 'duckdb':
+        duckdb_backend = pytest.importorskip('scripts.duckdb_backend')
+        if duckdb_backend.duckdb is None:
+            pytest.skip('duckdb is not installed')
+        data = duckdb_backend.load_capture_duckdb(str(path))
+    else:
+        data = load_capture(str(path))
+    monkeypatch.setattr(analyze, 'plots_enabled', True)
+    monkeypatch.setattr(analyze, 'plots_dir', str(tmp_path))
+    analyze.reset_analysis()
+    analyze.data_analysis(data)
+    assert analyze.snapshot['tcp']['performance']['tcp_retransmissions'] == 0
+    assert not (tmp_path / 'top10_tcp_flows_retransmissions.png').exists()
+    analyze.reset_analysis()
@@ -0,0 +1,85 @@
+import json
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from conftest import FIXTURES
+from scripts import analyze, analyze_tls
+from scripts.analyze_tls import HANDSHAKE_COLUMNS, FingerprintIndex, fingerprint_index, label_applications
+from scripts.capture_schema import load_capture
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def handshakes(rows):
+    """
+    Builds a handshake table from (destination, sni, ja3) client hellos.
+    """
+    return pd.DataFrame([{'Source': '10.0.0.1', 'Destination': destination, 'Server': destination, 'SNI': sni, 'JA3': ja3}
+                         for destination, sni, ja3 in rows], columns=HANDSHAKE_COLUMNS).astype(object)
+
+
+def test_server_names_match_their_nearest_parent_domain():
+    index = FingerprintIndex('')
+    applications = index.lookup('SNI', pd.Series(['rr3---sn-4g5e6nzl.googlevideo.com', 'example.org', None]))
+    assert applications.tolist() == ['YouTube', None, None]
+
+
+def test_fingerprints_are_learned_only_from_one_application():
+    index = FingerprintIndex('')
+    table = handshakes([('142.250.1.1', 'www.youtube.com', 'aaa')] * 3
+                       + [('142.250.1.1', 'www.youtube.com', 'shared'), ('157.240.1.1', 'www.facebook.com', 'shared')] * 3
+                       + [('142.250.1.2', None, 'aaa')])
+    labeled, servers, learned = label_applications(table, index)
+    assert learned == 1
+    assert index.application('JA3', 'aaa') == 'YouTube' and index.application('JA3', 'shared') is None
+    # The handshake without a server name is labeled from its learned JA3
+    assert labeled['Labeled_By'].iloc[-1] == 'JA3' and servers['142.250.1.2'] == 'YouTube'
+
+
+def test_the_learned_index_is_saved_only_to_a_configured_file(tmp_path):
+    index = FingerprintIndex('')
+    index.learn('JA3', 'aaa', 'YouTube')
+    index.save()
+    assert index.changed
+
+    path = tmp_path / 'tls_fingerprints.json'
+    # Saved in the meantime by another process
+    path.write_text(json.dumps({'ja3': {'bbb': 'Netflix'}}))
+    index = FingerprintIndex(str(path))
+    index.learn('JA3', 'aaa', 'YouTube')
+    index.save()
+    assert json.loads(path.read_text())['ja3'] == {'aaa': 'YouTube', 'bbb': 'Netflix'}
+
+
+def test_learning_is_not_persisted_by_default():
+    environment = {key: value for key, value in os.environ.items() if key != 'TLS_FINGERPRINTS'}
+    output = subprocess.run([sys.executable, '-c', 'from scripts import analyze_tls; print(repr(analyze_tls.learned_index_path))'],
+                            env=dict(environment, PYTHONPATH=ROOT), capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "''"
+
+
+def test_fingerprint_index_follows_the_configured_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(analyze_tls, 'learned_index_path', str(tmp_path / 'index.json'))
+    assert fingerprint_index().path == str(tmp_path / 'index.json')
+    assert fingerprint_index() is fingerprint_index()
+    monkeypatch.setattr(analyze_tls, 'learned_index_path', '')
+    assert fingerprint_index().path == ''
+
+
+def test_labeled_servers_are_returned_and_skipped_by_the_dns_analysis(monkeypatch):
+    analyze.reset_analysis()
+    monkeypatch.setattr(analyze, 'plots_enabled', False)
+    data, servers = analyze.run_analysis(load_capture(os.path.join(FIXTURES, 'capture.csv')), record_baseline=False)
+    assert servers['142.250.1.1'] == 'YouTube'
+    assert analyze.snapshot['tls']['servers'] == {str(key): str(value) for key, value in servers.items()}
+
+    analyze_dns = pytest.importorskip('scripts.analyze_dns')
+    resolved = []
+    monkeypatch.setattr(analyze_dns, 'dns_resolution_and_value_counts', resolved.extend)
+    analyze_dns.dns_analysis(data, labeled_destinations=servers)
+    public = set(data.loc[data['Destination_Type'] == 'Public', 'Destination'].astype(str))
+    assert resolved and set(resolved) == public - set(servers.index) - {'255.255.255.255'}
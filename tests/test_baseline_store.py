@@ -0,0 +1,128 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+from scripts.baseline_store import (DEFAULT_BASELINE_PATH, PROTOCOL_SHIFT_POINTS, TCP_SHIFT_POINTS, BaselineStore, drift_warnings,
+                                    record_run, snapshot_fingerprint)
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def make_snapshot(capture='capture.csv', sources=('10.0.0.1',), protocols=None, rst_percent=5.0, arp=None):
+    protocols = protocols or {'TCP': 90, 'UDP': 10}
+    return {
+        'capture': capture,
+        'top': {'source': {'by_packets': [{'source': source, 'packets': 10, 'bytes': 600} for source in sources],
+                           'by_bytes': [{'source': source, 'packets': 10, 'bytes': 600} for source in sources]}},
+        'protocols': [{'protocol': protocol, 'packets': packets, 'bytes': packets * 60} for protocol, packets in protocols.items()],
+        'tcp': {'metrics': {'tcp_control_msgs': 100, 'tcp_rst_percent': rst_percent}},
+        'arp': arp or {'10.0.0.1': 'aa:aa:aa:aa:aa:aa'},
+    }
+
+
+def baseline_of(*snapshots, tmp_path):
+    store = BaselineStore(str(tmp_path / 'baseline.sqlite'))
+    for snapshot in snapshots:
+        store.save(snapshot)
+    baseline = store.baseline()
+    store.close()
+    return baseline
+
+
+def categories(warnings):
+    return sorted(warning['category'] for warning in warnings)
+
+
+def baseline_path_with(**environment):
+    environment = dict({key: value for key, value in os.environ.items() if key != 'BASELINE_DB'}, PYTHONPATH=ROOT, **environment)
+    return subprocess.run([sys.executable, '-c', 'from scripts import analyze; print(analyze.baseline_path)'],
+                          env=environment, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def test_every_run_is_recorded_by_default():
+    # Without BASELINE_DB the runs are saved to the default store, an empty BASELINE_DB disables it
+    assert baseline_path_with() == DEFAULT_BASELINE_PATH
+    assert baseline_path_with(BASELINE_DB='other.sqlite') == 'other.sqlite'
+    assert baseline_path_with(BASELINE_DB='') == ''
+
+
+def test_an_empty_store_path_is_rejected():
+    with pytest.raises(ValueError, match='empty'):
+        BaselineStore('')
+    # The command line falls back to the default store when BASELINE_DB is empty
+    output = subprocess.run([sys.executable, os.path.join(ROOT, 'scripts', 'baseline_store.py'), '--help'],
+                            env=dict(os.environ, BASELINE_DB=''), capture_output=True, text=True, check=True).stdout
+    assert f'(default: {DEFAULT_BASELINE_PATH},' in ' '.join(output.split())
+
+
+def test_no_drift_without_previous_runs(tmp_path):
+    assert drift_warnings(make_snapshot(), baseline_of(tmp_path=tmp_path)) == []
+
+
+def test_protocol_shift_threshold(tmp_path):
+    baseline = baseline_of(make_snapshot(), tmp_path=tmp_path)
+    below = {'TCP': 90 - PROTOCOL_SHIFT_POINTS, 'UDP': 10 + PROTOCOL_SHIFT_POINTS}
+    above = {'TCP': 90 - PROTOCOL_SHIFT_POINTS - 1, 'UDP': 10 + PROTOCOL_SHIFT_POINTS + 1}
+    assert drift_warnings(make_snapshot(protocols=below), baseline) == []
+    warnings = drift_warnings(make_snapshot(protocols=above), baseline)
+    assert categories(warnings) == ['Protocol Shift', 'Protocol Shift']
+    assert {warning['threshold'] for warning in warnings} == {PROTOCOL_SHIFT_POINTS}
+
+
+def test_tcp_ratio_shift_threshold(tmp_path):
+    baseline = baseline_of(make_snapshot(rst_percent=5.0), make_snapshot(capture='other.csv', sources=('10.0.0.1', '10.0.0.2'), rst_percent=15.0),
+                           tmp_path=tmp_path)
+    # The baseline mean is 10%
+    assert drift_warnings(make_snapshot(rst_percent=10.0 + TCP_SHIFT_POINTS), baseline) == []
+    [warning] = drift_warnings(make_snapshot(rst_percent=10.0 + TCP_SHIFT_POINTS + 0.5), baseline)
+    assert warning['category'] == 'TCP Ratio Shift' and warning['metric'] == 'tcp_rst_percent'
+
+
+def test_new_top_talker_and_arp_change(tmp_path):
+    baseline = baseline_of(make_snapshot(), tmp_path=tmp_path)
+    # Only the first NEW_TALKER_RANKS (3) entries are checked
+    snapshot = make_snapshot(sources=('10.0.0.1', '10.0.0.5', '10.0.0.1', '10.0.0.9'), arp={'10.0.0.1': 'BB:BB:BB:BB:BB:BB'})
+    warnings = drift_warnings(snapshot, baseline)
+    assert categories(warnings) == ['ARP Change', 'New Top Talker']
+    assert '10.0.0.5' in warnings[0]['description'] + warnings[1]['description']
+    # MAC addresses are compared case insensitively
+    assert drift_warnings(make_snapshot(arp={'10.0.0.1': 'AA:AA:AA:AA:AA:AA'}), baseline) == []
+
+
+def test_the_same_capture_is_not_saved_twice(tmp_path):
+    path = str(tmp_path / 'baseline.sqlite')
+    first = make_snapshot()
+    second = make_snapshot(capture='tuesday.csv', rst_percent=40.0)
+    assert record_run(first, path)[::3] == (1, False)
+    assert record_run(second, path)[:2] == (2, 1)
+    # Analyzed again under another name: compared against the runs before it, not saved
+    run_id, baseline_runs, warnings, stored = record_run(dict(first, capture='renamed.csv'), path)
+    assert (run_id, baseline_runs, warnings, stored) == (1, 0, [], True)
+    with sqlite3.connect(path) as connection:
+        assert connection.execute('SELECT COUNT(*) FROM runs').fetchone() == (2,)
+
+
+def test_fingerprint_ignores_the_capture_name():
+    assert snapshot_fingerprint(make_snapshot()) == snapshot_fingerprint(make_snapshot(capture='other.csv'))
+    assert snapshot_fingerprint(make_snapshot()) != snapshot_fingerprint(make_snapshot(rst_percent=6.0))
+
+
+def test_stores_without_fingerprints_are_migrated(tmp_path):
+    path = str(tmp_path / 'baseline.sqlite')
+    with sqlite3.connect(path) as connection:
+        connection.execute('CREATE TABLE runs (run_id INTEGER PRIMARY KEY, capture TEXT, recorded_at TEXT NOT NULL, '
+                           'total_packets INTEGER NOT NULL, total_bytes INTEGER NOT NULL)')
+        connection.execute("INSERT INTO runs VALUES (1, 'old.csv', '2024-01-01', 1, 60)")
+    connection.close()
+    assert record_run(make_snapshot(), path)[:2] == (2, 1)
+    assert record_run(make_snapshot(), path)[::3] == (2, True)
+
+
+@pytest.mark.parametrize('save', [True, False])
+def test_compare_only_does_not_save(tmp_path, save):
+    path = str(tmp_path / 'baseline.sqlite')
+    run_id = record_run(make_snapshot(), path, save=save)[0]
+    assert (run_id is not None) == save
@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from scripts import capture_schema
+from scripts.capture_schema import load_capture, schema_columns
+
+
+CSV = (
+    '"No.","Time","Source","Destination","Protocol","Length","Info"\n'
+    '1,0.0,"10.0.0.2","142.250.1.1","TCP",74,"51000 > 443 [SYN] Seq=0 Win=64240 Len=0"\n'
+    '2,0.1,"142.250.1.1","10.0.0.2","TCP",74,"443 > 51000 [SYN, ACK] Seq=0 Ack=1 Win=65535 Len=0"\n'
+    '3,0.2,"10.0.0.2","142.250.1.1","TCP",60,"extra","field"\n'
+    '4,0.3,"10.0.0.2","10.0.0.1","DNS",80,"Standard query 0x1a2b A example.com"\n'
+)
+
+
+@pytest.fixture
+def capture(tmp_path):
+    path = tmp_path / 'capture.csv'
+    path.write_text(CSV)
+    return str(path)
+
+
+@pytest.mark.parametrize('arrow', [True, False])
+def test_load_capture_types_and_skipped_lines(capture, monkeypatch, arrow):
+    if not arrow:
+        monkeypatch.setattr(capture_schema, 'pa_csv', None)
+    elif capture_schema.pa_csv is None:
+        pytest.skip('pyarrow is not installed')
+    data = load_capture(capture)
+    assert len(data) == 3
+    assert data.attrs == {'skipped_lines': 1, 'capture': capture}
+    assert isinstance(data['Source'].dtype, pd.CategoricalDtype)
+    assert isinstance(data['Protocol'].dtype, pd.CategoricalDtype)
+    assert data['Length'].dtype == 'uint32'
+    assert data['Time'].dtype == 'float64'
+    assert data['Info'].iloc[2] == 'Standard query 0x1a2b A example.com'
+
+
+@pytest.mark.parametrize('arrow', [True, False])
+def test_blank_integer_cells_do_not_fail_the_load(tmp_path, monkeypatch, arrow):
+    if not arrow:
+        monkeypatch.setattr(capture_schema, 'pa_csv', None)
+    elif capture_schema.pa_csv is None:
+        pytest.skip('pyarrow is not installed')
+    path = tmp_path / 'blank.csv'
+    # A blank No., and a short line (rejected by pyarrow, padded with missing values by the pandas parser)
+    path.write_text(CSV.replace('4,0.3,', ',0.3,') + '5,"short line"\n')
+    data = load_capture(str(path))
+    assert data['No.'].isna().tolist()[:3] == [False, False, True]
+    assert data.dropna(subset=schema_columns(data))['No.'].tolist() == [1, 2]
+
+
+def test_schema_columns_ignore_the_extra_columns():
+    data = pd.DataFrame(columns=['Info', 'tls.handshake.ja3', 'Source', 'No.'])
+    assert schema_columns(data) == ['No.', 'Source', 'Info']
@@ -0,0 +1,76 @@
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import FIXTURES
+from scripts import analyze
+from scripts.analyze_tcp import tcp_performance
+from scripts.capture_schema import load_capture, schema_columns
+
+duckdb_backend = pytest.importorskip('scripts.duckdb_backend')
+if duckdb_backend.duckdb is None:
+    pytest.skip('duckdb is not installed', allow_module_level=True)
+
+CAPTURE = os.path.join(FIXTURES, 'capture.csv')
+
+
+def test_the_backends_are_equivalent_on_the_fixture():
+    # The fixture has malformed TCP rows, a bad line, non-IP (STP, LLDP) rows and extra TLS columns
+    assert duckdb_backend.check_equivalence(CAPTURE) == []
+
+
+def test_exports_without_some_schema_columns_load(tmp_path):
+    path = tmp_path / 'no_time.csv'
+    load_capture(CAPTURE).drop(columns=['Time']).to_csv(path, index=False)
+    capture = duckdb_backend.load_capture_duckdb(str(path))
+    expected = load_capture(str(path))
+    assert capture.columns == schema_columns(expected) and 'Time' not in capture.columns
+    assert len(capture) == len(expected)
+    assert duckdb_backend.compare_counts('Protocol', analyze.value_counts(expected, 'Protocol'), analyze.value_counts(capture, 'Protocol')) == []
+
+
+def test_malformed_rows_do_not_reuse_the_ports_of_the_previous_row():
+    data = pd.DataFrame({
+        'Source': ['10.0.0.1', '10.0.0.1'],
+        'Destination': ['10.0.0.2', '10.0.0.2'],
+        'Protocol': ['TCP', 'TCP'],
+        'Length': [60, 60],
+        'Info': ['51000 > 443 [SYN] Seq=0 Win=64240 Len=0', '[Malformed Packet]'],
+    })
+    data = analyze.identify_address_types(data)
+    details = analyze.parse_TCP_details(data)
+    assert details['Source_Port'].iloc[0] == '51000'
+    assert pd.isna(details['Source_Port'].iloc[1]) and pd.isna(details['Destination_Port'].iloc[1])
+    # A capture with only malformed TCP rows has no ports at all
+    assert analyze.parse_TCP_details(data.iloc[1:])['Source_Port'].isna().all()
+
+
+@pytest.mark.parametrize('address, protocol, expected', [
+    ('192.168.1.10', 'TCP', 'Private'),
+    ('8.8.8.8', 'UDP', 'Public'),
+    ('224.0.0.251', 'MDNS', 'Multicast-IPv4'),
+    ('2001:db8::1', 'TCP', 'IPv6'),
+    ('Cisco_ab:cd:ef', 'STP', 'MAC'),
+    ('LLDP_Multicast', 'LLDP', 'MAC'),
+    ('10.0.0.1', 'ARP', 'MAC'),
+])
+def test_address_types_agree_between_the_backends(address, protocol, expected):
+    assert analyze.identify_address_type(address, protocol) == expected
+    data = pd.DataFrame({'No.': [1], 'Time': [0.0], 'Source': [address], 'Destination': [address],
+                         'Protocol': [protocol], 'Length': [60], 'Info': ['x']})
+    connection = duckdb_backend.connect()
+    connection.register('frame', data)
+    capture = duckdb_backend.SQLCapture(connection, 'SELECT * FROM frame')
+    assert capture.identify_address_types().value_counts('Source_Type').to_dict() == {expected: 1}
+
+
+def test_tcp_performance_in_sql_matches_pandas():
+    frame = load_capture(CAPTURE)
+    frame = analyze.identify_address_types(frame.dropna(subset=schema_columns(frame)))
+    expected_flows, expected_metrics = tcp_performance(analyze.parse_TCP_details(frame[frame['Protocol'] == 'TCP']))
+    table = duckdb_backend.load_capture_duckdb(CAPTURE).dropna().identify_address_types().tcp_details()
+    actual_flows, actual_metrics = table.tcp_performance()
+    pd.testing.assert_frame_equal(actual_flows, expected_flows, check_dtype=False)
+    assert actual_metrics == expected_metrics
+    assert expected_metrics['tcp_retransmissions'] > 0 and expected_metrics['tcp_handshakes'] > 0
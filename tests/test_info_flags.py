@@ -0,0 +1,77 @@
+import re
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts import info_flags
+from scripts.info_flags import FLAGS_COLUMN, compute_info_flags, flag_counts, has_flag, register_info_flag
+
+INFO = pd.Series([
+    'Who has 10.0.0.1? Tell 10.0.0.2',
+    '10.0.0.1 is at 00:11:22:33:44:55',
+    '[TCP Retransmission] 51000 > 443 [PSH, ACK] Seq=1 Ack=1 Win=64240 Len=100',
+    '[TCP Dup ACK 12#1] 443 > 51000 [ACK] Seq=1 Ack=101 Win=500 Len=0',
+    '[TCP ZeroWindow] 443 > 51000 [ACK] Seq=1 Ack=101 Win=0 Len=0',
+    '[TCP ZeroWindowProbe] 51000 > 443 [ACK] Seq=101 Ack=1 Win=64240 Len=1',
+    '[TCP Keep-Alive] 51000 > 443 [ACK] Seq=100 Ack=1 Win=64240 Len=0',
+    '[TCP Retransmission] [TCP Dup ACK 3#1] [Malformed Packet]',
+    'Standard query 0x1a2b A www.example.com',
+], index=range(10, 19))
+
+
+def names(flags):
+    return [[name for name in info_flags.INFO_FLAGS if has_flag(pd.Series([value]), name).iloc[0]] for value in flags]
+
+
+def test_every_keyword_sets_its_flag():
+    flags = compute_info_flags(INFO)
+    assert flags.dtype == np.uint16 and flags.name == FLAGS_COLUMN
+    assert flags.index.equals(INFO.index)
+    assert names(flags) == [['WHO_HAS'], ['IS_AT'], ['RETRANSMISSION'], ['DUP_ACK'], ['ZERO_WINDOW'], [], ['KEEP_ALIVE'],
+                            ['MALFORMED', 'RETRANSMISSION', 'DUP_ACK'], []]
+
+
+def test_has_flag_with_several_names_and_counts():
+    flags = compute_info_flags(INFO)
+    assert has_flag(flags, 'WHO_HAS', 'IS_AT').tolist() == [True, True] + [False] * 7
+    counts = flag_counts(flags)
+    assert counts['RETRANSMISSION'] == counts['DUP_ACK'] == 2 and counts['ARP'] == 0
+    assert set(counts) == set(info_flags.INFO_FLAGS)
+
+
+def test_the_flags_column_is_reused_when_present():
+    data = info_flags.add_info_flags(pd.DataFrame({'Info': INFO}))
+    data[FLAGS_COLUMN] = data[FLAGS_COLUMN] * 0
+    assert (info_flags.info_flags(data) == 0).all()
+    assert info_flags.info_flags(data.drop(columns=FLAGS_COLUMN)).equals(compute_info_flags(INFO))
+
+
+def test_no_matching_rows():
+    assert compute_info_flags(pd.Series(['a', 'b'])).tolist() == [0, 0]
+    assert compute_info_flags(pd.Series([], dtype=object)).empty
+
+
+def test_registered_flags_join_the_same_scan(monkeypatch):
+    monkeypatch.setattr(info_flags, 'INFO_FLAGS', dict(info_flags.INFO_FLAGS))
+    bit = register_info_flag('OUT_OF_ORDER', re.escape('TCP Out-Of-Order'))
+    assert register_info_flag('OUT_OF_ORDER', 'other') == bit
+    flags = compute_info_flags(pd.Series(['[TCP Out-Of-Order] 51000 > 443 [ACK]', '[TCP Retransmission] 51000 > 443 [ACK]']))
+    assert has_flag(flags, 'OUT_OF_ORDER').tolist() == [True, False]
+    assert has_flag(flags, 'RETRANSMISSION').tolist() == [False, True]
+
+
+def test_no_bit_left(monkeypatch):
+    monkeypatch.setattr(info_flags, 'INFO_FLAGS', {f'FLAG_{bit}': (1 << bit, f'flag{bit}') for bit in range(16)})
+    with pytest.raises(ValueError):
+        register_info_flag('ONE_TOO_MANY', 'x')
+
+
+def test_the_sql_flags_match_the_pandas_flags():
+    duckdb_backend = pytest.importorskip('scripts.duckdb_backend')
+    if duckdb_backend.duckdb is None:
+        pytest.skip('duckdb is not installed')
+    connection = duckdb_backend.connect()
+    connection.register('frame', pd.DataFrame({'Info': INFO.tolist()}))
+    flags = connection.execute(f'SELECT {duckdb_backend.info_flags_sql()} FROM frame').fetchnumpy()
+    assert list(flags.values())[0].tolist() == compute_info_flags(INFO).tolist()
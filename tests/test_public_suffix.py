@@ -0,0 +1,30 @@
+from scripts.public_suffix import public_suffix_length, reduce_to_registrable_domains, registrable_domain
+
+
+def test_registrable_domain_uses_longest_rule():
+    assert registrable_domain('a.ns.example.co.uk') == 'example.co.uk'
+    assert registrable_domain('ns1.example.com') == 'example.com'
+
+
+def test_registrable_domain_normalizes_the_name():
+    assert registrable_domain(' NS-1.Example.COM. ') == 'example.com'
+
+
+def test_public_suffix_and_single_labels_are_unchanged():
+    assert registrable_domain('co.uk') == 'co.uk'
+    assert registrable_domain('localhost') == 'localhost'
+
+
+def test_unknown_tld_is_its_own_suffix():
+    assert public_suffix_length(['host', 'example', 'unknowntld']) == 1
+    assert registrable_domain('host.example.unknowntld') == 'example.unknowntld'
+
+
+def test_wildcard_and_exception_rules():
+    # *.ck makes every second level label a suffix, !www.ck is the exception
+    assert registrable_domain('a.b.example.ck') == 'b.example.ck'
+    assert registrable_domain('a.www.ck') == 'www.ck'
+
+
+def test_reduce_skips_empty_names_and_keeps_order():
+    assert reduce_to_registrable_domains(['b.example.org', '', None, 'a.example.co.uk']) == ['example.org', 'example.co.uk']
@@ -0,0 +1,82 @@
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import FIXTURES
+from scripts import analyze
+from scripts.capture_schema import load_capture, schema_columns
+from scripts.traffic_cube import build_cube
+
+CAPTURE = os.path.join(FIXTURES, 'capture.csv')
+
+DATA = pd.DataFrame({
+    'No.': [1, 2, 3, 4, 5],
+    'Time': [0.5, 10.0, 61.0, 62.0, 130.0],
+    'Source': ['10.0.0.1', '10.0.0.1', '10.0.0.2', '10.0.0.1', '8.8.8.8'],
+    'Destination': ['8.8.8.8', '8.8.8.8', '93.184.216.34', '8.8.8.8', '10.0.0.1'],
+    'Protocol': ['TCP', 'TCP', 'TCP', 'UDP', 'DNS'],
+    'Length': [60, 1500, 60, 80, 120],
+    'Info': ['51000 > 443 [SYN] Seq=0 Win=64240 Len=0', '[TCP Retransmission] 51000 > 443 [PSH, ACK] Seq=1 Ack=1 Win=64240 Len=1440',
+             '52000 > 80 [SYN] Seq=0 Win=64240 Len=0', '53000 > 53 Len=40', 'Standard query response 0x1a2b A example.com'],
+})
+
+
+def plain(volume):
+    """
+    Returns a rollup indexed by plain strings, the categories of the backends differ.
+    """
+    volume = volume.copy()
+    volume.index = pd.Index([str(key) for key in volume.index])
+    return volume.sort_index()
+
+
+@pytest.fixture(scope='module')
+def cube():
+    return build_cube(DATA, bucket_seconds=60)
+
+
+def test_cells_keep_every_packet_and_byte(cube):
+    assert cube.packets() == len(DATA) and cube.bytes() == DATA['Length'].sum()
+    assert repr(cube).startswith(f'TrafficCube({len(cube)} cells, 5 packets')
+
+
+def test_ports_and_flags_are_extracted_from_the_info_column(cube):
+    assert cube.rollup('TCP_Flags')['Packets'].to_dict() == {'SYN': 2, 'PSH, ACK': 1}
+    assert cube.top('Destination_IP:Port', n=1, by='Bytes').index.tolist() == ['8.8.8.8:443']
+    # DNS rows have no ports, they are left out of the endpoint rollups
+    assert cube.rollup('Source_IP:Port')['Packets'].sum() == 4
+
+
+def test_slices(cube):
+    assert cube.slice(Protocol='TCP').packets() == 3
+    assert cube.slice(Protocol=['TCP', 'UDP'], Source='10.0.0.1').packets() == 3
+    assert cube.slice(Time_Bucket=lambda bucket: bucket >= 60).packets() == 3
+    assert cube.slice(Destination_Port=443).bytes() == 1560
+    with pytest.raises(KeyError):
+        cube.slice(Port=443)
+
+
+def test_timeline_buckets(cube):
+    assert cube.timeline().to_dict() == {0.0: 2, 60.0: 2, 120.0: 1}
+    assert cube.timeline('Protocol', measure='Bytes').loc[0.0, 'TCP'] == 1560
+
+
+def test_rollups_match_the_traffic_volume_of_the_capture():
+    frame = load_capture(CAPTURE)
+    frame = analyze.identify_address_types(frame.dropna(subset=schema_columns(frame)).copy())
+    cube = build_cube(load_capture(CAPTURE))
+    for dimensions in ('Protocol', ['Source_Type', 'Source'], 'Destination'):
+        expected = analyze.traffic_volume(frame, dimensions)
+        pd.testing.assert_frame_equal(plain(cube.rollup(dimensions)), plain(expected), check_dtype=False)
+
+
+def test_the_duckdb_cube_matches_the_pandas_cube():
+    duckdb_backend = pytest.importorskip('scripts.duckdb_backend')
+    if duckdb_backend.duckdb is None:
+        pytest.skip('duckdb is not installed')
+    expected = build_cube(load_capture(CAPTURE))
+    actual = build_cube(duckdb_backend.load_capture_duckdb(CAPTURE))
+    assert (actual.packets(), actual.bytes()) == (expected.packets(), expected.bytes())
+    for dimensions in ('Protocol', 'TCP_Flags', 'Destination_IP:Port'):
+        pd.testing.assert_frame_equal(plain(actual.rollup(dimensions)), plain(expected.rollup(dimensions)), check_dtype=False)
@@ -0,0 +1,50 @@
+import pandas as pd
+
+from scripts import analyze
+from scripts.analyze import collapse_volume, top_volume_metrics, traffic_volume, volume_records
+
+
+DATA = pd.DataFrame({
+    'Source_Type': ['Private', 'Private', 'Private', 'Public'],
+    'Source': ['10.0.0.1', '10.0.0.1', '10.0.0.2', '8.8.8.8'],
+    'Source_IP:TCP_Port': ['10.0.0.1:1', '10.0.0.1:1', '10.0.0.2:2', '8.8.8.8:53'],
+    'Length': [100, 1500, 60, 60],
+})
+
+
+def test_traffic_volume_counts_packets_and_bytes_in_one_pass():
+    volume = traffic_volume(DATA, 'Source')
+    assert volume.loc['10.0.0.1'].tolist() == [2, 1600, 800.0]
+    assert volume['Packets'].sum() == len(DATA)
+    assert volume['Bytes'].sum() == DATA['Length'].sum()
+
+
+def test_collapse_volume_sums_the_other_levels():
+    volume = collapse_volume(traffic_volume(DATA, ['Source_Type', 'Source']), 'Source')
+    assert volume.equals(traffic_volume(DATA, 'Source').loc[volume.index])
+
+
+def test_top_volume_metrics_by_packets_and_by_bytes():
+    metrics = top_volume_metrics(traffic_volume(DATA, 'Source'), 'source')
+    assert metrics['top_source_ip'] == '10.0.0.1'
+    assert metrics['top_source_percent'] == 50.0
+    assert metrics['top_source_bytes_percent'] == round(1600 / 1720 * 100, 2)
+    assert top_volume_metrics(traffic_volume(DATA.iloc[:0], 'Source'), 'source') == {}
+
+
+def test_volume_records_are_sorted_and_cut():
+    records = volume_records(traffic_volume(DATA, 'Source'), 'source', top_n=2, by='Bytes')
+    assert [record['source'] for record in records] == ['10.0.0.1', '10.0.0.2']
+    assert records[0] == {'source': '10.0.0.1', 'packets': 2, 'bytes': 1600, 'mean_bytes': 800.0}
+
+
+def test_endpoint_charts_are_slices_of_the_endpoint_volume(monkeypatch):
+    plotted = {}
+    monkeypatch.setattr(analyze, 'plot_top10', lambda counts, xlabel, title, filename, ylabel=None: plotted.setdefault(filename, counts))
+    monkeypatch.setattr(analyze, 'value_counts', None)
+    extracted = DATA.assign(Destination_Type='Public', **{'Destination_IP:TCP_Port': '8.8.8.8:53'})
+    analyze.endpoint_volume_analysis(extracted)
+    assert plotted['top10_source_ip_tcp_port.png'].to_dict() == {'10.0.0.1:1': 2, '10.0.0.2:2': 1, '8.8.8.8:53': 1}
+    assert plotted['top10_private_source_ip_tcp_port.png'].to_dict() == {'10.0.0.1:1': 2, '10.0.0.2:2': 1}
+    assert plotted['top10_source_ip_tcp_port_bytes.png'].sum() == DATA['Length'].sum()
+    assert 'top10_private_destination_ip_tcp_port.png' not in plotted